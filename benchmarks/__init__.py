@@ -0,0 +1 @@
+"""Benchmarks for pyramid_basemodel hot paths."""
@@ -0,0 +1,113 @@
+"""Per lookup overhead of the cached lookup statements.
+
+Run with::
+
+  python -m benchmarks.lookups [iterations]
+
+Compares the library's lookups, built on cached ``select()`` statements,
+with the ``Query`` based code they replaced, on an in-memory SQLite
+database.
+"""
+
+import sys
+import timeit
+from collections.abc import Callable
+from typing import Any, Optional
+
+from sqlalchemy import ForeignKey, create_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from pyramid_basemodel import BaseMixin, Session
+from pyramid_basemodel.container import BaseModelContainer, InstanceTraversalMixin
+from pyramid_basemodel.slug import BaseSlugNameMixin
+from pyramid_basemodel.util import ensure_unique, get_all_matching, get_or_create
+
+
+class Base(DeclarativeBase):
+    """Declarative base of the benchmark models."""
+
+
+class Node(Base, BaseMixin, BaseSlugNameMixin, InstanceTraversalMixin):
+    """Tree of slugged nodes."""
+
+    __tablename__ = "nodes"
+    _slug_is_unique = False
+
+    parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey("nodes.id"))
+    parent: Mapped[Optional["Node"]] = relationship(remote_side="Node.id", back_populates="children")
+    children: Mapped[list["Node"]] = relationship(back_populates="parent")
+
+
+def query_get_child(container: BaseModelContainer, key: str) -> Any:
+    """``BaseModelContainer.get_child`` before cached statements."""
+    column = getattr(container.model_cls, container.property_name)
+    return container.model_cls.query.filter(column == key).first()
+
+
+def query_child_lookup(instance: Node, key: str) -> Any:
+    """``InstanceTraversalMixin.__getitem__`` lookup before cached statements."""
+    return instance._base_child_query.filter_by(parent=instance).filter(Node.slug == key).first()
+
+
+def query_get_or_create(cls: Any, **kwargs: Any) -> Any:
+    """``util.get_or_create`` before cached statements."""
+    return cls.query.filter_by(**kwargs).first() or cls(**kwargs)
+
+
+def query_get_all_matching(cls: Any, column_name: str, values: list[Any]) -> list[Any]:
+    """``util.get_all_matching`` before cached statements."""
+    return list(cls.query.filter(getattr(cls, column_name).in_(values)).all())
+
+
+def query_ensure_unique(instance: Any, query: Any, property_: Any, value: str) -> str:
+    """``util.ensure_unique`` before cached statements, without the random suffix."""
+    candidate, n = value, 0
+    while query.filter(property_ == value).first() not in (None, instance):
+        n += 1
+        value = f"{candidate}-{n}"
+    return value
+
+
+def setup(nodes: int = 1000) -> Node:
+    """Create the database and return the root of a populated tree."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session.configure(bind=engine)
+    root = Node(slug="root", name="root")
+    collisions = [Node(slug="taken" if n == 0 else f"taken-{n}", name="taken") for n in range(10)]
+    Session.add_all([root, *collisions, *(Node(slug=f"n{n}", name=f"n{n}", parent=root) for n in range(nodes))])
+    Session.flush()
+    return root
+
+
+def main(iterations: int = 2000) -> None:
+    """Print the time per lookup of both implementations."""
+    root = setup()
+    container = BaseModelContainer(None, Node)
+    values = [f"n{n}" for n in range(0, 1000, 10)]
+    cases: list[tuple[str, Callable[[], Any], Callable[[], Any]]] = [
+        ("get_child", lambda: query_get_child(container, "n500"), lambda: container.get_child("n500")),
+        ("instance __getitem__", lambda: query_child_lookup(root, "n500"), lambda: root._get_child("n500")),
+        ("get_or_create", lambda: query_get_or_create(Node, slug="n500"), lambda: get_or_create(Node, slug="n500")),
+        (
+            "get_all_matching",
+            lambda: query_get_all_matching(Node, "slug", values),
+            lambda: get_all_matching(Node, "slug", values),
+        ),
+        (
+            "ensure_unique x10",
+            lambda: query_ensure_unique(None, Node.query, Node.slug, "taken"),
+            lambda: ensure_unique(None, Node.query, Node.slug, "taken"),
+        ),
+    ]
+    print(f"{'lookup':<22} {'query':>10} {'cached':>10} {'speedup':>8}")
+    for name, query_lookup, cached_lookup in cases:
+        assert query_lookup() == cached_lookup()
+        query_time = min(timeit.repeat(query_lookup, number=iterations, repeat=3)) / iterations
+        cached_time = min(timeit.repeat(cached_lookup, number=iterations, repeat=3)) / iterations
+        print(f"{name:<22} {query_time * 1e6:>8.1f}us {cached_time * 1e6:>8.1f}us {query_time / cached_time:>7.2f}x")
+    Session.remove()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
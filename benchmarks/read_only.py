@@ -0,0 +1,84 @@
+"""Per request overhead of read only sessions for safe methods.
+
+Run with::
+
+  python -m benchmarks.read_only [iterations]
+
+Times ``GET`` requests loading a page of rows through ``pyramid_tm``, with
+and without ``basemodel.read_only_safe_methods``, on a SQLite file. On
+SQLite, marking the database transaction read only takes two extra
+``PRAGMA`` statements, so it's timed separately.
+"""
+
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+from typing import Any
+
+from pyramid.config import Configurator
+from pyramid.request import Request
+from pyramid.router import Router
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import DeclarativeBase
+
+from pyramid_basemodel import BaseMixin, Session
+from pyramid_basemodel.slug import BaseSlugNameMixin
+
+
+class Base(DeclarativeBase):
+    """Declarative base of the benchmark models."""
+
+
+class Page(Base, BaseMixin, BaseSlugNameMixin):
+    """Slugged page."""
+
+    __tablename__ = "pages"
+
+
+def make_app(**settings: str) -> Router:
+    """Return an app listing 50 pages."""
+    config = Configurator(settings={"basemodel.should_bind_engine": "false", **settings})
+    config.include("pyramid_tm")
+    config.include("pyramid_basemodel")
+
+    def pages(request: Request) -> list[Any]:
+        return [page.slug for page in Session.scalars(select(Page).limit(50))]
+
+    config.add_route("pages", "/")
+    config.add_view(pages, route_name="pages", renderer="json")
+    return config.make_wsgi_app()
+
+
+def main(iterations: int = 2000) -> None:
+    """Print the time per request with and without read only sessions."""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{Path(directory) / 'db.sqlite'}")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Page), [{"slug": f"p{n}", "name": f"p{n}"} for n in range(50)])
+        Session.configure(bind=engine)
+        cases = {
+            "read write": {},
+            "read only": {"basemodel.read_only_safe_methods": "true"},
+            "read only, in db": {
+                "basemodel.read_only_safe_methods": "true",
+                "basemodel.read_only_safe_methods.database": "true",
+            },
+        }
+        times = {}
+        for name, settings in cases.items():
+            app = make_app(**settings)
+            times[name] = (
+                min(timeit.repeat(lambda: Request.blank("/").get_response(app), number=iterations, repeat=5))
+                / iterations
+            )
+        Session.remove()
+        engine.dispose()
+    print(f"{'session':<22} {'request':>10} {'speedup':>8}")
+    for name, time in times.items():
+        print(f"{name:<22} {time * 1e6:>8.1f}us {times['read write'] / time:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,73 @@
+"""Time and memory of loading a listing as instances or read only records.
+
+Run with::
+
+  python -m benchmarks.records [rows]
+
+Loads every row of a table of pages, as ORM instances and as
+``BaseMixin.records()``, on an in-memory SQLite database. The peak memory
+is measured while the loaded rows are held.
+"""
+
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import DeclarativeBase
+
+from pyramid_basemodel import BaseMixin, Session
+from pyramid_basemodel.slug import BaseSlugNameMixin
+
+
+class Base(DeclarativeBase):
+    """Declarative base of the benchmark models."""
+
+
+class Page(Base, BaseMixin, BaseSlugNameMixin):
+    """Slugged page."""
+
+    __tablename__ = "pages"
+
+
+def instances() -> list[Any]:
+    """Load the rows as ORM instances."""
+    return list(Session.scalars(select(Page)))
+
+
+def records() -> list[Any]:
+    """Load the rows as read only records."""
+    return Page.records()
+
+
+def measure(load: Callable[[], list[Any]]) -> tuple[float, int]:
+    """Return the best time and the peak memory of ``load``, with an empty identity map."""
+    time = min(timeit.repeat(load, setup=Session.expunge_all, number=1, repeat=5))
+    Session.expunge_all()
+    tracemalloc.start()
+    rows = load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    Session.expunge_all()
+    return time, peak
+
+
+def main(rows: int = 10000) -> None:
+    """Print the time and memory of loading ``rows`` pages both ways."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session.configure(bind=engine)
+    Session.execute(insert(Page), [{"slug": f"p{n}", "name": f"Page {n}"} for n in range(rows)])
+    results = {name: measure(load) for name, load in (("instances", instances), ("records", records))}
+    print(f"{'loading':<10} {'time':>10} {'peak memory':>12} {'speedup':>8}")
+    for name, (time, peak) in results.items():
+        speedup = results["instances"][0] / time
+        print(f"{name:<10} {time * 1e3:>8.1f}ms {peak / 2**20:>10.1f}MB {speedup:>7.2f}x")
+    Session.remove()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,87 @@
+"""Time and memory of rendering a listing as JSON.
+
+Run with::
+
+  python -m benchmarks.serialize [rows]
+
+Compares walking the attributes of each loaded instance, the precomputed
+``JSONMixin.__json__`` accessors and ``stream_json``, which encodes the
+selected columns without building ORM instances, on an in-memory SQLite
+database.
+"""
+
+import json
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import DeclarativeBase
+
+from pyramid_basemodel import BaseMixin, Session
+from pyramid_basemodel.serialize import JSONMixin, select_columns, stream_json
+from pyramid_basemodel.slug import BaseSlugNameMixin
+
+
+class Base(DeclarativeBase):
+    """Declarative base of the benchmark models."""
+
+
+class Page(Base, BaseMixin, BaseSlugNameMixin, JSONMixin):
+    """Slugged page."""
+
+    __tablename__ = "pages"
+
+
+def naive() -> str:
+    """Load the instances and read every column attribute of each."""
+    rows = []
+    for page in Session.scalars(select(Page)):
+        rows.append({attr.key: getattr(page, attr.key) for attr in sa_inspect(Page).column_attrs})
+    return json.dumps(rows, default=str)
+
+
+def instances() -> str:
+    """Load the instances and render them with ``__json__``."""
+    return json.dumps([page.__json__() for page in Session.scalars(select(Page))])
+
+
+def streamed() -> str:
+    """Stream the selected columns."""
+    return "".join(stream_json(Session(), select_columns(Page)))
+
+
+def measure(render: Callable[[], Any]) -> tuple[float, int]:
+    """Return the best time and the peak memory of ``render``, with an empty identity map."""
+    time = min(timeit.repeat(render, setup=Session.expunge_all, number=1, repeat=5))
+    Session.expunge_all()
+    tracemalloc.start()
+    render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    Session.expunge_all()
+    return time, peak
+
+
+def main(rows: int = 20000) -> None:
+    """Print the time and memory of each way to render ``rows`` pages."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session.configure(bind=engine)
+    Session.execute(insert(Page), [{"slug": f"p{n}", "name": f"Page {n}"} for n in range(rows)])
+    assert json.loads(instances()) == json.loads(streamed())
+    results = {
+        name: measure(render) for name, render in (("naive", naive), ("__json__", instances), ("stream_json", streamed))
+    }
+    print(f"{'rendering':<12} {'time':>10} {'peak memory':>12} {'speedup':>8}")
+    for name, (time, peak) in results.items():
+        speedup = results["naive"][0] / time
+        print(f"{name:<12} {time * 1e3:>8.1f}ms {peak / 2**20:>10.1f}MB {speedup:>7.2f}x")
+    Session.remove()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,69 @@
+"""Insert throughput of ``BaseMixin`` against ``ServerDefaultBaseMixin``.
+
+Run with::
+
+  python -m benchmarks.server_defaults [rows]
+
+Each mode is measured with ORM unit of work inserts and with a single
+SQL level ``insert()`` executemany, on an in-memory SQLite database.
+"""
+
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import Unicode, create_engine, insert
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from pyramid_basemodel import BaseMixin, ServerDefaultBaseMixin
+
+
+def make_model(mixin: type[BaseMixin]) -> tuple[type[DeclarativeBase], Any]:
+    """Return a fresh declarative base and a model using ``mixin``."""
+
+    class Base(DeclarativeBase):
+        pass
+
+    class Item(Base, mixin):  # type: ignore[valid-type, misc]
+        __tablename__ = "items"
+        name: Mapped[str] = mapped_column(Unicode(32))
+
+    return Base, Item
+
+
+def orm_insert(session: Session, model: Any, rows: int) -> None:
+    """Insert ``rows`` instances through the unit of work."""
+    session.add_all([model(name=f"item-{n}") for n in range(rows)])
+    session.flush()
+
+
+def core_insert(session: Session, model: Any, rows: int) -> None:
+    """Insert ``rows`` with a single executemany ``insert()``."""
+    session.execute(insert(model), [{"name": f"item-{n}"} for n in range(rows)])
+
+
+def measure(mixin: type[BaseMixin], write: Callable[[Session, Any, int], None], rows: int) -> float:
+    """Return rows per second for ``write`` with models built on ``mixin``."""
+    base, model = make_model(mixin)
+    engine = create_engine("sqlite://")
+    base.metadata.create_all(engine)
+    with Session(engine) as session:
+        started = time.perf_counter()
+        write(session, model, rows)
+        session.commit()
+        elapsed = time.perf_counter() - started
+    engine.dispose()
+    return rows / elapsed
+
+
+def main(rows: int = 20000) -> None:
+    """Print insert throughput for both mixins."""
+    for write in (orm_insert, core_insert):
+        for mixin in (BaseMixin, ServerDefaultBaseMixin):
+            rate = measure(mixin, write, rows)
+            print(f"{write.__name__:<12} {mixin.__name__:<24} {rate:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
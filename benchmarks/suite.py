@@ -0,0 +1,253 @@
+"""Benchmark suite of the library's hot paths, compared against a baseline.
+
+Run with::
+
+  python -m benchmarks.suite [--db memory|file|both] [--baseline PATH] [--save-baseline PATH]
+
+Each case runs against fixed datasets on SQLite, in memory and in a file,
+and reports its operations per second, the queries and the peak memory of
+a single operation. Results are compared against the baseline, by default
+``benchmarks/baseline.json``: a case regresses when it runs more queries,
+or more than ``--tolerance`` slower. The exit status is 1 if any did.
+
+Timings only compare on the machine the baseline was saved on, query
+counts compare everywhere.
+"""
+
+import argparse
+import io
+import json
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+from sqlalchemy import ForeignKey, create_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from pyramid_basemodel import BaseMixin, Session, save
+from pyramid_basemodel.blob import Blob
+from pyramid_basemodel.container import BaseModelContainer, InstanceTraversalMixin
+from pyramid_basemodel.instrumentation import collect_query_stats, instrument_engine
+from pyramid_basemodel.slug import BaseSlugNameMixin
+from pyramid_basemodel.tree import BaseContentRoot
+from pyramid_basemodel.util import ensure_unique, get_all_matching
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+#: Nodes under the root, and the depth of the nested chain.
+NODES = 1000
+DEPTH = 8
+
+#: Blob sizes, by size class.
+BLOB_SIZES = {"1KB": 2**10, "64KB": 2**16, "1MB": 2**20}
+
+
+class Base(DeclarativeBase):
+    """Declarative base of the benchmark models."""
+
+
+class Node(Base, BaseMixin, BaseSlugNameMixin, InstanceTraversalMixin):
+    """Tree of slugged nodes."""
+
+    __tablename__ = "nodes"
+    _slug_is_unique = False
+
+    parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey("nodes.id"))
+    parent: Mapped[Optional["Node"]] = relationship(remote_side="Node.id", back_populates="children")
+    children: Mapped[list["Node"]] = relationship(back_populates="parent")
+
+
+class Page(Base, BaseMixin, BaseSlugNameMixin):
+    """Slugged page."""
+
+    __tablename__ = "pages"
+
+
+class Root(BaseContentRoot):
+    """Traversal root with a container of nodes."""
+
+    mapping = {"nodes": (Node, BaseModelContainer, {})}
+
+
+class Case(NamedTuple):
+    """A benchmarked operation, run ``number`` times per timing."""
+
+    name: str
+    run: Callable[[], Any]
+    number: int
+
+
+class Result(NamedTuple):
+    """Measurements of a case."""
+
+    ops_per_second: float
+    queries: int
+    peak_memory: int
+
+
+def setup() -> dict[str, Any]:
+    """Populate the bound database with the fixed datasets, return the objects the cases start from."""
+    Base.metadata.create_all(Session.get_bind())
+    Blob.metadata.create_all(Session.get_bind(), tables=[Blob.metadata.tables["blobs"]])
+    root = Node(slug="root", name="root")
+    Session.add_all([Node(slug=f"n{n}", name=f"n{n}", parent=root) for n in range(NODES)])
+    deepest = root
+    for depth in range(DEPTH):
+        deepest = Node(slug=f"c{depth}", name=f"c{depth}", parent=deepest)
+    Session.add(deepest)
+    collisions = ["taken", *(f"taken-{n}" for n in range(1, 20)), "popular", *(f"popular-{n}" for n in range(1, 5))]
+    Session.add_all([Page(slug=slug, name=slug) for slug in collisions])
+    Session.flush()
+    return {"root": root, "deepest_id": deepest.id}
+
+
+@contextmanager
+def rolled_back() -> Iterator[None]:
+    """Roll back what the operation wrote."""
+    savepoint = Session.begin_nested()
+    try:
+        yield
+    finally:
+        savepoint.rollback()
+
+
+def build_cases(data: dict[str, Any]) -> list[Case]:
+    """Return the benchmarked cases."""
+    root = data["root"]
+    container = BaseModelContainer(None, Node)
+    content_root = Root(None)
+    values = [f"n{n}" for n in range(NODES)]
+    path = [f"c{depth}" for depth in range(DEPTH)]
+
+    def nested_lookup() -> Any:
+        context = root
+        for key in path:
+            context = context[key]
+        return context
+
+    def parent_walk() -> Any:
+        Session.expire_all()
+        deepest: Any = Session.get(Node, data["deepest_id"])
+        return deepest.get_container()
+
+    def set_slug() -> None:
+        with rolled_back():
+            page = Page(name="Popular")
+            page.set_slug()
+            Session.add(page)
+            Session.flush()
+
+    def save_batch() -> None:
+        with rolled_back():
+            save([Page(slug=f"batch-{n}", name=f"batch {n}") for n in range(1000)])
+            Session.flush()
+
+    def blob_case(size: int) -> Callable[[], None]:
+        payload = bytes(size)
+
+        def blob_write_read() -> None:
+            with rolled_back():
+                blob = Blob.factory(f"blob-{size}", io.BytesIO(payload))
+                Session.add(blob)
+                Session.flush()
+                Session.expire(blob)
+                assert len(blob.value) == size
+
+        return blob_write_read
+
+    def naming() -> tuple[str, ...]:
+        return Node.class_name, Node.class_slug, Node.singular_class_slug, Node.plural_class_name
+
+    return [
+        Case("container __getitem__", lambda: container["n500"], 2000),
+        Case("content root traversal", lambda: content_root["nodes"]["n500"], 2000),
+        Case(f"nested lookup x{DEPTH}", nested_lookup, 200),
+        Case(f"__parent__ walk x{DEPTH}", parent_walk, 200),
+        Case("ensure_unique x20", lambda: ensure_unique(None, Page.query, Page.slug, "taken"), 100),
+        Case("set_slug", set_slug, 200),
+        Case("save 1000", save_batch, 5),
+        Case(f"get_all_matching {NODES}", lambda: get_all_matching(Node, "slug", values), 20),
+        *(Case(f"blob {name}", blob_case(size), 50) for name, size in BLOB_SIZES.items()),
+        Case("naming classproperties", naming, 2000),
+    ]
+
+
+def measure(case: Case) -> Result:
+    """Return the measurements of ``case``."""
+    case.run()
+    seconds = min(timeit.repeat(case.run, number=case.number, repeat=5)) / case.number
+    with collect_query_stats() as stats:
+        case.run()
+    tracemalloc.start()
+    case.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return Result(1 / seconds, stats.count, peak)
+
+
+def run(db: str) -> dict[str, Result]:
+    """Run every case on the ``db`` SQLite database, in ``memory`` or in a ``file``."""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine("sqlite://" if db == "memory" else f"sqlite:///{Path(directory) / 'db.sqlite'}")
+        instrument_engine(engine)
+        Session.configure(bind=engine)
+        try:
+            results = {f"{db}/{case.name}": measure(case) for case in build_cases(setup())}
+        finally:
+            Session.remove()
+            Session.configure(bind=None)
+            engine.dispose()
+    return results
+
+
+def compare(results: dict[str, Result], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Print ``results`` against ``baseline``, return the names of the cases that regressed."""
+    regressions = []
+    print(f"{'case':<36} {'ops/s':>10} {'baseline':>10} {'ratio':>6} {'queries':>8} {'peak':>9}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        ratio = result.ops_per_second / base["ops_per_second"] if base else None
+        regressed = base is not None and (
+            result.queries > base["queries"] or (ratio is not None and ratio < 1 - tolerance)
+        )
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<36} {result.ops_per_second:>10.1f} "
+            f"{base['ops_per_second'] if base else float('nan'):>10.1f} "
+            f"{ratio if ratio is not None else float('nan'):>6.2f} "
+            f"{result.queries:>8} {result.peak_memory / 2**10:>7.0f}KB"
+            f"{'  REGRESSED' if regressed else ''}"
+        )
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the suite, compare it to the baseline and optionally save the results as the new baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", choices=("memory", "file", "both"), default="both")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    args = parser.parse_args(argv)
+
+    results: dict[str, Result] = {}
+    for db in ("memory", "file") if args.db == "both" else (args.db,):
+        results.update(run(db))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    regressions = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        data = {name: result._asdict() for name, result in results.items()}
+        args.save_baseline.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed: {', '.join(regressions)}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
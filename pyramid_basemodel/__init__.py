@@ -25,28 +25,48 @@ __version__ = "0.7.1"
 __all__ = [
     "Base",
     "BaseMixin",
+    "ServerDefaultBaseMixin",
     "Session",
     "bind_engine",
 ]
 
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Mapping, Sequence
 from datetime import datetime
 from typing import Any, ClassVar, Generic, TypeVar
 
 import inflect
 from pyramid.config import Configurator
+from pyramid.exceptions import ConfigurationError
 from pyramid.path import DottedNameResolver
 from pyramid.settings import asbool
-from sqlalchemy import DateTime, Integer, engine_from_config
+from pyramid.tweens import EXCVIEW, INGRESS
+from sqlalchemy import DDL, DateTime, FetchedValue, Integer, Select, Table, engine_from_config, event, text
 from sqlalchemy.engine import Engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, scoped_session, sessionmaker
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import DeclarativeBase, Mapped, Mapper, class_mapper, mapped_column, scoped_session, sessionmaker
+from sqlalchemy.orm.attributes import instance_state
 from sqlalchemy.orm.scoping import QueryPropertyDescriptor
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.functions import FunctionElement
 from zope.interface import classImplements
 from zope.sqlalchemy import register
 
-from pyramid_basemodel.interfaces import IDeclarativeBase
-
-Session = scoped_session(sessionmaker())
+from pyramid_basemodel.cache import DEFAULT_TTL, FileBackend, LRUBackend, cache
+from pyramid_basemodel.conditional import conditional_view
+from pyramid_basemodel.instrumentation import get_query_stats, instrument_engine
+from pyramid_basemodel.interfaces import IDeclarativeBase, IPoolMetrics
+from pyramid_basemodel.pool import PoolMetrics, dispose_after_fork, warm_up_pool
+from pyramid_basemodel.profiling import profiling_view
+from pyramid_basemodel.records import load_records
+from pyramid_basemodel.routing import STRATEGIES, ReplicaRouter, RoutingSession
+from pyramid_basemodel.scope import early_release_view, use_request_scope
+from pyramid_basemodel.sharding import SHARD_STRATEGIES, ShardRouter, parse_rules, use_shards
+from pyramid_basemodel.tenancy import remove_after_requests
+from pyramid_basemodel.timeouts import limit_engine
+from pyramid_basemodel.util import get_all_matching, session_for
+
+Session = scoped_session(sessionmaker(class_=RoutingSession))
 register(Session)
 
 
@@ -58,6 +78,7 @@ classImplements(Base, IDeclarativeBase)
 
 #: Return type of the getter wrapped by :class:`classproperty`.
 T = TypeVar("T")
+M = TypeVar("M", bound="BaseMixin")
 
 
 class classproperty(Generic[T]):
@@ -102,6 +123,56 @@ class BaseMixin:
 
     query: ClassVar[QueryPropertyDescriptor] = Session.query_property()
 
+    @classmethod
+    def get(cls: type[M], ident: Any) -> M | None:
+        """Return the instance with the primary key ``ident``, or ``None``.
+
+        Instances already in the session's identity map are returned
+        without a query.
+        """
+        session = session_for(cls)
+        instance: M | None = session.get(cls, ident)
+        return instance
+
+    @classmethod
+    def get_many(cls: type[M], idents: Iterable[Any]) -> list[M]:
+        """Return the instances with the primary keys ``idents``, in the same order.
+
+        Instances already in the session's identity map are reused, the
+        others are loaded with a single ``IN`` query. Primary keys without a
+        matching row are left out. Primary keys are coerced to the column's
+        Python type first, e.g. ``"3"`` from a URL to ``3``, raising
+        ``ValueError`` when they don't convert.
+        """
+        session = session_for(cls)
+        mapper = class_mapper(cls)
+        try:
+            python_type = mapper.primary_key[0].type.python_type
+        except NotImplementedError:
+            python_type = object
+        idents = [ident if isinstance(ident, python_type) else python_type(ident) for ident in idents]
+        found: dict[Any, M] = {}
+        missing = set()
+        for ident in idents:
+            instance = session.identity_map.get(mapper.identity_key_from_primary_key((ident,)))
+            if instance is None or instance_state(instance).expired:
+                missing.add(ident)
+            else:
+                found[ident] = instance
+        if missing:
+            for instance in get_all_matching(cls, "id", missing):
+                found[instance.id] = instance
+        return [found[ident] for ident in idents if ident in found]
+
+    @classmethod
+    def records(cls, statement: Select[Any] | None = None) -> list[Any]:
+        """Return rows as read only records rather than instances, see ``pyramid_basemodel.records``.
+
+        :param statement: ``select()`` of the class' columns, e.g. from
+            ``serialize.select_columns``
+        """
+        return load_records(session_for(cls), cls, statement)
+
     @classproperty
     def class_name(cls: type["BaseMixin"]) -> str:
         """Determine class name based on the _class_name or the __tablename__.
@@ -157,6 +228,131 @@ class BaseMixin:
         return cls.__tablename__.replace("_", " ").title()
 
 
+class utcnow(FunctionElement[datetime]):
+    """Current UTC timestamp, rendered by the database.
+
+    Mirrors ``datetime.utcnow`` on the server side, so that rows written with
+    server defaults carry the same naive UTC values as the Python defaults.
+    Compiles on SQLite, PostgreSQL, MySQL, MariaDB and SQL Server only, as
+    ``CURRENT_TIMESTAMP`` is local time on others.
+    """
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _compile_utcnow(element: utcnow, compiler: SQLCompiler, **kw: Any) -> str:
+    raise CompileError(f"utcnow() has no UTC timestamp function for the {compiler.dialect.name} dialect.")
+
+
+@compiles(utcnow, "sqlite")
+def _compile_utcnow_sqlite(element: utcnow, compiler: SQLCompiler, **kw: Any) -> str:
+    return "STRFTIME('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+@compiles(utcnow, "postgresql")
+def _compile_utcnow_postgresql(element: utcnow, compiler: SQLCompiler, **kw: Any) -> str:
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow, "mysql")
+@compiles(utcnow, "mariadb")
+def _compile_utcnow_mysql(element: utcnow, compiler: SQLCompiler, **kw: Any) -> str:
+    return "UTC_TIMESTAMP(6)"
+
+
+@compiles(utcnow, "mssql")
+def _compile_utcnow_mssql(element: utcnow, compiler: SQLCompiler, **kw: Any) -> str:
+    return "SYSUTCDATETIME()"
+
+
+class ServerDefaultBaseMixin(BaseMixin):
+    """Base Model Mixin with database side defaults.
+
+    Same columns as :class:`BaseMixin`, but ``version``, ``created`` and
+    ``modified`` are filled in by the database, so that bulk ``insert()`` and
+    ``update()`` statements that skip the ORM still keep them correct.
+
+    Databases have no portable ``ON UPDATE`` clause, so ``modified`` is kept
+    current by a trigger, created together with the table on SQLite,
+    PostgreSQL, MySQL and MariaDB. Creating the table on other databases
+    raises ``CompileError``, as nothing would update ``modified``: set
+    ``_modified_trigger = False`` to manage it yourself.
+    """
+
+    #: Whether to create the ``modified`` update trigger with the table.
+    _modified_trigger: ClassVar[bool] = True
+
+    #: schema version
+    version: Mapped[int | None] = mapped_column("v", Integer, server_default=text("1"))
+
+    #: timestamp of object creation
+    created: Mapped[datetime | None] = mapped_column("c", DateTime, server_default=utcnow())
+
+    #: timestamp of object's latest update
+    modified: Mapped[datetime | None] = mapped_column(
+        "m", DateTime, server_default=utcnow(), server_onupdate=FetchedValue()
+    )
+
+
+def modified_trigger_ddl(table: Table) -> tuple[DDL, ...]:
+    """Return the DDL creating the ``modified`` update trigger for ``table``.
+
+    The trigger only touches the row when an update leaves ``modified``
+    unchanged, so explicitly assigned values are kept.
+    """
+    sqlite = DDL(
+        "CREATE TRIGGER %(table)s_m_onupdate AFTER UPDATE ON %(table)s FOR EACH ROW "
+        "WHEN NEW.m IS OLD.m "
+        "BEGIN UPDATE %(table)s SET m = STRFTIME('%%Y-%%m-%%d %%H:%%M:%%f', 'now') WHERE id = NEW.id; END"
+    ).execute_if(dialect="sqlite")  # type: ignore[no-untyped-call]
+    postgresql_function = DDL(
+        "CREATE OR REPLACE FUNCTION basemodel_touch_m() RETURNS trigger AS $$ "
+        "BEGIN IF NEW.m IS NOT DISTINCT FROM OLD.m THEN NEW.m = TIMEZONE('utc', CURRENT_TIMESTAMP); END IF; "
+        "RETURN NEW; END $$ LANGUAGE plpgsql"
+    ).execute_if(dialect="postgresql")  # type: ignore[no-untyped-call]
+    postgresql = DDL(
+        "CREATE TRIGGER %(table)s_m_onupdate BEFORE UPDATE ON %(table)s "
+        "FOR EACH ROW EXECUTE FUNCTION basemodel_touch_m()"
+    ).execute_if(dialect="postgresql")  # type: ignore[no-untyped-call]
+    # A single statement, so no ``DELIMITER`` is needed.
+    mysql = DDL(
+        "CREATE TRIGGER %(table)s_m_onupdate BEFORE UPDATE ON %(table)s FOR EACH ROW "
+        "SET NEW.m = IF(NEW.m <=> OLD.m, UTC_TIMESTAMP(6), NEW.m)"
+    ).execute_if(dialect=("mysql", "mariadb"))  # type: ignore[no-untyped-call,arg-type]
+    return sqlite, postgresql_function, postgresql, mysql
+
+
+#: Dialects ``modified_trigger_ddl`` creates the trigger for.
+MODIFIED_TRIGGER_DIALECTS = ("sqlite", "postgresql", "mysql", "mariadb")
+
+
+def _check_modified_trigger(table: Table, connection: Any, **kw: Any) -> None:
+    """Refuse creating the table where no trigger would keep ``modified`` current."""
+    dialect = connection.dialect.name
+    if dialect not in MODIFIED_TRIGGER_DIALECTS:
+        raise CompileError(
+            f"No modified trigger for the {dialect} dialect on {table.name}, set _modified_trigger = False "
+            "and keep modified current yourself."
+        )
+
+
+@event.listens_for(ServerDefaultBaseMixin, "after_mapper_constructed", propagate=True)
+def _attach_modified_trigger(mapper: Mapper[Any], cls: type[ServerDefaultBaseMixin]) -> None:
+    """Create the ``modified`` trigger along with each mapped table."""
+    table = mapper.local_table
+    if not cls._modified_trigger or not isinstance(table, Table) or "m" not in table.c:
+        return
+    # Single table inheritance maps several classes to the same table.
+    if table.info.get("basemodel.modified_trigger"):
+        return
+    table.info["basemodel.modified_trigger"] = True
+    event.listen(table, "before_create", _check_modified_trigger)
+    for ddl in modified_trigger_ddl(table):
+        event.listen(table, "after_create", ddl)
+
+
 def save(
     instance_or_instances: Any,
     session: scoped_session[Any] = Session,
@@ -179,17 +375,51 @@ def bind_engine(
     *,
     should_create: bool = False,
     should_drop: bool = False,
+    replicas: Sequence[Engine] = (),
+    replica_strategy: str = "round_robin",
+    fork_safe: bool = True,
+    shards: Mapping[str, Engine] | None = None,
+    shard_strategy: str = "hash",
+    shard_range_size: int = 1_000_000,
+    shard_rules: Mapping[str, str] | None = None,
 ) -> None:
     """Bind the ``session`` and ``base`` to the ``engine``.
 
     :param should_create: Triggers create tables on all models
     :param should_drop: Triggers drop on all tables
+    :param replicas: Read replica engines, requires a ``RoutingSession``
+    :param replica_strategy: How to pick a replica, see ``ReplicaRouter``
+    :param fork_safe: Drop the engines' pools in forked child processes
+    :param shards: Engines of the shards besides ``engine``, the ``primary``
+        shard, by name, see ``pyramid_basemodel.sharding``
+    :param shard_strategy: How to spread rows over the shards, see ``ShardRouter``
+    :param shard_range_size: Primary keys per range of the ``range`` strategy
+    :param shard_rules: Shard names by ``__tablename__`` of the tables they hold entirely
     """
-    session.configure(bind=engine)
-    if should_drop:
-        base.metadata.drop_all(engine)
-    if should_create:
-        base.metadata.create_all(engine)
+    if shards and replicas:
+        raise ValueError("Shards can't be combined with read replicas.")
+    engines = [engine, *replicas, *(shards or {}).values()]
+    if fork_safe:
+        for fork_engine in engines:
+            dispose_after_fork(fork_engine)
+    if shards:
+        router = ShardRouter(
+            {"primary": engine, **shards}, shard_strategy, range_size=shard_range_size, rules=shard_rules
+        )
+        use_shards(session, router)
+    else:
+        use_shards(session, None)
+    if replicas:
+        session.configure(bind=engine, router=ReplicaRouter(engine, replicas, strategy=replica_strategy))
+    else:
+        # Drop the router of a previous binding, which still names its replicas.
+        session.session_factory.kw.pop("router", None)
+        session.configure(bind=engine)
+    for writable_engine in [engine, *(shards or {}).values()]:
+        if should_drop:
+            base.metadata.drop_all(writable_engine)
+        if should_create:
+            base.metadata.create_all(writable_engine)
 
 
 def includeme(config: Configurator) -> None:
@@ -209,11 +439,109 @@ def includeme(config: Configurator) -> None:
     should_bind = asbool(settings.get("basemodel.should_bind_engine", True))
     should_create = asbool(settings.get("basemodel.should_create_all", False))
     should_drop = asbool(settings.get("basemodel.should_drop_all", False))
+    replica_strategy = settings.get("basemodel.replica_strategy", "round_robin")
+    if replica_strategy not in STRATEGIES:
+        raise ConfigurationError(f"basemodel.replica_strategy must be one of {', '.join(STRATEGIES)}.")
+    query_stats = asbool(settings.get("basemodel.query_stats", False))
+    if query_stats:
+        config.add_tween("pyramid_basemodel.instrumentation.query_stats_tween_factory", under=INGRESS)
+        config.add_request_method(get_query_stats, "query_stats", property=True)
+    config.add_view_deriver(conditional_view)
+    profiling = asbool(settings.get("basemodel.profiling", False))
+    if profiling:
+        # Under the query stats tween, to share its stats.
+        config.add_tween(
+            "pyramid_basemodel.profiling.profiling_tween_factory",
+            under=("pyramid_basemodel.instrumentation.query_stats_tween_factory", INGRESS),
+        )
+        config.add_view_deriver(profiling_view, under="rendered_view", over="mapped_view")
+    if asbool(settings.get("basemodel.read_only_safe_methods", False)):
+        config.add_tween(
+            "pyramid_basemodel.readonly.read_only_tween_factory",
+            under=("pyramid_tm.tm_tween_factory", INGRESS),
+            over=EXCVIEW,
+        )
+    cache_backend = settings.get("basemodel.cache")
+    if cache_backend:
+        cache_ttl = float(settings.get("basemodel.cache.ttl", DEFAULT_TTL))
+        if cache_backend == "lru":
+            backend: LRUBackend | FileBackend = LRUBackend(
+                int(settings.get("basemodel.cache.size", 1024)), ttl=cache_ttl
+            )
+        elif cache_backend == "file" and settings.get("basemodel.cache.directory"):
+            backend = FileBackend(settings["basemodel.cache.directory"], ttl=cache_ttl)
+        else:
+            raise ConfigurationError("basemodel.cache must be lru, or file with a basemodel.cache.directory.")
+        config.action(None, cache.configure, (backend,))
+    request_scope = asbool(settings.get("basemodel.request_scope", False))
+    if asbool(settings.get("basemodel.early_release", False)):
+        if not request_scope:
+            raise ConfigurationError("basemodel.early_release requires basemodel.request_scope.")
+        config.add_view_deriver(early_release_view, under="rendered_view", over="mapped_view")
+    if request_scope:
+        config.action(None, use_request_scope, (Session, config.registry))
+        config.add_tween("pyramid_basemodel.scope.request_scope_tween_factory", under=INGRESS)
+    statement_timeout = settings.get("basemodel.statement_timeout")
+    query_budget = settings.get("basemodel.query_budget")
+    if statement_timeout or query_budget:
+        # Above ``pyramid_tm``, which aborts the transaction of timed out requests.
+        config.add_tween("pyramid_basemodel.timeouts.query_budget_tween_factory", under=INGRESS)
+    if settings.get("basemodel.tenant_resolver"):
+        config.action(None, remove_after_requests, (Session,))
+        # Above ``pyramid_tm``, whose transaction runs in the tenant's schema.
+        config.add_tween("pyramid_basemodel.tenancy.tenant_tween_factory", under=INGRESS)
     if should_bind:
-        engine = engine_from_config(settings, "sqlalchemy.", **engine_kwargs)
-        config.action(
-            None,
-            bind_engine,
-            (engine,),
-            {"should_create": should_create, "should_drop": should_drop},
+        # Each ``sqlalchemy.replicas.<name>.`` prefix configures a replica
+        # engine and each ``sqlalchemy.shards.<name>.`` prefix a shard engine,
+        # while the remaining ``sqlalchemy.`` settings configure the primary.
+        replica_prefix = "sqlalchemy.replicas."
+        shard_prefix = "sqlalchemy.shards."
+        replica_names = sorted(
+            {key[len(replica_prefix) :].split(".")[0] for key in settings if key.startswith(replica_prefix)}
+        )
+        shard_names = sorted(
+            {key[len(shard_prefix) :].split(".")[0] for key in settings if key.startswith(shard_prefix)}
         )
+        primary_settings = {
+            key: value for key, value in settings.items() if not key.startswith((replica_prefix, shard_prefix))
+        }
+        engine = engine_from_config(primary_settings, "sqlalchemy.", **engine_kwargs)
+        replicas = [engine_from_config(settings, f"{replica_prefix}{name}.", **engine_kwargs) for name in replica_names]
+        shards = {name: engine_from_config(settings, f"{shard_prefix}{name}.", **engine_kwargs) for name in shard_names}
+        engines = {
+            "primary": engine,
+            **{f"replicas.{name}": replica for name, replica in zip(replica_names, replicas)},
+            **{f"shards.{name}": shard for name, shard in shards.items()},
+        }
+        bind_kwargs: dict[str, Any] = {"should_create": should_create, "should_drop": should_drop}
+        if replicas:
+            bind_kwargs["replicas"] = replicas
+            bind_kwargs["replica_strategy"] = replica_strategy
+        if shards:
+            if replicas:
+                raise ConfigurationError("sqlalchemy.shards can't be combined with sqlalchemy.replicas.")
+            shard_strategy = settings.get("basemodel.shard_strategy", "hash")
+            if shard_strategy not in SHARD_STRATEGIES:
+                raise ConfigurationError(f"basemodel.shard_strategy must be one of {', '.join(SHARD_STRATEGIES)}.")
+            bind_kwargs["shards"] = shards
+            bind_kwargs["shard_strategy"] = shard_strategy
+            bind_kwargs["shard_range_size"] = int(settings.get("basemodel.shard_range_size", 1_000_000))
+            bind_kwargs["shard_rules"] = parse_rules(settings.get("basemodel.shard_rules", ""))
+        if not asbool(settings.get("basemodel.fork_safe", True)):
+            bind_kwargs["fork_safe"] = False
+        if asbool(settings.get("basemodel.pool_metrics", False)):
+            metrics = PoolMetrics()
+            for name, named_engine in engines.items():
+                metrics.instrument(named_engine, name=name)
+            config.registry.registerUtility(metrics, IPoolMetrics)
+        if query_stats or profiling:
+            for named_engine in engines.values():
+                instrument_engine(named_engine)
+        if statement_timeout or query_budget:
+            for named_engine in engines.values():
+                limit_engine(named_engine, float(statement_timeout) / 1000 if statement_timeout else None)
+        config.action(None, bind_engine, (engine,), bind_kwargs)
+        pool_warmup = int(settings.get("basemodel.pool_warmup", 0))
+        if pool_warmup:
+            for named_engine in engines.values():
+                config.action(None, warm_up_pool, (named_engine, pool_warmup))
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+"""Index advice from the plans of captured statements.
+
+Capture the ``SELECT`` statements some code runs, e.g. container and
+traversal lookups, ``ensure_unique``, ``get_all_matching`` or
+relationship loads, then have the database explain them, with
+``EXPLAIN QUERY PLAN`` on SQLite and ``EXPLAIN`` on PostgreSQL, to find
+the statements scanning whole tables::
+
+  with capture_queries(engine) as captured:
+      root["pages"]["foo"]
+  for scan in find_full_scans(engine, captured):
+      print(scan.table, scan.statement, scan.suggestion)
+
+Each scan of a table the statement filters comes with an
+``IndexSuggestion``: the columns compared for equality, then a single
+range or sort column, and the few other columns the statement reads, to
+cover it. ``suggest_indexes`` returns them by table, with their ``spec``
+as an ``IndexSpec`` for ``util.table_args_indexes``.
+
+Suggestions already served by an index, which the planner skipped, e.g.
+on tables too small to bother, are left out.
+"""
+
+__all__ = [
+    "CapturedQuery",
+    "FullScan",
+    "IndexSuggestion",
+    "QueryCapture",
+    "capture_queries",
+    "explain",
+    "find_full_scans",
+    "suggest_indexes",
+]
+
+import logging
+import re
+import weakref
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, NamedTuple
+
+from sqlalchemy import Connection, Engine, Table, event, inspect
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import (
+    BinaryExpression,
+    BindParameter,
+    BooleanClauseList,
+    ClauseList,
+    ColumnClause,
+    ExpressionClauseList,
+    False_,
+    Grouping,
+    Null,
+    True_,
+)
+from sqlalchemy.sql.selectable import Select
+from sqlalchemy.sql.util import find_tables
+
+from pyramid_basemodel.util import IndexSpec
+
+logger = logging.getLogger(__name__)
+
+#: Most columns, besides the indexed ones, added to an index to cover a statement.
+MAX_COVERING_COLUMNS = 3
+
+#: Statement prefixes explaining the plan, by dialect.
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+#: Plan lines of full table scans, by dialect, naming the table or its alias.
+FULL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?"),
+    "postgresql": re.compile(r"Seq Scan on (?:\w+\.)?(\w+)(?: (\w+))?"),
+}
+
+EQUALITY_OPERATORS = (operators.eq, operators.in_op, operators.is_)
+RANGE_OPERATORS = (operators.lt, operators.le, operators.gt, operators.ge, operators.between_op, operators.like_op)
+
+_aliases = re.compile(r"(?:FROM|JOIN) (?:\w+\.)?(\w+) AS (\w+)", re.IGNORECASE)
+
+_current_capture: ContextVar["QueryCapture | None"] = ContextVar("basemodel_query_capture", default=None)
+
+#: Engines already listened to by ``capture_queries``.
+_capturing_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+class CapturedQuery(NamedTuple):
+    """A captured ``SELECT`` statement."""
+
+    statement: str
+    parameters: Any
+    select: Select[Any]
+
+
+class QueryCapture:
+    """``SELECT`` statements captured by ``capture_queries``, each kept once."""
+
+    def __init__(self) -> None:
+        """Start with no captured statements."""
+        self.queries: dict[str, CapturedQuery] = {}
+        self.counts: dict[str, int] = {}
+
+    def add(self, statement: str, parameters: Any, select: Select[Any]) -> None:
+        """Keep the first parameters of ``statement``, and count its executions."""
+        self.queries.setdefault(statement, CapturedQuery(statement, parameters, select))
+        self.counts[statement] = self.counts.get(statement, 0) + 1
+
+
+class IndexSuggestion(NamedTuple):
+    """An index likely to replace a full scan."""
+
+    table: str
+    columns: tuple[str, ...]
+    include: tuple[str, ...] = ()
+
+    @property
+    def spec(self) -> IndexSpec:
+        """Return the index in the form taken by ``util.table_args_indexes``.
+
+        Always an ``IndexSpec``, as ``table_args_indexes`` unpacks two
+        character column names, e.g. ``"ip"``, as ``(name, column)`` pairs.
+        """
+        return IndexSpec(self.columns, include=self.include)
+
+
+class FullScan(NamedTuple):
+    """A captured statement scanning a whole table."""
+
+    table: str
+    statement: str
+    plan: tuple[str, ...]
+    executions: int
+    suggestion: IndexSuggestion | None
+
+
+def _before_cursor_execute(conn: Connection, statement: str, parameters: Any, context: Any, **kw: Any) -> None:
+    capture = _current_capture.get()
+    compiled = getattr(context, "compiled", None)
+    if capture is None or kw["executemany"] or compiled is None:
+        return
+    compile_state = getattr(compiled, "compile_state", None)
+    select = getattr(compile_state, "statement", compiled.statement)
+    if isinstance(select, Select):
+        capture.add(statement, parameters, select)
+
+
+@contextmanager
+def capture_queries(engine: Engine, capture: QueryCapture | None = None) -> Iterator[QueryCapture]:
+    """Capture the ``SELECT`` statements ``engine`` executes within the block."""
+    if engine not in _capturing_engines:
+        _capturing_engines.add(engine)
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute, named=True)
+    if capture is None:
+        capture = QueryCapture()
+    token = _current_capture.set(capture)
+    try:
+        yield capture
+    finally:
+        _current_capture.reset(token)
+
+
+def explain(connection: Connection, statement: str, parameters: Any = ()) -> tuple[str, ...]:
+    """Return the lines of the plan of ``statement``."""
+    dialect = connection.dialect.name
+    if dialect not in EXPLAIN_PREFIXES:
+        raise ValueError(f"Explaining {dialect} statements isn't supported.")
+    result = connection.exec_driver_sql(EXPLAIN_PREFIXES[dialect] + statement, parameters)
+    # SQLite plans come as (id, parent, notused, detail) rows.
+    return tuple(str(row[-1]) for row in result)
+
+
+def _scanned_tables(dialect: str, statement: str, plan: tuple[str, ...]) -> list[str]:
+    aliases = {alias: table for table, alias in _aliases.findall(statement)}
+    scanned: list[str] = []
+    for line in plan:
+        match = FULL_SCAN_PATTERNS[dialect].search(line.strip())
+        if match:
+            name: str = match.group(1)
+            scanned.append(name if match.group(2) else aliases.get(name, name))
+    return scanned
+
+
+def _table_of(column: Any) -> Table | None:
+    table = getattr(column, "table", None)
+    while table is not None and not isinstance(table, Table):
+        table = getattr(table, "element", None)
+    return table
+
+
+def _is_value(clause: Any) -> bool:
+    """Whether ``clause`` is a bound parameter or a literal, or a list of them, e.g. of ``BETWEEN``."""
+    if isinstance(clause, Grouping):
+        return _is_value(clause.element)
+    if isinstance(clause, (ClauseList, ExpressionClauseList)):
+        return all(_is_value(element) for element in clause.clauses)
+    return isinstance(clause, (BindParameter, Null, True_, False_))
+
+
+def _criteria(select: Select[Any]) -> Iterator[tuple[Any, Any]]:
+    """Yield ``(operator, column)`` of the comparisons of a column to values in ``select``'s ``WHERE`` clause.
+
+    Only comparisons combined with ``AND`` count; comparing two columns, e.g.
+    ``modified > created``, can't use an index.
+    """
+    clauses: list[Any] = list(select._where_criteria)
+    while clauses:
+        clause = clauses.pop(0)
+        if isinstance(clause, Grouping):
+            clauses.append(clause.element)
+        elif isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+            clauses.extend(clause.clauses)
+        elif isinstance(clause, BinaryExpression):
+            for side, other in ((clause.left, clause.right), (clause.right, clause.left)):
+                if isinstance(side, ColumnClause) and _is_value(other):
+                    yield clause.operator, side
+
+
+def _suggest(select: Select[Any], table: Table, dialect: str) -> IndexSuggestion | None:
+    names = {column.name for column in table.c}
+    equal: list[str] = []
+    ranged: list[str] = []
+    for operator, column in _criteria(select):
+        if _table_of(column) is not table or column.name not in names or column.name in equal + ranged:
+            continue
+        if operator in EQUALITY_OPERATORS:
+            equal.append(column.name)
+        elif operator in RANGE_OPERATORS:
+            ranged.append(column.name)
+    if not equal and not ranged:
+        return None
+    columns = equal + ranged[:1]
+    if not ranged:
+        order_by = [getattr(clause, "element", clause) for clause in select._order_by_clauses]
+        if order_by and all(_table_of(column) is table for column in order_by):
+            columns += [column.name for column in order_by if column.name not in columns]
+    selected = [column.name for column in select.selected_columns if _table_of(column) is table]
+    # SQLite indexes hold the integer primary key, as the rowid, anyway.
+    skipped = {column.name for column in table.primary_key} if dialect == "sqlite" else set()
+    read = dict.fromkeys(selected + ranged[1:])
+    include = [name for name in read if name not in columns and name not in skipped]
+    if len(selected) == len(names) or len(include) > MAX_COVERING_COLUMNS:
+        include = []
+    return IndexSuggestion(table.name, tuple(columns), tuple(include))
+
+
+def _is_indexed(connection: Connection, table: Table, suggestion: IndexSuggestion) -> bool:
+    inspector = inspect(connection)
+    indexed = [tuple(index["column_names"]) for index in inspector.get_indexes(table.name, schema=table.schema)]
+    indexed += [
+        tuple(constraint["column_names"])
+        for constraint in inspector.get_unique_constraints(table.name, schema=table.schema)
+    ]
+    indexed.append(tuple(inspector.get_pk_constraint(table.name, schema=table.schema)["constrained_columns"]))
+    columns = suggestion.columns
+    return any(index[: len(columns)] == columns for index in indexed)
+
+
+def find_full_scans(engine: Engine, capture: QueryCapture) -> list[FullScan]:
+    """Explain the captured statements, returning their full table scans, most executed first."""
+    scans = []
+    with engine.connect() as connection:
+        dialect = connection.dialect.name
+        for query in capture.queries.values():
+            plan = explain(connection, query.statement, query.parameters)
+            tables = {table.name: table for table in find_tables(query.select) if isinstance(table, Table)}
+            for name in _scanned_tables(dialect, query.statement, plan):
+                table = tables.get(name)
+                if table is None:
+                    continue
+                suggestion = _suggest(query.select, table, dialect)
+                if suggestion is not None and _is_indexed(connection, table, suggestion):
+                    suggestion = None
+                scans.append(FullScan(name, query.statement, plan, capture.counts[query.statement], suggestion))
+                logger.info("Full scan of %s by: %s", name, query.statement)
+    return sorted(scans, key=lambda scan: scan.executions, reverse=True)
+
+
+def suggest_indexes(engine: Engine, capture: QueryCapture) -> dict[str, list[IndexSuggestion]]:
+    """Return the indexes suggested for the full scans of the captured statements, by table.
+
+    Suggestions whose columns lead another suggestion's are left out, the
+    longer index serving both.
+    """
+    suggestions: dict[str, list[IndexSuggestion]] = {}
+    for scan in find_full_scans(engine, capture):
+        if scan.suggestion is not None and scan.suggestion not in suggestions.setdefault(scan.table, []):
+            suggestions[scan.table].append(scan.suggestion)
+    return {
+        table: [
+            suggestion
+            for suggestion in table_suggestions
+            if not any(
+                other != suggestion and other.columns[: len(suggestion.columns)] == suggestion.columns
+                for other in table_suggestions
+            )
+        ]
+        for table, table_suggestions in suggestions.items()
+        if table_suggestions
+    }
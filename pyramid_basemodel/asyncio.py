@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""Asyncio counterparts of the scoped ``Session`` and its helpers.
+
+Provides a task scoped ``AsyncSession``, ``async_bind_engine`` and async
+versions of ``save``, ``get_or_create``, ``get_all_matching`` and
+``ensure_unique``, for use with an ``AsyncEngine``, e.g.::
+
+  engine = create_async_engine("sqlite+aiosqlite:///db.sqlite")
+  await async_bind_engine(engine, should_create=True)
+
+  instance = await get_or_create(MyModel, slug="foo")
+  await save(instance, flush=True)
+  await AsyncSession.commit()
+
+Unlike ``Session``, ``AsyncSession`` is not joined to the ``transaction``
+package, as its commit can't be awaited from ``pyramid_tm``, so commit and
+``await AsyncSession.remove()`` yourself, e.g. at the end of each request.
+"""
+
+__all__ = [
+    "AsyncSession",
+    "async_bind_engine",
+    "ensure_unique",
+    "get_all_matching",
+    "get_or_create",
+    "save",
+]
+
+import asyncio
+import logging
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from sqlalchemy import Select, bindparam, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_scoped_session, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase
+
+from pyramid_basemodel import Base
+from pyramid_basemodel.pool import dispose_after_fork
+from pyramid_basemodel.util import (
+    generate_random_digest,
+    is_column,
+    lookup_statement,
+    matching_statement,
+    unique_candidates,
+)
+
+logger = logging.getLogger(__name__)
+
+AsyncSession = async_scoped_session(async_sessionmaker(), scopefunc=asyncio.current_task)
+
+
+async def save(
+    instance_or_instances: Any,
+    session: async_scoped_session[Any] = AsyncSession,
+    *,
+    flush: bool = False,
+) -> None:
+    """Save model instance(s) to the db.
+
+    Both single and multiple instances can be saved. Code using an
+    ``AsyncSession`` can't rely on lazy autoflush, so ``flush`` allows
+    writing the instances out straight away.
+    """
+    v = instance_or_instances
+    if isinstance(v, list) or isinstance(v, tuple):
+        session.add_all(v)
+    else:
+        session.add(v)
+    if flush:
+        await session.flush()
+
+
+async def async_bind_engine(
+    engine: AsyncEngine,
+    session: async_scoped_session[Any] = AsyncSession,
+    base: type[DeclarativeBase] = Base,
+    *,
+    should_create: bool = False,
+    should_drop: bool = False,
+    fork_safe: bool = True,
+) -> None:
+    """Bind the ``session`` and ``base`` to the async ``engine``.
+
+    :param should_create: Triggers create tables on all models
+    :param should_drop: Triggers drop on all tables
+    :param fork_safe: Drop the engine's pool in forked child processes
+    """
+    if fork_safe:
+        dispose_after_fork(engine.sync_engine)
+    session.configure(bind=engine)
+    if should_drop or should_create:
+        async with engine.begin() as conn:
+            if should_drop:
+                await conn.run_sync(base.metadata.drop_all)
+            if should_create:
+                await conn.run_sync(base.metadata.create_all)
+
+
+async def ensure_unique(
+    self: Any,
+    statement: Select[Any],
+    property_: Any,
+    value: str,
+    gen_digest: Callable[..., str] = generate_random_digest,
+    session: async_scoped_session[Any] = AsyncSession,
+) -> str:
+    """Make sure slug is unique.
+
+    Like ``pyramid_basemodel.util.ensure_unique``, but takes a ``select()``
+    of the instances the value must be unique amongst, rather than a query.
+    """
+    statement = statement.where(property_ == bindparam("candidate"))
+    for value in unique_candidates(value, gen_digest=gen_digest):
+        existing_instances = (await session.scalars(statement, {"candidate": value})).all()
+        if all(instance == self for instance in existing_instances):
+            break
+    return value
+
+
+async def get_or_create(cls: Any, *, session: async_scoped_session[Any] = AsyncSession, **kwargs: Any) -> Any:
+    """Get or create a ``cls`` instance using the ``kwargs`` provided."""
+    if all(value is not None and is_column(cls, name) for name, value in kwargs.items()):
+        result = await session.scalars(lookup_statement(cls, tuple(sorted(kwargs)), first=True), kwargs)
+    else:
+        result = await session.scalars(select(cls).filter_by(**kwargs).limit(1))
+    instance = result.first()
+    if not instance:
+        instance = cls(**kwargs)
+    return instance
+
+
+async def get_all_matching(
+    cls: Any,
+    column_name: str,
+    values: Iterable[Any],
+    session: async_scoped_session[Any] = AsyncSession,
+) -> list[Any]:
+    """Return all instances of ``cls`` where ``column_name`` matches one of ``values``."""
+    result = await session.scalars(matching_statement(cls, column_name), {column_name: list(values)})
+    return list(result.unique())
@@ -36,7 +36,7 @@ __all__ = [
 import logging
 from http import HTTPStatus
 from tempfile import NamedTemporaryFile, _TemporaryFileWrapper
-from typing import IO
+from typing import IO, Any
 
 import requests
 from sqlalchemy.orm import Mapped, mapped_column
@@ -123,6 +123,6 @@ class Blob(Base, BaseMixin):
         # Return the file.
         return f
 
-    def __json__(self) -> dict[str, str]:
+    def __json__(self, request: Any = None) -> dict[str, str]:
         """Create a JSONable representation."""
         return {"name": self.name}
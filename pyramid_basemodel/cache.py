@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+
+"""Second level cache of model instances.
+
+Caches the column values of ``CachedMixin`` models by primary key, under
+their ``get_object_id`` key, and by unique columns. Cached instances are
+merged into the session without a query, e.g.::
+
+  class Country(Base, BaseMixin, CachedMixin):
+      __tablename__ = "countries"
+      code = Column(Unicode(2), unique=True)
+
+  Country.cached_get(1)
+  Country.cached_get_by(code="PL")
+
+The keys of the instances a session flushes are collected and invalidated
+once its transaction commits, bulk ``update()`` and ``delete()`` statements
+invalidate the whole table. ``LRUBackend`` keeps entries in process, so
+other processes only notice changes once the entries expire;
+``FileBackend`` shares them, and their invalidation, between processes,
+e.g. in ``/dev/shm``. Entries expire after ``DEFAULT_TTL`` seconds unless
+``basemodel.cache.ttl`` says otherwise, which bounds how stale entries
+changed outside of the application, or by other processes, get.
+
+Enable it with::
+
+  basemodel.cache = lru
+  basemodel.cache.size = 1024
+  basemodel.cache.ttl = 300
+
+or::
+
+  basemodel.cache = file
+  basemodel.cache.directory = /dev/shm/myapp
+"""
+
+__all__ = [
+    "CacheBackend",
+    "CachedMixin",
+    "FileBackend",
+    "LRUBackend",
+    "SecondLevelCache",
+    "cache",
+    "is_unique",
+]
+
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterable
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import UniqueConstraint, event
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import ORMExecuteState, Session, SessionTransaction, UOWTransaction, make_transient_to_detached
+
+from pyramid_basemodel.routing import RoutingSession
+from pyramid_basemodel.tenancy import tenant_namespace
+from pyramid_basemodel.util import STATEMENT_CACHE_SIZE, get_object_id, lookup_statement, session_for
+
+logger = logging.getLogger(__name__)
+
+#: ``session.info`` key collecting the ``(namespace, key)`` pairs to
+#: invalidate on commit, a ``None`` key standing for the whole namespace.
+INVALIDATE_KEY = "basemodel.cache.invalidate"
+
+#: Seconds after which entries expire by default.
+DEFAULT_TTL = 300.0
+
+
+class CacheBackend(ABC):
+    """Store picklable values by namespace and key.
+
+    :param ttl: seconds after which entries expire, ``None`` to keep them
+        until invalidated or evicted
+    """
+
+    def __init__(self, ttl: float | None = DEFAULT_TTL) -> None:
+        """Initialize the backend."""
+        self.ttl = ttl
+
+    def expires(self) -> float | None:
+        """Return the expiry time of an entry stored now."""
+        return None if self.ttl is None else time.monotonic() + self.ttl
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Any:
+        """Return the value stored under ``key``, or ``None``."""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """Store ``value`` under ``key``."""
+
+    @abstractmethod
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        """Remove the entries of ``keys``."""
+
+    @abstractmethod
+    def clear(self, namespace: str) -> None:
+        """Remove all entries of ``namespace``."""
+
+
+class LRUBackend(CacheBackend):
+    """Keep up to ``size`` entries in process, evicting the least recently used."""
+
+    def __init__(self, size: int = 1024, ttl: float | None = DEFAULT_TTL) -> None:
+        """Initialize the backend."""
+        super().__init__(ttl=ttl)
+        self.size = size
+        self._entries: OrderedDict[tuple[str, str], tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Any:
+        """Return the value stored under ``key``, or ``None``."""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[namespace, key]
+                return None
+            self._entries.move_to_end((namespace, key))
+            return value
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """Store ``value`` under ``key``."""
+        with self._lock:
+            self._entries[namespace, key] = (self.expires(), value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        """Remove the entries of ``keys``."""
+        with self._lock:
+            for key in keys:
+                self._entries.pop((namespace, key), None)
+
+    def clear(self, namespace: str) -> None:
+        """Remove all entries of ``namespace``."""
+        with self._lock:
+            for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == namespace]:
+                del self._entries[entry_key]
+
+
+class FileBackend(CacheBackend):
+    """Keep entries as pickles in ``directory``, shared by all processes using it.
+
+    Pickles are loaded from the directory, so it must only be writable by
+    the application. Put it on a ``tmpfs``, e.g. ``/dev/shm``, to keep the
+    entries in shared memory.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str], ttl: float | None = DEFAULT_TTL) -> None:
+        """Initialize the backend."""
+        super().__init__(ttl=ttl)
+        self.directory = Path(directory)
+
+    def expires(self) -> float | None:
+        """Return the expiry time of an entry stored now, comparable across processes."""
+        return None if self.ttl is None else time.time() + self.ttl
+
+    def path(self, namespace: str, key: str) -> Path:
+        """Return the file holding the entry of ``key``."""
+        return self.directory / namespace / hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, key: str) -> Any:
+        """Return the value stored under ``key``, or ``None``."""
+        path = self.path(namespace, key)
+        try:
+            with path.open("rb") as file:
+                expires, value = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires is not None and expires < time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return value
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """Store ``value`` under ``key``, replacing the file atomically."""
+        path = self.path(namespace, key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".")
+        except OSError:
+            # E.g. the namespace being cleared concurrently, caching is best effort.
+            logger.debug("Could not cache %s", key, exc_info=True)
+            return
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump((self.expires(), value), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_name, path)
+        except OSError:
+            logger.debug("Could not cache %s", key, exc_info=True)
+            Path(tmp_name).unlink(missing_ok=True)
+
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        """Remove the entries of ``keys``."""
+        for key in keys:
+            self.path(namespace, key).unlink(missing_ok=True)
+
+    def clear(self, namespace: str) -> None:
+        """Remove all entries of ``namespace``."""
+        shutil.rmtree(self.directory / namespace, ignore_errors=True)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def is_unique(cls: Any, names: frozenset[str]) -> bool:
+    """Whether the columns ``names`` of ``cls`` identify a single row."""
+    table = sa_inspect(cls).local_table
+    return any(
+        {column.key for column in columns} == names
+        for columns in chain(
+            ([column] for column in table.columns if column.unique or column.primary_key),
+            (index.columns for index in table.indexes if index.unique),
+            (constraint.columns for constraint in table.constraints if isinstance(constraint, UniqueConstraint)),
+        )
+    )
+
+
+class SecondLevelCache:
+    """Look ``CachedMixin`` instances up in a ``backend`` before the database.
+
+    Without a backend, lookups go straight to the session.
+    """
+
+    def __init__(self, backend: CacheBackend | None = None) -> None:
+        """Initialize the cache."""
+        self.backend = backend
+
+    def configure(self, backend: CacheBackend | None) -> None:
+        """Use ``backend``, or disable the cache with ``None``."""
+        self.backend = backend
+
+    def get(self, cls: Any, ident: Any, session: Session) -> Any:
+        """Return the ``cls`` instance with the primary key ``ident``, or ``None``."""
+        if self.backend is None:
+            return session.get(cls, ident)
+        instance = session.identity_map.get(sa_inspect(cls).identity_key_from_primary_key((ident,)))
+        if instance is not None:
+            return instance
+        values = self.backend.get(tenant_namespace(cls.__tablename__), f"{cls.__tablename__}#{ident}")
+        if values is not None:
+            return self.merge(cls, values, session)
+        instance = session.get(cls, ident)
+        if instance is not None:
+            self.store(instance, session)
+        return instance
+
+    def get_by(self, cls: Any, session: Session, **kwargs: Any) -> Any:
+        """Return the ``cls`` instance matching the unique column values in ``kwargs``, or ``None``."""
+        if not is_unique(cls, frozenset(kwargs)):
+            raise ValueError(f"{', '.join(sorted(kwargs))} don't identify a single {cls.__name__}.")
+        if self.backend is None:
+            return session.scalars(lookup_statement(cls, tuple(sorted(kwargs)), first=True), kwargs).first()
+        namespace = tenant_namespace(cls.__tablename__)
+        key = f"{namespace}?{'&'.join(f'{name}={value!r}' for name, value in sorted(kwargs.items()))}"
+        ident = self.backend.get(namespace, key)
+        if ident is not None:
+            instance = self.get(cls, ident, session)
+            # The entry outlives changes of the unique values, so check them.
+            if instance is not None and all(getattr(instance, name) == value for name, value in kwargs.items()):
+                return instance
+            self.backend.delete(namespace, [key])
+        instance = session.scalars(lookup_statement(cls, tuple(sorted(kwargs)), first=True), kwargs).first()
+        if instance is not None and self.store(instance, session):
+            self.backend.set(namespace, key, instance.id)
+        return instance
+
+    def merge(self, cls: Any, values: dict[str, Any], session: Session) -> Any:
+        """Merge an instance with the cached column ``values`` into ``session``, without a query."""
+        instance = sa_inspect(cls).class_manager.new_instance()
+        for name, value in values.items():
+            setattr(instance, name, value)
+        make_transient_to_detached(instance)
+        return session.merge(instance, load=False)
+
+    def store(self, instance: Any, session: Session) -> bool:
+        """Cache the column values of ``instance``, unless it has uncommitted changes."""
+        if self.backend is None:
+            return False
+        namespace, key = tenant_namespace(instance.__tablename__), get_object_id(instance)
+        if instance in session.dirty or (namespace, key) in session.info.get(INVALIDATE_KEY, ()):
+            return False
+        values = {attr.key: getattr(instance, attr.key) for attr in sa_inspect(instance).mapper.column_attrs}
+        self.backend.set(namespace, key, values)
+        return True
+
+    def invalidate(self, keys: Iterable[tuple[str, str | None]]) -> None:
+        """Remove the entries of ``(namespace, key)`` pairs, ``None`` keys clearing their namespace."""
+        if self.backend is None:
+            return
+        keys = set(keys)
+        cleared = {namespace for namespace, key in keys if key is None}
+        for namespace in cleared:
+            self.backend.clear(namespace)
+        by_namespace: dict[str, list[str]] = {}
+        for namespace, key in keys:
+            if key is not None and namespace not in cleared:
+                by_namespace.setdefault(namespace, []).append(key)
+        for namespace, namespace_keys in by_namespace.items():
+            self.backend.delete(namespace, namespace_keys)
+
+
+#: The cache used by ``CachedMixin`` models, configured by ``includeme``.
+cache = SecondLevelCache()
+
+
+class CachedMixin:
+    """Look instances up in the second level ``cache``."""
+
+    __tablename__: str
+
+    @classmethod
+    def cached_get(cls, ident: Any) -> Any:
+        """Return the instance with the primary key ``ident``, or ``None``."""
+        return cache.get(cls, ident, session_for(cls))
+
+    @classmethod
+    def cached_get_by(cls, **kwargs: Any) -> Any:
+        """Return the instance matching unique column values, or ``None``."""
+        return cache.get_by(cls, session_for(cls), **kwargs)
+
+
+def _invalidate_later(session: Session, keys: Iterable[tuple[str, str | None]]) -> None:
+    session.info.setdefault(INVALIDATE_KEY, set()).update(keys)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_flushed(session: Session, flush_context: UOWTransaction) -> None:
+    """Collect the keys of the flushed cached instances."""
+    _invalidate_later(
+        session,
+        (
+            (tenant_namespace(instance.__tablename__), get_object_id(instance))
+            for instance in chain(session.new, session.dirty, session.deleted)
+            if isinstance(instance, CachedMixin)
+        ),
+    )
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _collect_bulk(orm_execute_state: ORMExecuteState) -> None:
+    """Invalidate whole tables on bulk ``update()`` and ``delete()`` statements."""
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        _invalidate_later(
+            orm_execute_state.session,
+            (
+                (tenant_namespace(mapper.class_.__tablename__), None)
+                for mapper in orm_execute_state.all_mappers
+                if issubclass(mapper.class_, CachedMixin)
+            ),
+        )
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    """Invalidate the entries changed by the committed transaction."""
+    keys = session.info.pop(INVALIDATE_KEY, None)
+    if keys:
+        cache.invalidate(keys)
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _forget_rolled_back(session: Session, transaction: SessionTransaction) -> None:
+    """Forget the keys collected by a transaction that was rolled back."""
+    if transaction.parent is None:
+        session.info.pop(INVALIDATE_KEY, None)
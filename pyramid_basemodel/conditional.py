@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""Conditional ``GET`` requests from ``BaseMixin`` columns.
+
+Views configured with ``conditional=True``, or decorated with
+``conditional``, answer ``GET`` and ``HEAD`` requests with a weak ``ETag``
+and a ``Last-Modified`` header derived from their context, and with a
+``304 Not Modified``, without running the view, when the client already
+has that version::
+
+  config.add_view(page_view, context=Page, renderer="page.mako", conditional=True)
+
+The validators of a ``BaseMixin`` context come from its ``version`` and
+``modified`` columns, read with a column only query when the instance
+hasn't loaded them. Those of a ``BaseModelContainer`` aggregate its model's
+rows: their ``max(modified)`` and their count.
+"""
+
+__all__ = [
+    "Validators",
+    "conditional",
+    "conditional_view",
+    "validators_for",
+]
+
+import hashlib
+import logging
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+from pyramid.httpexceptions import HTTPNotModified
+from pyramid.interfaces import IViewDeriverInfo
+from pyramid.request import Request
+from pyramid.response import Response
+from sqlalchemy import func, select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import InstanceState
+
+from pyramid_basemodel.interfaces import IModelContainer
+from pyramid_basemodel.util import session_for
+
+logger = logging.getLogger(__name__)
+
+#: Request methods answered conditionally.
+CONDITIONAL_METHODS = ("GET", "HEAD")
+
+
+class Validators(NamedTuple):
+    """Cache validators of a resource."""
+
+    etag: str
+    last_modified: datetime | None
+
+
+def _validators(*parts: Any, modified: datetime | None) -> Validators:
+    etag = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return Validators(etag, modified.replace(tzinfo=timezone.utc, microsecond=0) if modified else None)
+
+
+def _instance_validators(context: Any) -> Validators | None:
+    state = sa_inspect(context, raiseerr=False)
+    if not isinstance(state, InstanceState) or state.identity is None:
+        return None
+    cls = state.class_
+    if {"version", "modified"} & state.unloaded:
+        # Read the two columns rather than refreshing the whole instance.
+        statement = select(cls.version, cls.modified).where(cls.id == state.identity[0])
+        row = session_for(cls).execute(statement).first()
+        if row is None:
+            return None
+        version, modified = row
+    else:
+        version, modified = context.version, context.modified
+    return _validators(cls.__tablename__, state.identity[0], version, modified, modified=modified)
+
+
+def _container_validators(context: Any) -> Validators:
+    cls = context.model_cls
+    statement = select(func.max(cls.modified), func.count()).select_from(cls)
+    modified, count = session_for(cls).execute(statement).one()
+    return _validators(cls.__tablename__, modified, count, modified=modified)
+
+
+def validators_for(context: Any) -> Validators | None:
+    """Return the validators of a ``BaseMixin`` instance or ``BaseModelContainer``, if it is one."""
+    if IModelContainer.providedBy(context):
+        return _container_validators(context)
+    # Checked on the class, reading an expired instance's attributes would refresh it.
+    if hasattr(type(context), "modified") and hasattr(type(context), "version"):
+        return _instance_validators(context)
+    return None
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """Whether the client making ``request`` already has the resource with ``validators``."""
+    if request.if_none_match:
+        return validators.etag in request.if_none_match
+    if request.if_modified_since and validators.last_modified:
+        return bool(validators.last_modified <= request.if_modified_since)
+    return False
+
+
+def conditional(view: Callable[[Any, Request], Response]) -> Callable[[Any, Request], Response]:
+    """Answer conditional requests of ``view``'s context, see the module docstring."""
+
+    def conditional_wrapper(context: Any, request: Request) -> Response:
+        if request.method not in CONDITIONAL_METHODS:
+            return view(context, request)
+        validators = validators_for(context)
+        if validators is None:
+            return view(context, request)
+        if is_not_modified(request, validators):
+            response: Response = HTTPNotModified()
+        else:
+            response = view(context, request)
+            if response.status_int != 200:
+                return response
+        response.etag = (validators.etag, False)
+        response.last_modified = validators.last_modified
+        return response
+
+    return conditional_wrapper
+
+
+def conditional_view(view: Callable[..., Any], info: IViewDeriverInfo) -> Callable[..., Any]:
+    """Apply ``conditional`` to the views configured with ``conditional=True``."""
+    if info.options.get("conditional"):
+        return conditional(view)
+    return view
+
+
+conditional_view.options = ("conditional",)  # type: ignore[attr-defined]
@@ -15,19 +15,28 @@ __all__ = [
 import logging
 import re
 from collections.abc import Callable
-from typing import Any, ClassVar, cast
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, ClassVar, cast
 
 from pyramid.interfaces import ILocation
 from pyramid.request import Request
 from pyramid.security import ALL_PERMISSIONS, Allow, Authenticated, Deny, Everyone
+from sqlalchemy import Select, bindparam, select
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.exc import InvalidRequestError
-from sqlalchemy.orm import Query, scoped_session
+from sqlalchemy.orm import MANYTOONE, Query, scoped_session
 from sqlalchemy.orm.scoping import QueryPropertyDescriptor
 from zope.interface import alsoProvides, implementer
 
 from pyramid_basemodel import BaseMixin, Session
+from pyramid_basemodel.cache import CachedMixin, is_unique
 from pyramid_basemodel.interfaces import IModelContainer
 from pyramid_basemodel.root import BaseRoot
+from pyramid_basemodel.sharding import ShardedRoutingSession, get_sharded
+from pyramid_basemodel.util import STATEMENT_CACHE_SIZE, is_column, lookup_statement, session_for
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import async_scoped_session
 
 valid_slug = re.compile(r"^[.\w-]{1,64}$", re.U)
 logger = logging.getLogger(__name__)
@@ -91,9 +100,37 @@ class BaseModelContainer(BaseRoot):
 
     def get_child(self, key: str) -> Any:
         """Query for and return the child instance, if found."""
-        column = getattr(self.model_cls, self.property_name)
-        query = self.model_cls.query.filter(column == key)
-        return query.first()
+        model_cls: Any = self.model_cls
+        session = session_for(model_cls)
+        is_cached = isinstance(model_cls, type) and issubclass(model_cls, CachedMixin)
+        if is_cached and is_unique(model_cls, frozenset((self.property_name,))):
+            return model_cls.cached_get_by(**{self.property_name: key})
+        if isinstance(session, ShardedRoutingSession) and is_column(model_cls, self.property_name):
+            return get_sharded(session, model_cls, self.property_name, key)
+        if not is_column(model_cls, self.property_name):
+            column = getattr(model_cls, self.property_name)
+            return model_cls.query.filter(column == key).first()
+        statement = lookup_statement(model_cls, (self.property_name,), first=True)
+        return session.scalars(statement, {self.property_name: key}).first()
+
+    async def aget_child(self, key: str, session: "async_scoped_session[Any] | None" = None) -> Any:
+        """Query for and return the child instance, if found, through an ``AsyncSession``.
+
+        :param session: the async scoped session, ``pyramid_basemodel.asyncio.AsyncSession`` by default
+        """
+        if session is None:
+            # Imported here, not to load the asyncio machinery for sync users.
+            from pyramid_basemodel.asyncio import AsyncSession
+
+            session = AsyncSession
+        model_cls: Any = self.model_cls
+        if is_column(model_cls, self.property_name):
+            statement = lookup_statement(model_cls, (self.property_name,), first=True)
+            result = await session.scalars(statement, {self.property_name: key})
+        else:
+            column = getattr(model_cls, self.property_name)
+            result = await session.scalars(select(model_cls).where(column == key).limit(1))
+        return result.first()
 
     def __getitem__(self, key: str) -> Any:
         """Lookup model instance by key."""
@@ -135,6 +172,30 @@ class BaseModelContainer(BaseRoot):
             self.validator = self._validator
 
 
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def child_lookup_statement(cls: Any, key_name: str) -> tuple[Select[Any], tuple[str, ...]] | None:
+    """Return a cached statement looking up a child of a ``cls`` instance by ``key_name``.
+
+    Along with the statement, returns the attributes of the parent instance
+    to bind as its ``parent_<n>`` parameters. Returns ``None`` unless
+    ``cls.parent`` is a plain many to one relationship and ``key_name`` a
+    column.
+    """
+    if not is_column(cls, key_name):
+        return None
+    mapper = sa_inspect(cls)
+    relationship = mapper.relationships.get("parent")
+    if relationship is None or relationship.direction is not MANYTOONE or relationship.secondary is not None:
+        return None
+    criteria = []
+    parent_keys = []
+    for n, (local, remote) in enumerate(relationship.local_remote_pairs or ()):
+        criteria.append(local == bindparam(f"parent_{n}"))
+        parent_keys.append(relationship.mapper.get_property_by_column(remote).key)
+    criteria.append(getattr(cls, key_name) == bindparam("key"))
+    return select(cls).where(*criteria).limit(1), tuple(parent_keys)
+
+
 class InstanceTraversalMixin:
     """Provide a default __parent__ implementation for traversal."""
 
@@ -221,9 +282,7 @@ class InstanceTraversalMixin:
             raise KeyError(key)
 
         try:
-            query = self._base_child_query
-            query = query.filter_by(parent=self).filter(column == key)
-            context = query.first()
+            context = self._get_child(key)
             if not context:
                 raise KeyError(key)
         except InvalidRequestError as err:
@@ -235,3 +294,20 @@ class InstanceTraversalMixin:
 
         # Return the context, having set the parent and flagged as locatable.
         return self.locatable(context, key)
+
+    def _get_child(self, key: str) -> Any:
+        """Query for and return the child instance, if found."""
+        cls: Any = self.__class__
+        lookup = None
+        # A customised ``_base_child_query`` has to be queried as is.
+        if cls._base_child_query is InstanceTraversalMixin._base_child_query:
+            lookup = child_lookup_statement(cls, self.traversal_key_name)
+        if lookup is not None:
+            statement, parent_keys = lookup
+            params = {f"parent_{n}": getattr(self, parent_key) for n, parent_key in enumerate(parent_keys)}
+            # Unsaved parents have no key to bind, the query flushes them first.
+            if None not in params.values():
+                params["key"] = key
+                return session_for(cls).scalars(statement, params).first()
+        column = getattr(cls, self.traversal_key_name)
+        return self._base_child_query.filter_by(parent=self).filter(column == key).first()
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""Materialized path trees.
+
+``MaterializedPathMixin`` extends ``InstanceTraversalMixin`` with a ``path``
+column, holding the ids of an instance's ancestors, root first, e.g.
+``/1/5/`` for a grandchild of ``1``, and a ``depth`` column. Both are kept
+up to date as instances are inserted, moved to another parent and, as
+deleting a parent moves its children to the top level, deleted::
+
+  class Node(Base, BaseMixin, BaseSlugNameMixin, MaterializedPathMixin):
+      __tablename__ = "nodes"
+
+      parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey("nodes.id"))
+      parent: Mapped[Optional["Node"]] = relationship(remote_side="Node.id", back_populates="children")
+      children: Mapped[list["Node"]] = relationship(back_populates="parent")
+
+``ancestors()``, ``descendants()`` and ``subtree_count()`` then run a single
+query whatever the depth, and ``__parent__`` loads an instance's whole
+lineage along with its parent.
+
+Tables that already hold rows get their paths with ``rebuild_paths()``.
+
+Paths are limited to ``PATH_LENGTH`` characters, which holds a few dozen
+levels of ids; saving deeper instances raises ``ValueError``. Models
+needing deeper trees override ``path`` with a longer ``String``.
+"""
+
+__all__ = [
+    "MaterializedPathMixin",
+]
+
+import logging
+from typing import Any, TypeVar
+
+from sqlalchemy import Connection, Integer, String, bindparam, event, func, literal, select, update
+from sqlalchemy.orm import Mapped, Mapper, attributes, mapped_column, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from pyramid_basemodel.container import InstanceTraversalMixin
+from pyramid_basemodel.util import session_for
+
+logger = logging.getLogger(__name__)
+
+#: Separator of the ids in a path.
+SEPARATOR = "/"
+
+#: Length of the ``path`` column.
+PATH_LENGTH = 255
+
+P = TypeVar("P", bound="MaterializedPathMixin")
+
+
+class MaterializedPathMixin(InstanceTraversalMixin):
+    """Traversal mixin keeping the path of each instance from the root.
+
+    Models mixing it in also mix in ``BaseMixin`` and define ``parent`` and
+    ``children`` relationships, see the module docstring.
+    """
+
+    #: ids of the ancestors, root first, e.g. ``/1/5/``
+    path: Mapped[str] = mapped_column(String(PATH_LENGTH), default=SEPARATOR, nullable=False, index=True)
+
+    #: number of ancestors
+    depth: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    #: Provided by ``BaseMixin`` and the model when the mixin is used.
+    id: Mapped[int]
+    parent: Any
+
+    @property
+    def subtree_path(self) -> str:
+        """Return the path prefix shared by all the descendants."""
+        return f"{self.path}{self.id}{SEPARATOR}"
+
+    @property
+    def ancestor_ids(self) -> list[int]:
+        """Return the ids of the ancestors, root first."""
+        return [int(ident) for ident in self.path.strip(SEPARATOR).split(SEPARATOR) if ident]
+
+    def ancestors(self: P) -> list[P]:
+        """Return the ancestors, root first, with a single query.
+
+        Ancestors already in the session are reused.
+        """
+        return type(self).get_many(self.ancestor_ids)  # type: ignore[attr-defined, no-any-return]
+
+    def descendants(self: P, depth: int | None = None) -> list[P]:
+        """Return the descendants, breadth first, with a single query.
+
+        :param depth: only return descendants down to this many levels
+            below the instance, e.g. ``1`` for its children
+        """
+        cls = type(self)
+        statement = select(cls).where(cls.path.startswith(self.subtree_path))
+        if depth is not None:
+            statement = statement.where(cls.depth <= self.depth + depth)
+        statement = statement.order_by(cls.depth, cls.id)
+        return list(session_for(cls).scalars(statement))
+
+    def subtree_count(self) -> int:
+        """Return the number of descendants, not counting the instance itself."""
+        cls = type(self)
+        statement = select(func.count()).select_from(cls).where(cls.path.startswith(self.subtree_path))
+        return int(session_for(cls).scalar(statement) or 0)
+
+    @property
+    def __parent__(self) -> Any:
+        """Return the parent, having loaded the whole lineage with a single query."""
+        if not hasattr(self, "_located_parent") and self.path != SEPARATOR:
+            if "parent" in attributes.instance_state(self).unloaded:
+                # Link the lineage up, so walking it doesn't load it again.
+                lineage = [*self.ancestors(), self]
+                for parent, child in zip(lineage, lineage[1:]):
+                    if "parent" in attributes.instance_state(child).unloaded:
+                        set_committed_value(child, "parent", parent)
+        return InstanceTraversalMixin.__parent__.fget(self)  # type: ignore[attr-defined]
+
+    @classmethod
+    def rebuild_paths(cls) -> None:
+        """Recompute the path and depth of every row, e.g. once the mixin is added to a model with rows."""
+        session = session_for(cls)
+        table: Any = cls.__table__  # type: ignore[attr-defined]
+        parent_id = _parent_column(cls)
+        parents = {ident: parent for ident, parent in session.execute(select(table.c.id, parent_id))}
+        paths: dict[Any, str] = {}
+
+        def path_of(ident: Any) -> str:
+            if ident not in paths:
+                parent = parents[ident]
+                paths[ident] = SEPARATOR if parent is None else f"{path_of(parent)}{parent}{SEPARATOR}"
+            return paths[ident]
+
+        values = [
+            {"ident": ident, "path": path_of(ident), "depth": path_of(ident).count(SEPARATOR) - 1} for ident in parents
+        ]
+        for value in values:
+            _check_length(cls, len(value["path"]), value["ident"])
+        if values:
+            statement = update(table).where(table.c.id == bindparam("ident"))
+            session.execute(statement.values(path=bindparam("path"), depth=bindparam("depth")), values)
+        session.expire_all()
+
+
+def _parent_column(cls: Any) -> Any:
+    return next(iter(cls.parent.property.local_columns))
+
+
+def _check_length(cls: Any, path_length: int, target: Any) -> None:
+    """Raise ``ValueError`` when paths of ``path_length`` don't fit the ``path`` column of ``cls``."""
+    length = getattr(cls.__table__.c.path.type, "length", None)
+    if length is not None and path_length > length:
+        raise ValueError(
+            f"A path of {target!r} would be {path_length} characters long, "
+            f"the path column of {cls.__name__} holds {length}: the tree is too deep."
+        )
+
+
+def _parent_path(target: MaterializedPathMixin, parent_key: str) -> tuple[str, int]:
+    # Read from the foreign key, kept in sync with ``parent`` by the flush and
+    # also up to date when only it has been set.
+    parent_id = getattr(target, parent_key)
+    session = object_session(target)
+    if parent_id is None or session is None:
+        return SEPARATOR, 0
+    parent = session.get(type(target), parent_id)
+    if parent is None:
+        return SEPARATOR, 0
+    _check_length(type(target), len(parent.subtree_path), target)
+    return parent.subtree_path, parent.depth + 1
+
+
+def _parent_key(mapper: Mapper[Any], target: MaterializedPathMixin) -> str:
+    return mapper.get_property_by_column(_parent_column(type(target))).key
+
+
+@event.listens_for(MaterializedPathMixin, "before_insert", propagate=True)
+def _set_path(mapper: Mapper[Any], connection: Connection, target: MaterializedPathMixin) -> None:
+    """Set the path of new instances from their parent, inserted before them."""
+    target.path, target.depth = _parent_path(target, _parent_key(mapper, target))
+
+
+@event.listens_for(MaterializedPathMixin, "before_update", propagate=True)
+def _move_subtree(mapper: Mapper[Any], connection: Connection, target: MaterializedPathMixin) -> None:
+    """Update the path of moved instances, and of their descendants."""
+    parent_key = _parent_key(mapper, target)
+    if not attributes.get_history(target, parent_key).has_changes():
+        return
+    old_prefix = target.subtree_path
+    path, depth = _parent_path(target, parent_key)
+    if path.startswith(old_prefix):
+        raise ValueError(f"Can't move {target!r} under its own descendant.")
+    if (path, depth) == (target.path, target.depth):
+        return
+    delta = depth - target.depth
+    table: Any = mapper.local_table
+    new_prefix = f"{path}{target.id}{SEPARATOR}"
+    if len(new_prefix) > len(old_prefix):
+        longest = connection.scalar(
+            select(func.max(func.length(table.c.path))).where(table.c.path.startswith(old_prefix))
+        )
+        # Descendants' paths grow as much as the moved instance's.
+        if longest is not None:
+            _check_length(type(target), longest - len(old_prefix) + len(new_prefix), target)
+    target.path, target.depth = path, depth
+    connection.execute(
+        update(table)
+        .where(table.c.path.startswith(old_prefix))
+        .values(
+            path=literal(new_prefix) + func.substr(table.c.path, len(old_prefix) + 1),
+            depth=table.c.depth + delta,
+        )
+    )
+    # Bring the descendants already loaded in line with their rows.
+    session = object_session(target)
+    if session is None:
+        return
+    for instance in list(session.identity_map.values()):
+        if not isinstance(instance, MaterializedPathMixin) or instance.__table__ is not table:  # type: ignore[attr-defined]
+            continue
+        state = attributes.instance_state(instance)
+        if "path" in state.unloaded or not instance.path.startswith(old_prefix):
+            continue
+        set_committed_value(instance, "path", new_prefix + instance.path[len(old_prefix) :])
+        set_committed_value(instance, "depth", instance.depth + delta)
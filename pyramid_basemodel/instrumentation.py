@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+"""Per request query instrumentation.
+
+Times every statement executed by an instrumented engine and collects them
+in a ``QueryStats`` for the request being handled, to report the query
+count, total database time, the slowest statements and statements
+repeated with the same shape, the usual sign of an N+1 lookup.
+
+Enable it with the ``basemodel.query_stats`` setting, which makes
+``includeme`` instrument the engines and add the ``query_stats_tween``::
+
+  basemodel.query_stats = true
+  # statements slower than this many milliseconds are logged
+  basemodel.query_stats.slow_threshold = 100
+  # statement shapes executed at least this many times are logged
+  basemodel.query_stats.n_plus_one_threshold = 5
+  # add a ``Server-Timing`` response header
+  basemodel.query_stats.server_timing = true
+
+The stats of the current request are available as ``request.query_stats``,
+or ``current_query_stats()`` where there's no request at hand.
+"""
+
+__all__ = [
+    "QueryRecord",
+    "QueryStats",
+    "collect_query_stats",
+    "current_query_stats",
+    "instrument_engine",
+    "query_stats_tween_factory",
+    "statement_shape",
+]
+
+import logging
+import re
+import time
+import weakref
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, NamedTuple
+
+from pyramid.registry import Registry
+from pyramid.request import Request
+from pyramid.response import Response
+from pyramid.settings import asbool
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine, ExceptionContext
+
+logger = logging.getLogger(__name__)
+
+#: ``request.environ`` key holding the request's ``QueryStats``.
+ENVIRON_KEY = "basemodel.query_stats"
+
+#: ``Connection.info`` key holding the start times of running statements.
+START_KEY = "basemodel.query_start"
+
+_current_stats: ContextVar["QueryStats | None"] = ContextVar("basemodel_query_stats", default=None)
+
+#: Engines already handled by ``instrument_engine``.
+_instrumented_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+_whitespace = re.compile(r"\s+")
+# Parameter lists of expanding ``IN`` clauses, in any DBAPI paramstyle.
+_in_list = re.compile(r"\((\s*(\?|%s|%\(\w+\)s|:\w+|\$\d+)\s*,)+\s*(\?|%s|%\(\w+\)s|:\w+|\$\d+)\s*\)")
+
+
+class QueryRecord(NamedTuple):
+    """A single executed statement."""
+
+    statement: str
+    parameters: Any
+    duration: float
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize ``statement`` so that lookups differing only by parameters match."""
+    statement = _whitespace.sub(" ", statement).strip()
+    return _in_list.sub("(?)", statement)
+
+
+class QueryStats:
+    """Statements executed while handling a request."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        """Start with no recorded statements."""
+        self.records: list[QueryRecord] = []
+        self.started = clock()
+        self.clock = clock
+
+    def record(self, statement: str, parameters: Any, duration: float) -> QueryRecord:
+        """Record an executed ``statement``."""
+        query_record = QueryRecord(statement, parameters, duration)
+        self.records.append(query_record)
+        return query_record
+
+    @property
+    def count(self) -> int:
+        """Return the number of executed statements."""
+        return len(self.records)
+
+    @property
+    def total_time(self) -> float:
+        """Return the total time, in seconds, spent executing statements."""
+        return sum(query_record.duration for query_record in self.records)
+
+    @property
+    def elapsed(self) -> float:
+        """Return the time, in seconds, since the stats were started."""
+        return self.clock() - self.started
+
+    def slowest(self, n: int = 5) -> list[QueryRecord]:
+        """Return the ``n`` slowest statements, slowest first."""
+        return sorted(self.records, key=lambda query_record: query_record.duration, reverse=True)[:n]
+
+    def repeated(self, threshold: int = 5) -> dict[str, int]:
+        """Return statement shapes executed at least ``threshold`` times, with their count."""
+        shapes = Counter(statement_shape(query_record.statement) for query_record in self.records)
+        return {shape: count for shape, count in shapes.most_common() if count >= threshold}
+
+    def as_dict(self, slowest: int = 5, repeated_threshold: int = 5) -> dict[str, Any]:
+        """Return a JSON friendly summary."""
+        return {
+            "count": self.count,
+            "total_time": self.total_time,
+            "slowest": [
+                {"statement": query_record.statement, "duration": query_record.duration}
+                for query_record in self.slowest(slowest)
+            ],
+            "repeated": self.repeated(repeated_threshold),
+        }
+
+
+def current_query_stats() -> QueryStats | None:
+    """Return the ``QueryStats`` collecting statements in the current context."""
+    return _current_stats.get()
+
+
+@contextmanager
+def collect_query_stats(stats: QueryStats | None = None) -> Iterator[QueryStats]:
+    """Collect the statements executed within the block in ``stats``."""
+    if stats is None:
+        stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _before_cursor_execute(conn: Connection, **kw: Any) -> None:
+    conn.info.setdefault(START_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Connection, statement: str, parameters: Any, **kw: Any) -> None:
+    started = conn.info[START_KEY].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, parameters, time.perf_counter() - started)
+
+
+def _handle_error(exception_context: ExceptionContext) -> None:
+    # Failed statements never reach ``after_cursor_execute``, but still took time.
+    conn = exception_context.connection
+    if conn is None or exception_context.statement is None or not conn.info.get(START_KEY):
+        return
+    started = conn.info[START_KEY].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(exception_context.statement, exception_context.parameters, time.perf_counter() - started)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time the statements executed by ``engine`` into the current ``QueryStats``."""
+    if engine in _instrumented_engines:
+        return
+    _instrumented_engines.add(engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute, named=True)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute, named=True)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def get_query_stats(request: Request) -> QueryStats | None:
+    """Return the ``QueryStats`` of ``request``, used as ``request.query_stats``."""
+    stats: QueryStats | None = request.environ.get(ENVIRON_KEY)
+    return stats
+
+
+def report_query_stats(
+    request: Request,
+    stats: QueryStats,
+    slow_threshold: float,
+    n_plus_one_threshold: int,
+) -> None:
+    """Log the ``stats`` of ``request``, with its slow and repeated statements."""
+    logger.debug("%s %s ran %d queries in %.1fms", request.method, request.path, stats.count, stats.total_time * 1000)
+    for query_record in stats.records:
+        if query_record.duration >= slow_threshold:
+            logger.warning(
+                "Slow query (%.1fms) in %s %s: %s",
+                query_record.duration * 1000,
+                request.method,
+                request.path,
+                query_record.statement,
+            )
+    for shape, count in stats.repeated(n_plus_one_threshold).items():
+        logger.warning("Possible N+1: %d queries in %s %s: %s", count, request.method, request.path, shape)
+
+
+def add_server_timing(response: Response, stats: QueryStats) -> None:
+    """Add the database time of ``stats`` to the ``Server-Timing`` header."""
+    timing = f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries"'
+    existing = response.headers.get("Server-Timing")
+    response.headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+
+
+def query_stats_tween_factory(
+    handler: Callable[[Request], Response], registry: Registry
+) -> Callable[[Request], Response]:
+    """Return a tween collecting the ``QueryStats`` of each request."""
+    settings = registry.settings or {}
+    slow_threshold = float(settings.get("basemodel.query_stats.slow_threshold", 100)) / 1000
+    n_plus_one_threshold = int(settings.get("basemodel.query_stats.n_plus_one_threshold", 5))
+    server_timing = asbool(settings.get("basemodel.query_stats.server_timing", True))
+
+    def query_stats_tween(request: Request) -> Response:
+        with collect_query_stats() as stats:
+            request.environ[ENVIRON_KEY] = stats
+            try:
+                response = handler(request)
+            finally:
+                report_query_stats(request, stats, slow_threshold, n_plus_one_threshold)
+        if server_timing:
+            add_server_timing(response, stats)
+        return response
+
+    return query_stats_tween
@@ -6,6 +6,7 @@ __all__ = [
     "IDeclarativeBase",
     "IModel",
     "IModelContainer",
+    "IPoolMetrics",
 ]
 
 from zope.interface import Interface
@@ -21,3 +22,7 @@ class IModel(IDeclarativeBase):
 
 class IModelContainer(Interface):
     """Provided by model containers."""
+
+
+class IPoolMetrics(Interface):
+    """Provided by the connection pool metrics utility."""
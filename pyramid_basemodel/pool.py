@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""Connection pool warm-up, fork safety and metrics.
+
+``warm_up_pool`` opens connections ahead of the first requests, so they
+don't pay the connection setup latency. ``PoolMetrics`` counts checkouts,
+checkins, connects and overflow use through pool events, and the time
+spent waiting for a connection, to help size ``pool_size`` and
+``max_overflow``. Overflow checkouts are the ones made while more than
+``pool_size`` connections were checked out, as counted by the same events,
+rather than read from the pool, whose state other threads keep changing.
+
+``dispose_after_fork`` makes forked workers (e.g. gunicorn ``--preload`` or
+uWSGI without ``lazy-apps``) drop the pool inherited from the master, rather
+than share its connections, so that each worker connects on its own. Pools
+warmed up in the master are warmed up again in each worker.
+
+When ``basemodel.pool_metrics`` is enabled, ``includeme`` registers a
+``PoolMetrics`` utility, available through ``get_pool_metrics``::
+
+  get_pool_metrics(request.registry).snapshot()
+"""
+
+__all__ = [
+    "PoolMetrics",
+    "dispose_after_fork",
+    "get_pool_metrics",
+    "warm_up_pool",
+]
+
+import logging
+import os
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from contextlib import ExitStack
+from typing import Any
+
+from pyramid.registry import Registry
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import PoolProxiedConnection, QueuePool
+from zope.interface import implementer
+
+from pyramid_basemodel.interfaces import IPoolMetrics
+
+logger = logging.getLogger(__name__)
+
+#: Engines already handled by ``dispose_after_fork``.
+_fork_safe_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+#: Connections opened by ``warm_up_pool``, by engine, opened again in forked children.
+_warmed_up_engines: "weakref.WeakKeyDictionary[Engine, int]" = weakref.WeakKeyDictionary()
+
+
+def dispose_after_fork(engine: Engine) -> None:
+    """Make forked child processes drop the connection pool of ``engine``.
+
+    The child replaces the inherited pool with a fresh one, without closing
+    the inherited connections, which still belong to the parent. New
+    connections are then made lazily, on first use in the child, but for
+    pools ``warm_up_pool`` warmed up, which are warmed up again.
+    """
+    if not hasattr(os, "register_at_fork") or engine in _fork_safe_engines:
+        return
+    _fork_safe_engines.add(engine)
+    engine_ref = weakref.ref(engine)
+
+    def after_in_child() -> None:
+        child_engine = engine_ref()
+        if child_engine is None:
+            return
+        child_engine.dispose(close=False)
+        connections = _warmed_up_engines.get(child_engine)
+        if connections:
+            try:
+                warm_up_pool(child_engine, connections)
+            except Exception:
+                # The child still connects on first use.
+                logger.exception("Failed warming up %r after fork", child_engine.url)
+
+    os.register_at_fork(after_in_child=after_in_child)
+
+
+def warm_up_pool(engine: Engine, connections: int) -> int:
+    """Open up to ``connections`` pooled connections and return them to the pool.
+
+    For a ``QueuePool`` the number is capped at its ``pool_size``, as
+    overflow connections are closed rather than kept when checked in.
+
+    :returns: the number of connections opened
+    """
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        connections = min(connections, pool.size())
+    with ExitStack() as stack:
+        for _ in range(connections):
+            stack.enter_context(engine.connect())
+    _warmed_up_engines[engine] = connections
+    logger.info("Warmed up %d connections for %r", connections, engine.url)
+    return connections
+
+
+class EngineCounters:
+    """Counters collected for a single engine."""
+
+    def __init__(self) -> None:
+        """Start with every counter at zero."""
+        self.reset()
+
+    def reset(self) -> None:
+        """Zero every counter."""
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.overflow_checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters as a dict."""
+        return dict(vars(self))
+
+
+@implementer(IPoolMetrics)
+class PoolMetrics:
+    """Collect pool metrics of one or more engines."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        """Initialize an empty metrics collector."""
+        self.clock = clock
+        self._engines: dict[str, Engine] = {}
+        self._counters: dict[str, EngineCounters] = {}
+        self._lock = threading.Lock()
+
+    def instrument(self, engine: Engine, name: str = "primary") -> None:
+        """Start collecting metrics for ``engine`` under ``name``."""
+        counters = self._counters[name] = EngineCounters()
+        self._engines[name] = engine
+        lock = self._lock
+
+        def on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+            with lock:
+                counters.connects += 1
+
+        def on_checkout(dbapi_connection: Any, connection_record: Any, connection_proxy: Any) -> None:
+            pool = engine.pool
+            # A ``pool_size`` of 0 means no limit, hence no overflow.
+            size = pool.size() if isinstance(pool, QueuePool) else 0
+            with lock:
+                counters.checkouts += 1
+                counters.checked_out += 1
+                counters.peak_checked_out = max(counters.peak_checked_out, counters.checked_out)
+                if size and counters.checked_out > size:
+                    counters.overflow_checkouts += 1
+
+        def on_checkin(dbapi_connection: Any, connection_record: Any) -> None:
+            with lock:
+                counters.checkins += 1
+                counters.checked_out -= 1
+
+        def on_invalidate(dbapi_connection: Any, connection_record: Any, exception: Any) -> None:
+            with lock:
+                counters.invalidations += 1
+
+        event.listen(engine, "connect", on_connect)
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "checkin", on_checkin)
+        event.listen(engine, "invalidate", on_invalidate)
+
+        # Pool events fire once a connection is acquired, so the wait is
+        # timed around ``raw_connection``, which ``Engine.connect`` goes
+        # through. The instance attribute survives ``engine.dispose()``.
+        raw_connection = engine.raw_connection
+        clock = self.clock
+
+        def timed_raw_connection() -> PoolProxiedConnection:
+            started = clock()
+            try:
+                return raw_connection()
+            finally:
+                waited = clock() - started
+                with lock:
+                    counters.wait_count += 1
+                    counters.wait_total += waited
+                    counters.wait_max = max(counters.wait_max, waited)
+
+        engine.raw_connection = timed_raw_connection  # type: ignore[method-assign]
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Return the current counters and pool status, keyed by engine name."""
+        snapshot = {}
+        with self._lock:
+            for name, counters in self._counters.items():
+                data = counters.as_dict()
+                data["wait_mean"] = data["wait_total"] / data["wait_count"] if data["wait_count"] else 0.0
+                pool = self._engines[name].pool
+                data["pool"] = pool.status()
+                if isinstance(pool, QueuePool):
+                    data["pool_size"] = pool.size()
+                    data["overflow"] = pool.overflow()
+                snapshot[name] = data
+        return snapshot
+
+    def reset(self) -> None:
+        """Zero the counters, keeping the connections currently checked out."""
+        with self._lock:
+            for counters in self._counters.values():
+                checked_out = counters.checked_out
+                counters.reset()
+                counters.checked_out = counters.peak_checked_out = checked_out
+
+
+def get_pool_metrics(registry: Registry) -> PoolMetrics | None:
+    """Return the ``PoolMetrics`` registered by ``includeme``, if enabled."""
+    metrics: PoolMetrics | None = registry.queryUtility(IPoolMetrics)
+    return metrics
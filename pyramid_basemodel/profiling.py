@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""On demand profiling of single requests.
+
+``profiling_tween_factory`` runs the requests that ask for it under
+``cProfile``, and saves the profile along with the statements they executed
+and their traversal path, from the root through the containers to the
+context, e.g. ``BaseContentRoot`` → ``BaseModelContainer:pages`` →
+``Page:foo``, as recorded by the ``profiling_view`` deriver.
+
+Enable it with::
+
+  basemodel.profiling = true
+  basemodel.profiling.secret = <a long random string>
+  basemodel.profiling.directory = /var/tmp/myapp/profiles
+  # oldest profiles are removed once the directory grows past this many MB
+  basemodel.profiling.max_size = 100
+  # also save query strings and bound parameters, which may be sensitive
+  basemodel.profiling.include_parameters = false
+
+A request is profiled when its ``X-Basemodel-Profile`` header, or its
+``basemodel_profile`` query parameter, holds ``sign_path(secret, path)``,
+which expires after an hour by default. Each profile is written as a
+``.prof`` file, readable with ``pstats`` or e.g. ``snakeviz``, next to a
+``.json`` file holding the request, its traversal path and statements.
+
+``cProfile`` can only profile one request at a time, requests asking for
+a profile while another one is profiled are handled without.
+"""
+
+__all__ = [
+    "HEADER",
+    "PARAM",
+    "profiling_tween_factory",
+    "profiling_view",
+    "rotate",
+    "sign_path",
+    "traversal_path",
+]
+
+import cProfile
+import hashlib
+import hmac
+import json
+import logging
+import re
+import threading
+import time
+from collections.abc import Callable
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from pyramid.exceptions import ConfigurationError
+from pyramid.interfaces import IViewDeriverInfo
+from pyramid.location import lineage
+from pyramid.registry import Registry
+from pyramid.request import Request
+from pyramid.response import Response
+from pyramid.settings import asbool
+
+from pyramid_basemodel.instrumentation import QueryRecord, collect_query_stats, current_query_stats
+
+logger = logging.getLogger(__name__)
+
+#: Request header and query parameter carrying the signature.
+HEADER = "X-Basemodel-Profile"
+PARAM = "basemodel_profile"
+
+#: ``request.environ`` key holding the traversal path of a profiled request.
+TRAVERSAL_KEY = "basemodel.profiling.traversal"
+
+#: Seconds after which signatures expire by default.
+SIGNATURE_TTL = 3600
+
+#: Held while a request is profiled, ``cProfile`` profilers can't run concurrently.
+_profiling_lock = threading.Lock()
+
+_unsafe = re.compile(r"[^\w.-]+")
+
+
+def _digest(secret: str, path: str, expires: int) -> str:
+    payload = f"{expires}:{path}".encode("utf-8")
+    return hmac.new(secret.encode("utf-8"), payload, hashlib.sha256).hexdigest()
+
+
+def sign_path(secret: str, path: str, ttl: int = SIGNATURE_TTL) -> str:
+    """Return the signature asking to profile requests to ``path`` for the next ``ttl`` seconds."""
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_digest(secret, path, expires)}"
+
+
+def is_profiling_requested(request: Request, secret: str) -> bool:
+    """Whether ``request`` carries a valid signature of its path, that hasn't expired."""
+    signature = request.headers.get(HEADER) or request.GET.get(PARAM) or ""
+    expires, _, digest = signature.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(digest, _digest(secret, request.path, int(expires)))
+
+
+def traversal_path(request: Request) -> list[str]:
+    """Return the ``class:name`` of the request's context and its parents, root first."""
+    context = getattr(request, "context", None)
+    if context is None:
+        return []
+    locations = reversed(list(lineage(context)))
+    return [f"{type(location).__name__}:{getattr(location, '__name__', '')}".rstrip(":") for location in locations]
+
+
+def profiling_view(view: Callable[..., Any], info: IViewDeriverInfo) -> Callable[..., Any]:
+    """Record the traversal path of profiled requests.
+
+    The path is read while the view's transaction is still active, the
+    instances it's made of may not be readable once it has ended.
+    """
+
+    def wrapper_view(context: Any, request: Request) -> Any:
+        if TRAVERSAL_KEY in request.environ:
+            request.environ[TRAVERSAL_KEY] = traversal_path(request)
+        return view(context, request)
+
+    return wrapper_view
+
+
+def rotate(directory: Path, max_size: int) -> None:
+    """Remove the oldest files in ``directory`` until it holds at most ``max_size`` bytes."""
+    files = sorted((path.stat().st_mtime, path.stat().st_size, path) for path in directory.iterdir() if path.is_file())
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= max_size:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def save_profile(
+    directory: Path,
+    request: Request,
+    profile: cProfile.Profile,
+    records: list[QueryRecord],
+    duration: float,
+    *,
+    include_parameters: bool = False,
+) -> Path:
+    """Write the profile and statements of ``request`` to ``directory``, return the profile's path.
+
+    :param include_parameters: also write the query string and the bound
+        parameters of the statements, left out as they may be sensitive
+    """
+    path = request.environ.get(TRAVERSAL_KEY) or []
+    tag = _unsafe.sub("_", "-".join(path[1:]) or request.path.strip("/") or "root")[:100]
+    stem = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{tag}"
+    profile.dump_stats(directory / f"{stem}.prof")
+    log = {
+        "method": request.method,
+        "url": request.url if include_parameters else request.path_url,
+        "traversal": path,
+        "duration": duration,
+        "statements": [
+            record._asdict() if include_parameters else record._replace(parameters=None)._asdict() for record in records
+        ],
+    }
+    (directory / f"{stem}.json").write_text(json.dumps(log, indent=2, default=repr))
+    return directory / f"{stem}.prof"
+
+
+def profiling_tween_factory(handler: Callable[[Request], Response], registry: Registry) -> Callable[..., Response]:
+    """Profile the requests carrying a signature of their path."""
+    settings = registry.settings
+    secret = settings.get("basemodel.profiling.secret")
+    directory_setting = settings.get("basemodel.profiling.directory")
+    if not secret or not directory_setting:
+        raise ConfigurationError("basemodel.profiling requires basemodel.profiling.secret and .directory.")
+    directory = Path(directory_setting)
+    directory.mkdir(parents=True, exist_ok=True)
+    max_size = int(float(settings.get("basemodel.profiling.max_size", 100)) * 2**20)
+    include_parameters = asbool(settings.get("basemodel.profiling.include_parameters", False))
+
+    def profiling_tween(request: Request) -> Response:
+        if not is_profiling_requested(request, secret):
+            return handler(request)
+        if not _profiling_lock.acquire(blocking=False):
+            logger.warning("Not profiling %s %s, another request is being profiled", request.method, request.path)
+            return handler(request)
+        try:
+            return profile_request(request)
+        finally:
+            _profiling_lock.release()
+
+    def profile_request(request: Request) -> Response:
+        request.environ[TRAVERSAL_KEY] = None
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        # Share the stats of the query stats tween, when enabled.
+        shared = current_query_stats()
+        start = shared.count if shared is not None else 0
+        with nullcontext(shared) if shared is not None else collect_query_stats() as stats:
+            try:
+                return profile.runcall(handler, request)
+            finally:
+                duration = time.perf_counter() - started
+                try:
+                    saved = save_profile(
+                        directory,
+                        request,
+                        profile,
+                        stats.records[start:],
+                        duration,
+                        include_parameters=include_parameters,
+                    )
+                    rotate(directory, max_size)
+                    logger.info("Profiled %s %s to %s", request.method, request.path, saved)
+                except OSError:
+                    logger.exception("Can't save the profile of %s %s", request.method, request.path)
+
+    return profiling_tween
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""Read only sessions for safe HTTP methods.
+
+``read_only_tween_factory`` marks the global ``Session`` of ``GET`` and
+``HEAD`` requests read only: autoflush is turned off, the database
+transaction is started read only where the dialect supports it, flushes are
+refused and ``pyramid_tm`` rolls the transaction back instead of committing
+it, which skips the flush and dirty state scan of a commit.
+
+Enable it with::
+
+  basemodel.read_only_safe_methods = true
+  # also mark database transactions read only, with extra statements
+  basemodel.read_only_safe_methods.database = true
+"""
+
+__all__ = [
+    "SAFE_METHODS",
+    "begin_read_only",
+    "end_read_only",
+    "is_read_only_session",
+    "read_only_tween_factory",
+]
+
+import logging
+from collections.abc import Callable
+from typing import Any
+
+from pyramid.registry import Registry
+from pyramid.request import Request
+from pyramid.response import Response
+from pyramid.settings import asbool
+from pyramid_tm import is_tm_active
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine.interfaces import DBAPIConnection
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm import SessionTransaction, UOWTransaction
+from sqlalchemy.pool import ConnectionPoolEntry
+
+from pyramid_basemodel import Session
+from pyramid_basemodel.routing import RoutingSession
+
+logger = logging.getLogger(__name__)
+
+#: HTTP methods whose requests get a read only session.
+SAFE_METHODS = ("GET", "HEAD")
+
+#: ``session.info`` keys holding the autoflush value to restore, while read
+#: only, and whether to start database transactions read only.
+READ_ONLY_KEY = "basemodel.read_only"
+READ_ONLY_DATABASE_KEY = "basemodel.read_only.database"
+
+#: ``connection_record.info`` key of SQLite connections left ``query_only``.
+QUERY_ONLY_KEY = "basemodel.query_only"
+
+#: Statements starting a read only transaction, by dialect name.
+READ_ONLY_STATEMENTS = {
+    "postgresql": "SET TRANSACTION READ ONLY",
+    "mysql": "SET TRANSACTION READ ONLY",
+    "mariadb": "SET TRANSACTION READ ONLY",
+}
+
+
+def is_read_only_session(session: OrmSession) -> bool:
+    """Whether ``session`` has been marked read only."""
+    return READ_ONLY_KEY in session.info
+
+
+def begin_read_only(session: OrmSession, *, database: bool = False) -> None:
+    """Mark ``session`` read only, until ``end_read_only`` is called.
+
+    :param database: Also start its database transactions read only
+    """
+    if not is_read_only_session(session):
+        session.info[READ_ONLY_KEY] = session.autoflush
+        session.autoflush = False
+        if database:
+            session.info[READ_ONLY_DATABASE_KEY] = True
+
+
+def end_read_only(session: OrmSession) -> None:
+    """Restore ``session`` to read and write."""
+    if is_read_only_session(session):
+        session.autoflush = session.info.pop(READ_ONLY_KEY)
+        session.info.pop(READ_ONLY_DATABASE_KEY, None)
+
+
+def read_only_tween_factory(handler: Callable[[Request], Response], registry: Registry) -> Callable[..., Response]:
+    """Mark the global ``Session`` read only for requests with safe methods.
+
+    Runs under ``pyramid_tm``, so that the request's transaction can be
+    doomed, which makes ``pyramid_tm`` roll it back rather than commit it.
+    """
+    database = asbool(registry.settings.get("basemodel.read_only_safe_methods.database", False))
+
+    def read_only_tween(request: Request) -> Response:
+        if request.method not in SAFE_METHODS:
+            return handler(request)
+        session = Session()
+        begin_read_only(session, database=database)
+        try:
+            if is_tm_active(request):
+                request.tm.doom()
+            return handler(request)
+        finally:
+            end_read_only(session)
+
+    return read_only_tween
+
+
+def _reset_query_only(dbapi_connection: DBAPIConnection | None, connection_record: ConnectionPoolEntry) -> None:
+    """Turn ``query_only`` back off when a SQLite connection returns to the pool."""
+    if connection_record.info.pop(QUERY_ONLY_KEY, False) and dbapi_connection is not None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only = OFF")
+        cursor.close()
+
+
+@event.listens_for(RoutingSession, "after_begin")
+def _begin_read_only_transaction(session: OrmSession, transaction: SessionTransaction, connection: Connection) -> None:
+    """Start the database transaction of a read only session read only."""
+    if not session.info.get(READ_ONLY_DATABASE_KEY):
+        return
+    dialect_name = connection.dialect.name
+    if dialect_name == "sqlite":
+        engine = connection.engine
+        if not event.contains(engine, "checkin", _reset_query_only):
+            event.listen(engine, "checkin", _reset_query_only)
+        connection.exec_driver_sql("PRAGMA query_only = ON")
+        connection.info[QUERY_ONLY_KEY] = True
+    elif dialect_name in READ_ONLY_STATEMENTS:
+        connection.exec_driver_sql(READ_ONLY_STATEMENTS[dialect_name])
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _refuse_read_only_flush(session: OrmSession, flush_context: UOWTransaction, instances: Any) -> None:
+    """Refuse to write from a read only session."""
+    if is_read_only_session(session) and (session.new or session.dirty or session.deleted):
+        raise InvalidRequestError(
+            "Refusing to flush a read only session, write from a request with an unsafe method "
+            "or disable basemodel.read_only_safe_methods."
+        )
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""Read only records of model rows.
+
+``BaseMixin.records()`` loads rows as named tuples rather than ORM
+instances: there's no instance state, identity map entry or change tracking
+to build, so listings that only read the rows load faster and hold less
+memory. Records hold every column attribute by default and keep the class
+naming of their model, so ``get_object_id`` and templates work unchanged,
+while ``__json__`` renders the same columns as the model's::
+
+  for page in Page.records(select_columns(Page).where(Page.name != None)):
+      page.slug, page.class_slug, get_object_id(page)
+
+The records are detached snapshots: they can't be changed, saved or used to
+load relationships.
+"""
+
+__all__ = [
+    "load_records",
+    "record_class",
+]
+
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy import Select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from pyramid_basemodel.serialize import JSONAccessor, json_accessor, json_converter, select_columns
+
+#: Class attributes records copy from their model.
+MODEL_ATTRIBUTES = (
+    "__tablename__",
+    "class_name",
+    "class_slug",
+    "singular_class_slug",
+    "plural_class_name",
+)
+
+
+@lru_cache(maxsize=None)
+def record_class(cls: Any, names: tuple[str, ...]) -> type[Any]:
+    """Return the named tuple class of ``cls`` records holding the columns ``names``."""
+    json_names = tuple(name for name in json_accessor(cls).keys if name in names)
+    accessor = JSONAccessor(
+        json_names, tuple(json_converter(getattr(cls, name).expression.type) for name in json_names)
+    )
+    namespace: dict[str, Any] = {
+        "__slots__": (),
+        "model": cls,
+        "__json__": lambda self, request=None: accessor(self),
+    }
+    for name in MODEL_ATTRIBUTES:
+        if hasattr(cls, name):
+            namespace[name] = getattr(cls, name)
+    return type(f"{cls.__name__}Record", (namedtuple(f"{cls.__name__}Row", names),), namespace)
+
+
+def load_records(session: Session, cls: Any, statement: Select[Any] | None = None) -> list[Any]:
+    """Return the rows of the column ``statement`` as ``cls`` records.
+
+    :param statement: ``select()`` of ``cls`` columns, e.g. from
+        ``serialize.select_columns``, all its column attributes by default
+    """
+    if statement is None:
+        statement = select_columns(cls, sa_inspect(cls).column_attrs.keys())
+    names = tuple(description["name"] for description in statement.column_descriptions)
+    make = record_class(cls, names)._make
+    return [make(row) for row in session.execute(statement)]
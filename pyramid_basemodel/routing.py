@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""Read replica routing for the scoped ``Session``.
+
+Provides a ``RoutingSession`` that sends flushes and writes to the primary
+engine and read only ``SELECT`` statements to one of a set of replica
+engines, chosen by a ``ReplicaRouter``.
+
+Once a session has written, it sticks to the primary until its transaction
+ends, so that reads within the same request see their own writes. With
+``pyramid_tm`` the transaction, and so the stickiness, lasts one request.
+"""
+
+__all__ = [
+    "ReplicaRouter",
+    "RoutingSession",
+]
+
+import itertools
+import logging
+import threading
+from collections.abc import Sequence
+from typing import Any, Literal
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm import SessionTransaction, UOWTransaction
+from sqlalchemy.sql import ClauseElement, Select
+
+from pyramid_basemodel.tenancy import current_tenant, tenant_bind
+
+logger = logging.getLogger(__name__)
+
+#: Replica selection strategies understood by ``ReplicaRouter``.
+Strategy = Literal["round_robin", "least_connections"]
+STRATEGIES: tuple[Strategy, ...] = ("round_robin", "least_connections")
+
+#: ``session.info`` keys holding the per transaction routing state.
+STICKY_KEY = "basemodel.stick_to_primary"
+REPLICA_KEY = "basemodel.replica"
+
+
+class ReplicaRouter:
+    """Pick a replica engine for read only statements.
+
+    :param primary: engine receiving writes
+    :param replicas: engines receiving read only statements
+    :param strategy: either ``round_robin`` or ``least_connections``, the
+        latter tracking checked out connections through pool events
+    """
+
+    def __init__(self, primary: Engine, replicas: Sequence[Engine], strategy: str = "round_robin") -> None:
+        """Initialize the router."""
+        if not replicas:
+            raise ValueError("At least one replica engine is required.")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown replica strategy {strategy!r}, use one of {', '.join(STRATEGIES)}.")
+        self.primary = primary
+        self.replicas = tuple(replicas)
+        self.strategy = strategy
+        self._cycle = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        self._checked_out: dict[Engine, int] = dict.fromkeys(self.replicas, 0)
+        if strategy == "least_connections":
+            for replica in self.replicas:
+                self._track(replica)
+
+    def _track(self, engine: Engine) -> None:
+        def on_checkout(*args: Any) -> None:
+            with self._lock:
+                self._checked_out[engine] += 1
+
+        def on_checkin(*args: Any) -> None:
+            with self._lock:
+                self._checked_out[engine] -= 1
+
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "checkin", on_checkin)
+
+    def checked_out(self, engine: Engine) -> int:
+        """Return the number of connections checked out from ``engine``."""
+        return self._checked_out[engine]
+
+    def choose(self) -> Engine:
+        """Return the replica engine the next read only transaction should use."""
+        with self._lock:
+            if self.strategy == "least_connections":
+                return min(self.replicas, key=self._checked_out.__getitem__)
+            return next(self._cycle)
+
+
+def is_read_only(clause: ClauseElement | None) -> bool:
+    """Whether ``clause`` is a ``SELECT`` that may be served by a replica."""
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+
+class RoutingSession(OrmSession):
+    """Session routing read only statements to replicas.
+
+    Without a ``router`` it behaves exactly like a plain ``Session``.
+    """
+
+    def __init__(self, *args: Any, router: ReplicaRouter | None = None, **kwargs: Any) -> None:
+        """Initialize the session with an optional ``router``."""
+        super().__init__(*args, **kwargs)
+        self.router = router
+
+    def get_bind(
+        self,
+        mapper: Any = None,
+        *,
+        clause: ClauseElement | None = None,
+        bind: Engine | Connection | None = None,
+        **kwargs: Any,
+    ) -> Engine | Connection:
+        """Return a replica for read only statements, the primary otherwise.
+
+        Either runs in the current tenant's schema, see ``pyramid_basemodel.tenancy``.
+        """
+        engine = self._route(mapper, clause=clause, bind=bind, **kwargs)
+        schema = current_tenant()
+        if schema is not None and isinstance(engine, Engine):
+            return tenant_bind(engine, schema)
+        return engine
+
+    def _route(
+        self,
+        mapper: Any = None,
+        *,
+        clause: ClauseElement | None = None,
+        bind: Engine | Connection | None = None,
+        **kwargs: Any,
+    ) -> Engine | Connection:
+        router = self.router
+        if router is None or bind is not None or self._flushing or self.info.get(STICKY_KEY):
+            return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+        if not is_read_only(clause):
+            # Whatever isn't known to be read only may write, read it back from the primary.
+            self.info[STICKY_KEY] = True
+            return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+        # Keep to one replica for the whole transaction.
+        replica: Engine | None = self.info.get(REPLICA_KEY)
+        if replica is None:
+            replica = self.info[REPLICA_KEY] = router.choose()
+        return replica
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stick_to_primary(session: OrmSession, flush_context: UOWTransaction) -> None:
+    """Route the rest of the transaction to the primary once it has written."""
+    session.info[STICKY_KEY] = True
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_routing(session: OrmSession, transaction: SessionTransaction) -> None:
+    """Forget routing decisions when the outermost transaction ends."""
+    if transaction.parent is None:
+        session.info.pop(STICKY_KEY, None)
+        session.info.pop(REPLICA_KEY, None)
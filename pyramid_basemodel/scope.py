@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""Request scoped sessions with early connection release.
+
+By default the global ``Session`` is thread local and its connection stays
+checked out from the first query until ``pyramid_tm`` commits, after the
+response has been rendered. ``use_request_scope`` keys the session on the
+current request instead, which holds under threads and gevent alike, and
+``request_scope_tween_factory`` removes it once the transaction is over.
+
+``early_release_view`` additionally ends the session's database
+transaction as soon as a read only view returns, before its renderer runs,
+handing the connection back to the pool. Loaded instances stay attached and
+usable; lazy loads after the release check out a connection again. Views
+that wrote keep their transaction until ``pyramid_tm`` commits it, and
+writing after a release is refused rather than committed outside of it.
+"""
+
+__all__ = [
+    "early_release_view",
+    "has_written",
+    "release_connection",
+    "request_scope",
+    "request_scope_tween_factory",
+    "request_scoped",
+    "use_request_scope",
+]
+
+import logging
+import threading
+from collections.abc import Callable
+from typing import Any
+
+from pyramid.interfaces import IViewDeriverInfo
+from pyramid.registry import Registry
+from pyramid.request import Request
+from pyramid.response import Response
+from pyramid.threadlocal import get_current_request
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import ORMExecuteState, SessionTransaction, UOWTransaction, scoped_session
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.util import ScopedRegistry
+
+from pyramid_basemodel.routing import RoutingSession
+
+logger = logging.getLogger(__name__)
+
+#: ``session.info`` keys tracking writes and releases.
+WRITTEN_KEY = "basemodel.written"
+RELEASED_KEY = "basemodel.released"
+
+#: Registry key of the scoped sessions switched to the request scope by ``use_request_scope``.
+REQUEST_SCOPED_KEY = "basemodel.request_scoped"
+
+
+def request_scope() -> Any:
+    """Return the current request, or the thread outside of requests."""
+    request = get_current_request()
+    if request is None:
+        return threading.get_ident()
+    return request
+
+
+def request_scoped(registry: Registry) -> list[scoped_session[Any]]:
+    """Return the scoped sessions of ``registry``'s app keyed on the current request."""
+    scoped: list[scoped_session[Any]] = registry.setdefault(REQUEST_SCOPED_KEY, [])
+    return scoped
+
+
+def use_request_scope(session: scoped_session[Any], registry: Registry) -> None:
+    """Key the sessions of the scoped ``session`` on the current request.
+
+    Sessions of the previous scope are removed. Outside of a request, e.g. in
+    scripts, sessions are still kept per thread. The ``registry``'s app
+    removes them after each request.
+    """
+    scoped = request_scoped(registry)
+    if session not in scoped:
+        scoped.append(session)
+    if getattr(session.registry, "scopefunc", None) is request_scope:
+        return
+    session.remove()
+    session.registry = ScopedRegistry(session.session_factory, request_scope)
+
+
+def request_scope_tween_factory(handler: Callable[[Request], Response], registry: Registry) -> Callable[..., Response]:
+    """Remove the request's sessions after the transaction manager is done with them."""
+
+    def request_scope_tween(request: Request) -> Response:
+        try:
+            return handler(request)
+        finally:
+            for session in request_scoped(registry):
+                if session.registry.has():
+                    session().info.pop(RELEASED_KEY, None)
+                session.remove()
+
+    return request_scope_tween
+
+
+def has_written(session: OrmSession) -> bool:
+    """Whether ``session`` has pending or flushed writes in its transaction."""
+    return bool(session.new or session.dirty or session.deleted or session.info.get(WRITTEN_KEY))
+
+
+def release_connection(session: OrmSession) -> bool:
+    """Hand the connection of a read only ``session`` back to the pool.
+
+    Ends the session's database transaction without expiring or detaching
+    its instances. Returns whether the connection was released; sessions that
+    wrote are left alone.
+    """
+    transaction = session.get_transaction()
+    if transaction is None or has_written(session):
+        return False
+    transaction.close()
+    session.info[RELEASED_KEY] = True
+    return True
+
+
+def early_release_view(view: Callable[..., Any], info: IViewDeriverInfo) -> Callable[..., Any]:
+    """Release the connections of read only requests before rendering."""
+
+    def wrapper_view(context: Any, request: Request) -> Any:
+        result = view(context, request)
+        for scoped in request_scoped(info.registry):
+            if scoped.registry.has() and release_connection(scoped()):
+                logger.debug("Released the connection of %s %s before rendering", request.method, request.path)
+        return result
+
+    return wrapper_view
+
+
+def _refuse_after_release(session: OrmSession) -> None:
+    if session.info.get(RELEASED_KEY):
+        raise InvalidRequestError(
+            "The session released its connection after the view returned, "
+            "write in the view or disable basemodel.early_release."
+        )
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _refuse_flush_after_release(session: OrmSession, flush_context: UOWTransaction, instances: Any) -> None:
+    """Refuse flushes after a release, they would bypass the transaction manager."""
+    if session.new or session.dirty or session.deleted:
+        _refuse_after_release(session)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_written(session: OrmSession, flush_context: UOWTransaction) -> None:
+    """Remember the flush, the instances no longer show up as pending."""
+    session.info[WRITTEN_KEY] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_dml_written(orm_execute_state: ORMExecuteState) -> None:
+    """Remember ``insert()``, ``update()`` and ``delete()`` statements."""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _refuse_after_release(orm_execute_state.session)
+        orm_execute_state.session.info[WRITTEN_KEY] = True
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_written(session: OrmSession, transaction: SessionTransaction) -> None:
+    """Forget the writes when the outermost transaction ends."""
+    if transaction.parent is None:
+        session.info.pop(WRITTEN_KEY, None)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""JSON serialization of models and result sets.
+
+``to_dict`` returns a model's column values as a dict, through accessors
+built once per class by ``json_accessor``. Models mixing in ``JSONMixin``
+return them from ``__json__``, so Pyramid's ``json`` renderer can render
+their instances directly::
+
+  class Page(Base, BaseMixin, JSONMixin):
+      __tablename__ = "pages"
+      _json_columns = ("id", "slug", "title")
+
+Large listings can skip the ORM instances altogether: ``stream_json``
+executes a ``select()`` of the required columns, e.g. built with
+``select_columns``, and streams the rows as a JSON array, a chunk of rows
+at a time::
+
+  statement = select_columns(Page, ("id", "slug", "modified")).order_by(Page.id)
+  return json_response(Session(), statement)
+
+``json_response`` reads the rows from a connection of its own, when the
+response is served.
+
+Dates and times are rendered in ISO 8601, decimals and UUIDs as strings.
+"""
+
+__all__ = [
+    "JSONAccessor",
+    "JSONMixin",
+    "json_accessor",
+    "json_converter",
+    "json_response",
+    "select_columns",
+    "stream_json",
+    "to_dict",
+]
+
+import json
+from collections.abc import Callable, Iterable, Iterator
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, ClassVar
+from uuid import UUID
+
+from pyramid.response import Response
+from sqlalchemy import Select, select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.types import TypeEngine
+
+#: Number of rows ``stream_json`` fetches and encodes at a time.
+CHUNK_SIZE = 1000
+
+Converter = Callable[[Any], Any]
+
+
+def _isoformat(value: Any) -> Any:
+    return None if value is None else value.isoformat()
+
+
+def _to_str(value: Any) -> Any:
+    return None if value is None else str(value)
+
+
+#: Converters of the values ``json`` can't encode, by python type.
+CONVERTERS: dict[type, Converter] = {
+    datetime: _isoformat,
+    date: _isoformat,
+    time: _isoformat,
+    Decimal: _to_str,
+    UUID: _to_str,
+}
+
+
+def json_converter(type_: TypeEngine[Any]) -> Converter | None:
+    """Return the function making values of the column type ``type_`` JSON encodable, if any."""
+    try:
+        python_type = type_.python_type
+    except NotImplementedError:
+        return None
+    for cls, converter in CONVERTERS.items():
+        if issubclass(python_type, cls):
+            return converter
+    return None
+
+
+class JSONAccessor:
+    """Reads the column values of instances of a class, ready to encode."""
+
+    def __init__(self, keys: tuple[str, ...], converters: tuple[Converter | None, ...]) -> None:
+        """Read the attributes ``keys``, converted by the matching ``converters``."""
+        self.keys = keys
+        self.converters = tuple((index, converter) for index, converter in enumerate(converters) if converter)
+        getter = attrgetter(*keys) if keys else lambda instance: ()
+        # ``attrgetter`` returns a bare value, rather than a tuple, for a single key.
+        self.getter: Callable[[Any], Any] = getter if len(keys) != 1 else lambda instance: (getter(instance),)
+
+    def values(self, row: Iterable[Any]) -> list[Any]:
+        """Return the converted ``row`` values."""
+        values = list(row)
+        for index, converter in self.converters:
+            values[index] = converter(values[index])
+        return values
+
+    def __call__(self, instance: Any) -> dict[str, Any]:
+        """Return the column values of ``instance`` by attribute name."""
+        return dict(zip(self.keys, self.values(self.getter(instance))))
+
+
+@lru_cache(maxsize=None)
+def json_accessor(cls: Any) -> JSONAccessor:
+    """Return the ``JSONAccessor`` of the mapped class ``cls``.
+
+    Reads every column attribute, or the ones named by ``cls._json_columns``.
+    """
+    column_attrs = sa_inspect(cls).column_attrs
+    keys = tuple(getattr(cls, "_json_columns", column_attrs.keys()))
+    return JSONAccessor(keys, tuple(json_converter(column_attrs[key].columns[0].type) for key in keys))
+
+
+def to_dict(instance: Any) -> dict[str, Any]:
+    """Return the JSON encodable column values of ``instance``."""
+    return json_accessor(instance.__class__)(instance)
+
+
+class JSONMixin:
+    """Render the column values of models with Pyramid's ``json`` renderer."""
+
+    #: Attribute names to render, every column attribute when unset.
+    _json_columns: ClassVar[tuple[str, ...]]
+
+    def __json__(self, request: Any = None) -> dict[str, Any]:
+        """Return the column values, or the ones named by ``_json_columns``."""
+        return to_dict(self)
+
+
+def select_columns(cls: Any, names: Iterable[str] | None = None) -> Select[Any]:
+    """Return a ``select()`` of the columns ``names`` of ``cls``, its JSON columns by default."""
+    names = json_accessor(cls).keys if names is None else tuple(names)
+    return select(*(getattr(cls, name) for name in names))
+
+
+def stream_json(
+    session: Session | Connection, statement: Select[Any], *, chunk_size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    """Yield the rows of the column ``statement`` as a JSON array of objects.
+
+    Rows are fetched ``chunk_size`` at a time and encoded straight from their
+    tuples, without building ORM instances.
+    """
+    result = session.execute(statement.execution_options(yield_per=chunk_size))
+    accessor = JSONAccessor(
+        tuple(description["name"] for description in statement.column_descriptions),
+        tuple(json_converter(column.type) for column in statement.selected_columns),
+    )
+    keys = accessor.keys
+    separator = "["
+    for partition in result.partitions():
+        rows = [dict(zip(keys, accessor.values(row))) for row in partition]
+        yield separator + json.dumps(rows)[1:-1]
+        separator = ","
+    yield "[]" if separator == "[" else "]"
+
+
+def json_response(session: Session, statement: Select[Any], *, chunk_size: int = CHUNK_SIZE) -> Response:
+    """Return a response streaming the rows of ``statement`` as JSON.
+
+    The body is only produced once the response is served, i.e.: after
+    ``pyramid_tm`` has ended the request's transaction, so the rows are read
+    from a connection of their own, checked out from the engine ``session``
+    binds the statement to.
+    """
+    bind = session.get_bind(clause=statement)
+    engine = bind if isinstance(bind, Engine) else bind.engine
+
+    def app_iter() -> Iterator[bytes]:
+        with engine.connect() as connection:
+            for chunk in stream_json(connection, statement, chunk_size=chunk_size):
+                yield chunk.encode("utf-8")
+
+    return Response(app_iter=app_iter(), content_type="application/json")
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+"""Horizontal sharding of the global ``Session``.
+
+``use_shards`` switches a scoped session to a ``ShardedRoutingSession``,
+spreading the rows of ``BaseMixin`` tables over several engines, as chosen
+by a ``ShardRouter``:
+
+- ``hash`` spreads rows by a hash of their ``get_object_id``,
+- ``range`` assigns consecutive ranges of ``range_size`` primary keys to
+  each shard in turn,
+- ``rules`` pin whole tables, e.g. small lookup tables or tables without an
+  integer ``id``, to a single shard.
+
+As each row's shard derives from its primary key, new rows get theirs
+from a counter on the first shard, allocated in blocks, rather than from
+each shard's own sequence. Lookups by primary key, ``session.get`` and
+many to one relationships query a single shard, other statements run on
+every shard, one after the other, with their results merged.
+``get_sharded`` looks an instance up by another column on all the shards
+at once, in parallel. Sessions run in the current tenant's schema, see
+``pyramid_basemodel.tenancy``, on every shard.
+
+Configure the shards from the settings with::
+
+  sqlalchemy.url = postgresql:///shard_one
+  sqlalchemy.shards.two.url = postgresql:///shard_two
+  basemodel.shard_strategy = hash
+  basemodel.shard_range_size = 1000000
+  basemodel.shard_rules =
+      countries:primary
+
+the ``sqlalchemy.`` engine being the ``primary`` shard.
+"""
+
+__all__ = [
+    "SHARD_STRATEGIES",
+    "ShardRouter",
+    "ShardedRoutingSession",
+    "get_sharded",
+    "use_shards",
+]
+
+import logging
+import os
+import threading
+import weakref
+import zlib
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Literal
+
+from sqlalchemy import Column, Connection, Engine, Integer, MetaData, Table, Unicode, insert, select, update
+from sqlalchemy.ext.horizontal_shard import ShardedSession, set_shard_id
+from sqlalchemy.orm import Mapper, ORMExecuteState, Session, scoped_session
+from sqlalchemy.sql import ClauseElement, operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+
+from pyramid_basemodel.routing import RoutingSession
+from pyramid_basemodel.tenancy import current_tenant, tenant_bind
+
+logger = logging.getLogger(__name__)
+
+#: Shard selection strategies understood by ``ShardRouter``.
+ShardStrategy = Literal["hash", "range"]
+SHARD_STRATEGIES: tuple[ShardStrategy, ...] = ("hash", "range")
+
+#: Primary key counters, kept on the first shard.
+ids = Table(
+    "basemodel_shard_ids",
+    MetaData(),
+    Column("name", Unicode(64), primary_key=True),
+    Column("next_id", Integer, nullable=False),
+)
+
+
+#: Session classes of the scoped sessions switched by ``use_shards``.
+_unsharded_classes: dict[scoped_session[Any], type[Session]] = {}
+
+#: Routers reset in forked child processes.
+_routers: "weakref.WeakSet[ShardRouter]" = weakref.WeakSet()
+
+
+class ShardRouter:
+    """Pick the shard of each row and statement.
+
+    :param shards: engines by shard name, the first also holding the
+        primary key counters
+    :param strategy: either ``hash`` or ``range``
+    :param range_size: number of consecutive primary keys per range
+    :param rules: shard names by ``__tablename__`` of the tables they hold
+        entirely
+    :param id_block_size: number of primary keys allocated at once
+    """
+
+    def __init__(
+        self,
+        shards: Mapping[str, Engine],
+        strategy: str = "hash",
+        *,
+        range_size: int = 1_000_000,
+        rules: Mapping[str, str] | None = None,
+        id_block_size: int = 100,
+    ) -> None:
+        """Initialize the router."""
+        if not shards:
+            raise ValueError("At least one shard engine is required.")
+        if strategy not in SHARD_STRATEGIES:
+            raise ValueError(f"Unknown shard strategy {strategy!r}, use one of {', '.join(SHARD_STRATEGIES)}.")
+        rules = dict(rules or {})
+        unknown = set(rules.values()) - set(shards)
+        if unknown:
+            raise ValueError(f"Unknown shards {', '.join(sorted(unknown))} in the shard rules.")
+        self.shards = dict(shards)
+        self.names = tuple(shards)
+        self.strategy = strategy
+        self.range_size = range_size
+        self.rules = rules
+        self.id_block_size = id_block_size
+        self._lock = threading.Lock()
+        self._blocks: dict[str, tuple[int, int]] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        _routers.add(self)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Return the thread pool querying the shards in parallel."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(len(self.names), thread_name_prefix="basemodel-shard")
+            return self._executor
+
+    def shard_for(self, table_name: str, ident: Any) -> str:
+        """Return the shard holding the row of ``table_name`` with the primary key ``ident``."""
+        if table_name in self.rules:
+            return self.rules[table_name]
+        if self.strategy == "range":
+            return self.names[(int(ident) - 1) // self.range_size % len(self.names)]
+        return self.names[zlib.crc32(f"{table_name}#{ident}".encode("utf-8")) % len(self.names)]
+
+    def allocate_id(self, table_name: str) -> int:
+        """Return the next primary key of ``table_name``, unique across the shards."""
+        with self._lock:
+            next_id, limit = self._blocks.get(table_name, (0, 0))
+            if next_id >= limit:
+                next_id = self._allocate_block(table_name)
+                limit = next_id + self.id_block_size
+            self._blocks[table_name] = (next_id + 1, limit)
+            return next_id
+
+    def _allocate_block(self, table_name: str) -> int:
+        engine = self.shards[self.names[0]]
+        with engine.begin() as connection:
+            ids.create(connection, checkfirst=True)
+            statement = update(ids).where(ids.c.name == table_name).values(next_id=ids.c.next_id + self.id_block_size)
+            if not connection.execute(statement).rowcount:
+                connection.execute(insert(ids).values(name=table_name, next_id=1 + self.id_block_size))
+            next_id: int = connection.execute(select(ids.c.next_id).where(ids.c.name == table_name)).scalar_one()
+            return next_id - self.id_block_size
+
+    def is_sharded(self, mapper: Mapper[Any] | None) -> bool:
+        """Whether the rows of ``mapper`` are spread over the shards, rather than pinned to one."""
+        return mapper is not None and "id" in mapper.columns and _table_name(mapper) not in self.rules
+
+    def shard_chooser(self, mapper: Mapper[Any] | None, instance: Any, clause: ClauseElement | None = None) -> str:
+        """Return the shard of ``instance``, allocating its primary key if it has none."""
+        if mapper is None:
+            return self.names[0]
+        table_name = _table_name(mapper)
+        if table_name in self.rules:
+            return self.rules[table_name]
+        if instance is None or not self.is_sharded(mapper):
+            return self.names[0]
+        if instance.id is None:
+            instance.id = self.allocate_id(table_name)
+        return self.shard_for(table_name, instance.id)
+
+    def identity_chooser(self, mapper: Mapper[Any], primary_key: Any, **kwargs: Any) -> list[str]:
+        """Return the shard holding the row with the ``primary_key``."""
+        if not self.is_sharded(mapper):
+            return [self.shard_chooser(mapper, None)]
+        return [self.shard_for(_table_name(mapper), primary_key[0])]
+
+    def execute_chooser(self, orm_context: ORMExecuteState) -> list[str]:
+        """Return the shards a statement runs on.
+
+        Statements reading pinned tables only, or looking rows of a single
+        table up by primary key, run on the shards holding them, others on
+        all the shards.
+        """
+        mappers = list(orm_context.all_mappers)
+        if not mappers and orm_context.bind_mapper is not None:
+            mappers = [orm_context.bind_mapper]
+        if mappers and not any(self.is_sharded(mapper) for mapper in mappers):
+            return sorted({self.shard_chooser(mapper, None) for mapper in mappers}, key=self.names.index)
+        if len(mappers) == 1:
+            idents = primary_keys(orm_context, mappers[0])
+            if idents:
+                table_name = _table_name(mappers[0])
+                return sorted({self.shard_for(table_name, ident) for ident in idents}, key=self.names.index)
+        return list(self.names)
+
+    def dispose(self) -> None:
+        """Stop the thread pool."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def reset_after_fork(self) -> None:
+        """Drop the state inherited from the parent process.
+
+        The parent's pool threads don't exist in the child, and the primary
+        key blocks it allocated must not be handed out again.
+        """
+        self._lock = threading.Lock()
+        self._blocks = {}
+        self._executor = None
+
+
+def _reset_routers_after_fork() -> None:
+    for router in list(_routers):
+        router.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_routers_after_fork)
+
+
+def _table_name(mapper: Mapper[Any]) -> str:
+    table: Any = mapper.local_table
+    return str(getattr(mapper.class_, "__tablename__", table.name))
+
+
+def primary_keys(orm_context: ORMExecuteState, mapper: Mapper[Any]) -> list[Any]:
+    """Return the primary keys a statement is restricted to by its ``WHERE`` clause, if any.
+
+    Only ``id = :value`` and ``id IN :values`` criteria combined with
+    ``AND`` are recognized.
+    """
+    column = mapper.columns.get("id")
+    statement: Any = orm_context.statement
+    if column is None or not hasattr(statement, "_where_criteria"):
+        return []
+    parameters = orm_context.parameters if isinstance(orm_context.parameters, Mapping) else {}
+    criteria = list(statement._where_criteria)
+    while criteria:
+        criterion = criteria.pop()
+        if isinstance(criterion, BooleanClauseList) and criterion.operator is operators.and_:
+            criteria.extend(criterion.clauses)
+            continue
+        if not isinstance(criterion, BinaryExpression) or not isinstance(criterion.right, BindParameter):
+            continue
+        left: Any = criterion.left
+        if getattr(left, "table", None) is not column.table or getattr(left, "key", None) != column.key:
+            continue
+        value = parameters.get(criterion.right.key, criterion.right.value)
+        if criterion.operator is operators.eq and value is not None:
+            return [value]
+        if criterion.operator is operators.in_op and value:
+            return list(value)
+    return []
+
+
+class ShardedRoutingSession(ShardedSession, RoutingSession):
+    """``ShardedSession`` keeping the behaviour of the ``RoutingSession``, but for replicas."""
+
+    def __init__(self, *args: Any, shard_router: ShardRouter, **kwargs: Any) -> None:
+        """Initialize the session with the shards and choosers of ``shard_router``."""
+        kwargs.pop("bind", None)
+        super().__init__(
+            shard_router.shard_chooser,
+            shard_router.identity_chooser,
+            shard_router.execute_chooser,
+            shards=shard_router.shards,
+            **kwargs,
+        )
+        self.shard_router = shard_router
+
+    def get_bind(self, mapper: Any = None, **kwargs: Any) -> Engine | Connection:
+        """Return the engine of the chosen shard, in the current tenant's schema."""
+        kwargs.pop("bind", None)
+        engine = ShardedSession.get_bind(self, mapper, **kwargs)
+        schema = current_tenant()
+        if schema is not None and isinstance(engine, Engine):
+            return tenant_bind(engine, schema)
+        return engine
+
+
+def use_shards(session: scoped_session[Any], router: ShardRouter | None) -> None:
+    """Spread the sessions of the scoped ``session`` over the shards of ``router``, or stop with ``None``.
+
+    Sessions of the previous configuration are removed, and the thread pool
+    of its router stopped.
+    """
+    factory = session.session_factory
+    previous: ShardRouter | None = factory.kw.get("shard_router")
+    if previous is not None and previous is not router:
+        previous.dispose()
+    if router is None:
+        if session in _unsharded_classes:
+            session.remove()
+            factory.class_ = _unsharded_classes.pop(session)
+            factory.kw.pop("shard_router", None)
+        return
+    session.remove()
+    unsharded = _unsharded_classes.setdefault(session, factory.class_)
+    # Derived from the current class, to keep the listeners of e.g. ``zope.sqlalchemy``.
+    factory.class_ = type(ShardedRoutingSession.__name__, (ShardedRoutingSession, unsharded), {})
+    factory.kw["shard_router"] = router
+
+
+def get_sharded(session: Session, cls: Any, key_name: str, key: Any) -> Any:
+    """Return the first ``cls`` instance whose ``key_name`` is ``key``, or ``None``.
+
+    Lookups by primary key, or of tables that aren't sharded, query the
+    single shard holding the row. Other lookups, or primary keys the
+    strategy can't place, probe all the shards in parallel, then load the
+    instance from the shard that has it. Pending changes are flushed first,
+    when the session autoflushes.
+    """
+    router: ShardRouter = session.shard_router  # type: ignore[attr-defined]
+    mapper: Mapper[Any] = cls.__mapper__
+    column = getattr(cls, key_name)
+    shard: str | None = None
+    if not router.is_sharded(mapper):
+        shard = router.shard_chooser(mapper, None)
+    elif key_name == "id":
+        try:
+            shard = router.shard_for(_table_name(mapper), key)
+        except (TypeError, ValueError):
+            # E.g. a key that isn't a number under the range strategy.
+            shard = None
+    if shard is not None:
+        statement = select(cls).where(column == key).limit(1).options(set_shard_id(shard))
+        return session.scalars(statement).first()
+
+    if session.autoflush:
+        session.flush()
+    probe = select(cls.id).where(column == key).limit(1)
+    # The session's own connections, seeing its flushed rows, in the tenant's
+    # schema; each is used by a single probe.
+    connections = [session.connection(bind_arguments={"shard_id": shard}) for shard in router.names]
+
+    def probe_shard(connection: Connection) -> Any:
+        return connection.scalar(probe)
+
+    # Each probe runs in a copy of the context, e.g. to collect its query stats,
+    # and all of them are waited for, not to outlive the lookup.
+    contexts = [copy_context() for _ in router.names]
+    found = list(
+        router.executor.map(lambda context, connection: context.run(probe_shard, connection), contexts, connections)
+    )
+    for shard, ident in zip(router.names, found):
+        if ident is not None:
+            return session.get(cls, ident, identity_token=shard)
+    return None
+
+
+def parse_rules(value: str | Iterable[str]) -> dict[str, str]:
+    """Parse ``table:shard`` shard rules, separated by whitespace."""
+    items = value.split() if isinstance(value, str) else value
+    return dict(item.split(":", 1) for item in items)
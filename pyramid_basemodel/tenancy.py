@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""Schema per tenant.
+
+Tables without an explicit ``schema`` live in each tenant's schema: the
+``RoutingSession`` runs its statements, flushes included, with a
+``schema_translate_map`` naming the current tenant's schema. All tenants
+share one engine, so one connection pool and one compiled statement cache,
+as schema names are rendered at execution time. Tables with an explicit
+``schema``, e.g. a ``public.tenants`` table, stay shared.
+
+Choose the tenant of each request with a resolver, a callable taking the
+request and returning its tenant's schema, or ``None`` for the default
+schema::
+
+  basemodel.tenant_resolver = myapp.tenants.resolve
+
+and elsewhere, e.g. in scripts, with ``use_tenant``::
+
+  with use_tenant("tenant_acme"):
+      Session.scalars(select(Page))
+
+Sessions are removed after each request of a tenant, so that instances
+loaded for one tenant are never handed to the next. ``provision_tenants`` creates the
+schemas and their tables.
+"""
+
+__all__ = [
+    "current_tenant",
+    "provision_tenants",
+    "remove_after_requests",
+    "tenant_bind",
+    "tenant_namespace",
+    "tenant_tween_factory",
+    "use_tenant",
+]
+
+import logging
+import weakref
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from pyramid.path import DottedNameResolver
+from pyramid.registry import Registry
+from pyramid.request import Request
+from pyramid.response import Response
+from sqlalchemy import Engine, MetaData
+from sqlalchemy.orm import scoped_session
+from sqlalchemy.schema import CreateSchema
+
+logger = logging.getLogger(__name__)
+
+#: Scoped sessions removed after each request by ``tenant_tween_factory``.
+_tenant_sessions: list[scoped_session[Any]] = []
+
+_current_tenant: ContextVar[str | None] = ContextVar("basemodel_tenant", default=None)
+
+#: Engines returned by ``tenant_bind``, by engine and schema. They refer to
+#: their engine, so they're only kept while in use, e.g. by a transaction,
+#: lest they keep their engine alive.
+_tenant_binds: "weakref.WeakKeyDictionary[Engine, weakref.WeakValueDictionary[str, Engine]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def current_tenant() -> str | None:
+    """Return the schema of the current tenant, if any."""
+    return _current_tenant.get()
+
+
+@contextmanager
+def use_tenant(schema: str | None) -> Iterator[None]:
+    """Run the statements of the block in the ``schema`` of a tenant.
+
+    Sessions keep the connection their transaction started with, switch
+    tenants between transactions.
+    """
+    token = _current_tenant.set(schema)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def tenant_bind(engine: Engine, schema: str) -> Engine:
+    """Return ``engine`` translating tables without a schema to ``schema``.
+
+    The returned engine shares the pool and compiled cache of ``engine``,
+    and is returned again while in use, so that a session's transaction
+    keeps using the same connection.
+    """
+    binds = _tenant_binds.setdefault(engine, weakref.WeakValueDictionary())
+    bind = binds.get(schema)
+    if bind is None:
+        bind = binds[schema] = engine.execution_options(schema_translate_map={None: schema})
+    return bind
+
+
+def tenant_namespace(namespace: str) -> str:
+    """Return ``namespace`` qualified with the current tenant, for keys shared between tenants."""
+    schema = _current_tenant.get()
+    return namespace if schema is None else f"{schema}.{namespace}"
+
+
+def provision_tenants(engine: Engine, schemas: Iterable[str], metadata: MetaData) -> None:
+    """Create the ``schemas``, unless they exist, along with the tables of ``metadata`` without a schema.
+
+    On SQLite, whose schemas are attached databases, the databases have to
+    be attached to every connection beforehand.
+    """
+    tables = [table for table in metadata.sorted_tables if table.schema is None]
+    for schema in schemas:
+        with engine.begin() as connection:
+            if connection.dialect.name != "sqlite":
+                connection.execute(CreateSchema(schema, if_not_exists=True))
+            metadata.create_all(connection.execution_options(schema_translate_map={None: schema}), tables=tables)
+        logger.info("Provisioned tenant schema %s", schema)
+
+
+def remove_after_requests(session: scoped_session[Any]) -> None:
+    """Remove the sessions of the scoped ``session`` after each tenant's request."""
+    if session not in _tenant_sessions:
+        _tenant_sessions.append(session)
+
+
+def tenant_tween_factory(handler: Callable[[Request], Response], registry: Registry) -> Callable[..., Response]:
+    """Handle each request in the schema of its tenant, as returned by ``basemodel.tenant_resolver``."""
+    resolver: Callable[[Request], str | None] = DottedNameResolver().maybe_resolve(
+        registry.settings["basemodel.tenant_resolver"]
+    )
+
+    def tenant_tween(request: Request) -> Response:
+        with use_tenant(resolver(request)):
+            try:
+                return handler(request)
+            finally:
+                # Sessions of the default schema stay, as without a resolver.
+                if current_tenant() is not None:
+                    for session in _tenant_sessions:
+                        session.remove()
+
+    return tenant_tween
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+"""Statement timeouts and per request database time budgets.
+
+``limit_engine`` applies a timeout to each statement an engine executes,
+through the database where it has a setting for it, PostgreSQL's
+``statement_timeout`` and MySQL's ``max_execution_time``, and through a
+progress handler interrupting the statement on SQLite. Within
+``query_budget(seconds)``, e.g. per request with the
+``query_budget_tween``, the statements share a total time budget: once it
+is spent, further statements are refused, and on SQLite the running
+statement is interrupted when it runs out.
+
+Both raise a ``StatementTimeout``, a ``QueryBudgetExceeded`` for the
+budget, naming the statement, which aborts the request's transaction.
+Enable them with::
+
+  # milliseconds
+  basemodel.statement_timeout = 5000
+  basemodel.query_budget = 10000
+"""
+
+__all__ = [
+    "QueryBudget",
+    "QueryBudgetExceeded",
+    "StatementTimeout",
+    "current_query_budget",
+    "limit_engine",
+    "query_budget",
+    "query_budget_tween_factory",
+]
+
+import logging
+import time
+import weakref
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import partial
+from typing import Any
+
+from pyramid.registry import Registry
+from pyramid.request import Request
+from pyramid.response import Response
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine, ExceptionContext
+from sqlalchemy.pool import ConnectionPoolEntry
+
+logger = logging.getLogger(__name__)
+
+#: ``Connection.info`` key holding the start time, deadline and budget of the running statement.
+RUNNING_KEY = "basemodel.timeouts.running"
+
+#: Statements setting the timeout of new connections, in milliseconds, by dialect.
+TIMEOUT_STATEMENTS = {
+    "postgresql": "SET statement_timeout = {timeout}",
+    "mysql": "SET SESSION max_execution_time = {timeout}",
+    "mariadb": "SET SESSION max_statement_time = {seconds}",
+}
+
+#: Error codes of statements cancelled by their timeout, by dialect.
+TIMEOUT_CODES = {
+    "postgresql": ("57014",),
+    "mysql": (3024,),
+    "mariadb": (1969,),
+}
+
+#: SQLite virtual machine instructions between deadline checks.
+PROGRESS_INTERVAL = 1000
+
+#: Engines already handled by ``limit_engine``.
+_limited_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+_current_budget: ContextVar["QueryBudget | None"] = ContextVar("basemodel_query_budget", default=None)
+
+
+class StatementTimeout(Exception):
+    """A statement ran past its timeout."""
+
+    def __init__(self, message: str, statement: str, duration: float) -> None:
+        """Keep the ``statement`` and how long, in seconds, it ran."""
+        super().__init__(message)
+        self.statement = statement
+        self.duration = duration
+
+
+class QueryBudgetExceeded(StatementTimeout):
+    """The statements of a request ran past its database time budget."""
+
+
+class QueryBudget:
+    """Database time budget shared by the statements of a request, in seconds."""
+
+    def __init__(self, limit: float) -> None:
+        """Start with the whole ``limit`` left."""
+        self.limit = limit
+        self.spent = 0.0
+
+    @property
+    def remaining(self) -> float:
+        """Return the time left, in seconds."""
+        return self.limit - self.spent
+
+
+def current_query_budget() -> QueryBudget | None:
+    """Return the ``QueryBudget`` of the current context."""
+    return _current_budget.get()
+
+
+@contextmanager
+def query_budget(seconds: float) -> Iterator[QueryBudget]:
+    """Share a budget of ``seconds`` between the statements executed within the block."""
+    budget = QueryBudget(seconds)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def _set_timeout(dbapi_connection: Any, connection_record: ConnectionPoolEntry, timeout: float, dialect: str) -> None:
+    # Set outside of a transaction, whose rollback would undo it on PostgreSQL.
+    # MySQL drivers' ``autocommit`` is a method, but their ``SET`` isn't transactional.
+    autocommit = getattr(dbapi_connection, "autocommit", None)
+    toggle = isinstance(autocommit, bool)
+    if toggle:
+        dbapi_connection.autocommit = True
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(TIMEOUT_STATEMENTS[dialect].format(timeout=int(timeout * 1000), seconds=timeout))
+        cursor.close()
+    finally:
+        if toggle:
+            dbapi_connection.autocommit = autocommit
+
+
+def _before_cursor_execute(conn: Connection, statement: str, timeout: float | None, **kw: Any) -> None:
+    budget = _current_budget.get()
+    if budget is not None and budget.remaining <= 0:
+        raise QueryBudgetExceeded(
+            f"Query budget of {budget.limit * 1000:.0f}ms spent before: {statement}", statement, 0.0
+        )
+    started = time.perf_counter()
+    limits = [limit for limit in (timeout, budget.remaining if budget else None) if limit is not None]
+    deadline = started + min(limits) if limits else None
+    conn.info[RUNNING_KEY] = (started, deadline, budget)
+    if deadline is not None and conn.dialect.name == "sqlite":
+        dbapi_connection: Any = conn.connection.dbapi_connection
+        dbapi_connection.set_progress_handler(lambda: time.perf_counter() > deadline, PROGRESS_INTERVAL)
+
+
+def _finish(conn: Connection) -> tuple[float, QueryBudget | None] | None:
+    running = conn.info.pop(RUNNING_KEY, None)
+    if running is None:
+        return None
+    started, deadline, budget = running
+    duration = time.perf_counter() - started
+    if budget is not None:
+        budget.spent += duration
+    if deadline is not None and conn.dialect.name == "sqlite":
+        dbapi_connection: Any = conn.connection.dbapi_connection
+        dbapi_connection.set_progress_handler(None, 0)
+    return duration, budget
+
+
+def _after_cursor_execute(conn: Connection, **kw: Any) -> None:
+    _finish(conn)
+
+
+def _is_timeout(exception_context: ExceptionContext) -> bool:
+    dialect = exception_context.dialect.name
+    error: Any = exception_context.original_exception
+    if dialect == "sqlite":
+        return "interrupted" in str(error)
+    code = getattr(error, "pgcode", None) or getattr(error, "sqlstate", None)
+    if code is None and getattr(error, "args", None):
+        code = error.args[0]
+    return code in TIMEOUT_CODES.get(dialect, ())
+
+
+def _handle_error(exception_context: ExceptionContext) -> BaseException | None:
+    conn = exception_context.connection
+    if conn is None:
+        return None
+    finished = _finish(conn)
+    statement = exception_context.statement
+    if finished is None or statement is None or not _is_timeout(exception_context):
+        return None
+    duration, budget = finished
+    if budget is not None and budget.remaining <= 0:
+        message = f"Query budget of {budget.limit * 1000:.0f}ms spent, interrupted after {duration * 1000:.0f}ms: "
+        return QueryBudgetExceeded(message + statement, statement, duration)
+    return StatementTimeout(f"Statement timed out after {duration * 1000:.0f}ms: {statement}", statement, duration)
+
+
+def limit_engine(engine: Engine, statement_timeout: float | None = None) -> None:
+    """Time out statements of ``engine`` after ``statement_timeout`` seconds, and keep them to the current budget."""
+    if engine in _limited_engines:
+        return
+    _limited_engines.add(engine)
+    dialect = engine.dialect.name
+    if statement_timeout is not None and dialect in TIMEOUT_STATEMENTS:
+        event.listen(engine, "connect", partial(_set_timeout, timeout=statement_timeout, dialect=dialect))
+    event.listen(
+        engine, "before_cursor_execute", partial(_before_cursor_execute, timeout=statement_timeout), named=True
+    )
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute, named=True)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def query_budget_tween_factory(
+    handler: Callable[[Request], Response], registry: Registry
+) -> Callable[[Request], Response]:
+    """Return a tween logging the statements that time out.
+
+    Shares ``basemodel.query_budget`` milliseconds, when set, between the
+    statements of each request.
+    """
+    budget_setting = registry.settings.get("basemodel.query_budget")
+    limit = float(budget_setting) / 1000 if budget_setting else None
+
+    def query_budget_tween(request: Request) -> Response:
+        with query_budget(limit) if limit is not None else nullcontext():
+            try:
+                return handler(request)
+            except StatementTimeout as error:
+                logger.error("Aborted %s %s: %s", request.method, request.path, error)
+                raise
+
+    return query_budget_tween
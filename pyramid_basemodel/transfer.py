@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""Streaming export and import of model tables.
+
+``export_rows`` writes the columns of a model's rows to a JSON Lines or CSV
+file, reading them through a server side cursor ``chunk_size`` rows at a
+time, so memory use doesn't grow with the table::
+
+  with open("pages.jsonl", "w") as file:
+      export_rows(Session(), Page, file)
+
+``import_rows`` reads such a file back, inserting its rows ``chunk_size``
+at a time with bulk ``INSERT`` statements. The exported primary keys and
+``created`` / ``modified`` timestamps are kept as is, so sequences, e.g. on
+PostgreSQL, need resetting after importing into an empty table.
+
+Both return a ``TransferStats``, which is also logged. CSV files can't tell
+``NULL`` from an empty string: empty values are imported as ``NULL``, but
+in string columns.
+"""
+
+__all__ = [
+    "FORMATS",
+    "TransferStats",
+    "export_rows",
+    "import_rows",
+]
+
+import csv
+import json
+import logging
+import time as timer
+from collections.abc import Callable, Iterable, Iterator
+from datetime import date, datetime, time
+from decimal import Decimal
+from itertools import islice
+from typing import IO, Any, NamedTuple
+from uuid import UUID
+
+from sqlalchemy import insert
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from pyramid_basemodel.serialize import CHUNK_SIZE, JSONAccessor, json_converter, select_columns
+
+logger = logging.getLogger(__name__)
+
+#: Supported file formats.
+FORMATS = ("jsonl", "csv")
+
+#: Parsers of the values exported by ``serialize.json_converter``, by python type.
+PARSERS: dict[type, Callable[[Any], Any]] = {
+    datetime: datetime.fromisoformat,
+    date: date.fromisoformat,
+    time: time.fromisoformat,
+    Decimal: Decimal,
+    UUID: UUID,
+}
+
+
+def _parse_bool(value: str) -> bool:
+    return value.lower() in ("1", "true")
+
+
+#: Parsers of CSV values, which are all strings, by python type.
+TEXT_PARSERS: dict[type, Callable[[Any], Any]] = {
+    bool: _parse_bool,
+    int: int,
+    float: float,
+}
+
+
+class TransferStats(NamedTuple):
+    """Rows transferred by ``export_rows`` or ``import_rows``."""
+
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        """Return the transfer rate."""
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+
+def _check_format(format: str) -> None:
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}, expected one of {', '.join(FORMATS)}.")
+
+
+def _log(action: str, cls: Any, stats: TransferStats) -> None:
+    logger.info(
+        "%s %d %s rows in %.2fs (%.0f rows/s)", action, stats.rows, cls.__name__, stats.seconds, stats.rows_per_second
+    )
+
+
+def export_rows(
+    session: Session,
+    cls: Any,
+    file: IO[str],
+    *,
+    format: str = "jsonl",
+    names: Iterable[str] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> TransferStats:
+    """Write the rows of ``cls`` to ``file``, in ``format``.
+
+    :param names: columns to export, all of them by default, regardless of
+        the ones ``_json_columns`` renders
+    """
+    _check_format(format)
+    started = timer.perf_counter()
+    statement = select_columns(cls, sa_inspect(cls).column_attrs.keys() if names is None else names)
+    keys = tuple(description["name"] for description in statement.column_descriptions)
+    accessor = JSONAccessor(keys, tuple(json_converter(column.type) for column in statement.selected_columns))
+    result = session.execute(statement.execution_options(yield_per=chunk_size))
+    rows = 0
+    if format == "csv":
+        writer = csv.writer(file)
+        writer.writerow(keys)
+    for partition in result.partitions():
+        if format == "csv":
+            writer.writerows(accessor.values(row) for row in partition)
+        else:
+            file.writelines(f"{json.dumps(dict(zip(keys, accessor.values(row))))}\n" for row in partition)
+        rows += len(partition)
+    stats = TransferStats(rows, timer.perf_counter() - started)
+    _log("Exported", cls, stats)
+    return stats
+
+
+def _read(file: IO[str], format: str) -> Iterator[dict[str, Any]]:
+    if format == "csv":
+        yield from csv.DictReader(file)
+    else:
+        yield from (json.loads(line) for line in file if line.strip())
+
+
+def _parser(cls: Any, key: str, *, text: bool) -> Callable[[Any], Any] | None:
+    """Return the function parsing exported values of the column ``key``, if any."""
+    column_attrs = sa_inspect(cls).column_attrs
+    if key not in column_attrs:
+        raise ValueError(f"{cls.__name__} has no column {key!r}.")
+    try:
+        python_type = column_attrs[key].columns[0].type.python_type
+    except NotImplementedError:
+        return None
+    parsers = {**PARSERS, **TEXT_PARSERS} if text else PARSERS
+    parse = next((parse for type_, parse in parsers.items() if issubclass(python_type, type_)), None)
+    if text and parse is not None:
+        # Empty CSV values are ``NULL``, except in string columns.
+        return lambda value: None if value == "" else parse(value)
+    return parse
+
+
+def import_rows(
+    session: Session,
+    cls: Any,
+    file: IO[str],
+    *,
+    format: str = "jsonl",
+    chunk_size: int = CHUNK_SIZE,
+) -> TransferStats:
+    """Insert the rows exported to ``file`` in ``format`` as ``cls`` rows.
+
+    The rows are inserted in the session's transaction, committing them is
+    up to the caller, e.g. ``pyramid_tm``.
+    """
+    _check_format(format)
+    started = timer.perf_counter()
+    parsers: dict[str, Callable[[Any], Any] | None] = {}
+
+    def parse(row: dict[str, Any]) -> dict[str, Any]:
+        for key, value in row.items():
+            if key not in parsers:
+                parsers[key] = _parser(cls, key, text=format == "csv")
+            parser = parsers[key]
+            if parser is not None and value is not None:
+                row[key] = parser(value)
+        return row
+
+    rows = (parse(row) for row in _read(file, format))
+    count = 0
+    while chunk := list(islice(rows, chunk_size)):
+        session.execute(insert(cls), chunk)
+        count += len(chunk)
+    stats = TransferStats(count, timer.perf_counter() - started)
+    _log("Imported", cls, stats)
+    return stats
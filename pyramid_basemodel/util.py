@@ -2,17 +2,72 @@
 
 """Shared utility functions for interacting with the data model."""
 
+import inspect
 import logging
 import os
 from binascii import hexlify
-from collections.abc import Callable, Iterable, Sequence
-from typing import Any, Union
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from functools import lru_cache
+from typing import Any, NamedTuple, Union
 
-from sqlalchemy import schema
-from sqlalchemy.orm import Query
+from sqlalchemy import ColumnElement, Select, bindparam, delete, func, schema, select, text, update
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Mapper, Query, Session, scoped_session
 
 logger = logging.getLogger(__name__)
 
+#: Maximum number of lookup statements kept by ``lookup_statement``.
+STATEMENT_CACHE_SIZE = 512
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def lookup_statement(cls: Any, column_names: tuple[str, ...], *, first: bool = False) -> Select[Any]:
+    """Return a cached ``SELECT`` of ``cls`` instances matching ``column_names``.
+
+    Each column is compared to a bind parameter of the same name, so the
+    statement, and its cache key, are built once and reused for every
+    lookup, e.g.::
+
+      session.scalars(lookup_statement(User, ("slug",)), {"slug": "foo"})
+
+    :param first: limit the statement to a single row
+    """
+    statement = select(cls).where(*(getattr(cls, name) == bindparam(name) for name in column_names))
+    if first:
+        statement = statement.limit(1)
+    return statement
+
+
+def is_column(cls: Any, name: str) -> bool:
+    """Whether ``name`` is a column attribute of the mapped class ``cls``."""
+    mapper = sa_inspect(cls, raiseerr=False)
+    return isinstance(mapper, Mapper) and name in mapper.column_attrs
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _scoped_session_for(cls: Any) -> scoped_session[Any] | None:
+    """Return the scoped session behind the ``query_property`` of ``cls``, if that's what ``cls.query`` is."""
+    descriptor = inspect.getattr_static(cls, "query", None)
+    getter = getattr(type(descriptor), "__get__", None)
+    for cell in getattr(getter, "__closure__", None) or ():
+        if isinstance(cell.cell_contents, scoped_session):
+            return cell.cell_contents
+    return None
+
+
+def session_for(cls: Any) -> Session:
+    """Return the session ``cls.query`` runs in.
+
+    Classes queried through a ``scoped_session.query_property`` get the
+    current session from its registry, without building a ``Query``.
+    """
+    scoped = _scoped_session_for(cls)
+    if scoped is not None:
+        current: Session = scoped.registry()
+        return current
+    session: Session = cls.query.session
+    return session
+
 
 def generate_random_digest(
     num_bytes: int = 28,
@@ -45,37 +100,42 @@ def ensure_unique(
     Takes a ``candidate`` value for a unique ``property_`` and iterates,
     appending an incremented integer until unique.
     """
-    # Unpack
-    candidate = value
+    # Build the statement once, the candidates only change its parameter.
+    statement = query.filter(property_ == bindparam("candidate")).statement
+    session = query.session
 
     # Iterate until the slug is unique.
-    n = 0
-    n_str = ""
-    while True:
-        # Keep trying slug, slug-1, slug-2, etc.
-        value = f"{candidate}{n_str}"
-        existing = None
-        existing_instances = query.filter(property_ == value).all()
-        for instance in existing_instances:
-            if instance != self:
-                existing = instance
-                break
-        if existing and n < 30:
-            n += 1
-            # If we've tried 1, 2 ... all the way to ``max_iter``, then
-            # fallback on appending a random digest rather than a sequential
-            # number.
-            suffix = str(n) if n < 20 else gen_digest(num_bytes=8)
-            n_str = f"-{suffix}"
-            continue
-        break
+    for value in unique_candidates(value, gen_digest=gen_digest):
+        existing_instances = session.scalars(statement, {"candidate": value}).all()
+        if all(instance == self for instance in existing_instances):
+            break
 
     return value
 
 
+def unique_candidates(value: str, gen_digest: Callable[..., str] = generate_random_digest) -> Iterator[str]:
+    """Yield the candidates ``ensure_unique`` tries in turn for ``value``.
+
+    Yields ``value``, then ``value-1``, ``value-2`` etc. and, past ``value-19``,
+    ``value`` with a random digest appended, 31 candidates in total.
+    """
+    yield value
+    for n in range(1, 31):
+        # If we've tried 1, 2 ... all the way to 19, then fallback on
+        # appending a random digest rather than a sequential number.
+        suffix = str(n) if n < 20 else gen_digest(num_bytes=8)
+        yield f"{value}-{suffix}"
+
+
 def get_or_create(cls: Any, **kwargs: Any) -> Any:
     """Get or create a ``cls`` instance using the ``kwargs`` provided."""
-    instance = cls.query.filter_by(**kwargs).first()
+    # ``None`` values need ``IS NULL`` and relations a join condition, so
+    # only plain column values use the cached statement.
+    if all(value is not None and is_column(cls, name) for name, value in kwargs.items()):
+        statement = lookup_statement(cls, tuple(sorted(kwargs)), first=True)
+        instance = session_for(cls).scalars(statement, kwargs).first()
+    else:
+        instance = cls.query.filter_by(**kwargs).first()
     if not instance:
         instance = cls(**kwargs)
     return instance
@@ -88,9 +148,22 @@ def get_all_matching(cls: Any, column_name: str, values: Iterable[Any]) -> list[
     :param column_name:
     :param values:
     """
+    if not is_column(cls, column_name):
+        column = getattr(cls, column_name)
+        query: Query[Any] = cls.query.filter(column.in_(values))
+        return query.all()
+    statement = matching_statement(cls, column_name)
+    return list(session_for(cls).scalars(statement, {column_name: list(values)}).unique())
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def matching_statement(cls: Any, column_name: str) -> Select[Any]:
+    """Return a cached ``SELECT`` of ``cls`` instances whose ``column_name`` is in a list of values.
+
+    The values are bound as the expanding ``column_name`` parameter.
+    """
     column = getattr(cls, column_name)
-    query: Query[Any] = cls.query.filter(column.in_(values))
-    return query.all()
+    return select(cls).where(column.in_(bindparam(column_name, expanding=True)))
 
 
 def get_object_id(instance: Any) -> str:
@@ -98,9 +171,153 @@ def get_object_id(instance: Any) -> str:
     return f"{instance.__tablename__}#{instance.id}"
 
 
+def mapped_tables(base: Any) -> dict[str, Any]:
+    """Return the classes mapped by the declarative ``base``, by ``__tablename__``.
+
+    Single table inheritance subclasses share their parent's table, which
+    maps to the parent class.
+    """
+    return {
+        mapper.class_.__tablename__: mapper.class_
+        for mapper in base.registry.mappers
+        if not mapper.single and hasattr(mapper.class_, "__tablename__")
+    }
+
+
+def resolve_object_ids(object_ids: Iterable[str], base: Any = None) -> tuple[list[Any], list[str]]:
+    """Return the instances identified by ``get_object_id`` strings, and the ids that weren't found.
+
+    The ids are grouped by table, each table's instances are then loaded
+    with ``get_many``, i.e.: a single ``IN`` query for the ones that aren't in
+    the session's identity map yet. Instances are returned in the order of
+    ``object_ids``. Ids of classes without ``BaseMixin`` aren't resolved.
+
+    :param base: declarative base whose registry maps the table names,
+        ``pyramid_basemodel.Base`` by default
+    """
+    # Imported here, the package imports this module.
+    from pyramid_basemodel import Base, BaseMixin
+
+    object_ids = list(object_ids)
+    classes = mapped_tables(Base if base is None else base)
+    grouped: dict[Any, dict[Any, str]] = {}
+    for object_id in object_ids:
+        tablename, _, ident = object_id.rpartition("#")
+        cls = classes.get(tablename)
+        if cls is None:
+            continue
+        if not issubclass(cls, BaseMixin):
+            logger.debug("Can't resolve %s, its class lacks BaseMixin", object_id)
+            continue
+        try:
+            python_type = sa_inspect(cls).primary_key[0].type.python_type
+            grouped.setdefault(cls, {})[python_type(ident)] = object_id
+        except (NotImplementedError, TypeError, ValueError):
+            logger.debug("Can't convert the primary key of %s", object_id)
+    found: dict[str, Any] = {}
+    for cls, idents in grouped.items():
+        for instance in cls.get_many(idents):
+            found[idents[instance.id]] = instance
+    instances = [found[object_id] for object_id in object_ids if object_id in found]
+    missing = [object_id for object_id in object_ids if object_id not in found]
+    return instances, missing
+
+
+class BulkResult(NamedTuple):
+    """Rows changed by ``bulk_update`` or ``bulk_delete``."""
+
+    rowcount: int
+    #: primary keys of the changed rows, when asked for
+    ids: list[Any] | None
+
+
+def _execute_bulk(cls: Any, statement: Any, *, return_ids: bool) -> BulkResult:
+    """Execute the bulk DML ``statement``, synchronizing the session's instances."""
+    statement = statement.execution_options(synchronize_session="fetch")
+    if return_ids:
+        ids = list(session_for(cls).scalars(statement.returning(cls.id)))
+        return BulkResult(len(ids), ids)
+    result: Any = session_for(cls).execute(statement)
+    return BulkResult(result.rowcount, None)
+
+
+def bulk_update(
+    cls: Any,
+    where: ColumnElement[bool],
+    values: dict[str, Any],
+    *,
+    bump_version: bool = False,
+    return_ids: bool = False,
+) -> BulkResult:
+    """Update the ``cls`` rows matching ``where`` with ``values``, in a single statement.
+
+    ``modified`` is bumped by its ``onupdate`` default, or the database
+    trigger of ``ServerDefaultBaseMixin`` models, unless given in
+    ``values``. Matching instances in the session are updated to match, and
+    their columns set by the database expired, to be loaded afresh.
+
+    :param bump_version: also increment ``version``
+    :param return_ids: return the ids of the updated rows, which takes a
+        database supporting ``UPDATE .. RETURNING``
+    """
+    values = dict(values)
+    if bump_version:
+        values["version"] = func.coalesce(cls.version, 0) + 1
+    statement = update(cls).where(where).values(values)
+    keys = _server_onupdate_keys(cls)
+    session = session_for(cls)
+    # Without ``RETURNING`` the ORM selects the matching rows first, and
+    # expires their server side ``onupdate`` columns itself. With it, it
+    # may fetch back their primary keys alone, leaving those columns stale.
+    if not keys or not (return_ids or session.get_bind(sa_inspect(cls), clause=statement).dialect.update_returning):
+        return _execute_bulk(cls, statement, return_ids=return_ids)
+    result = _execute_bulk(cls, statement, return_ids=True)
+    ids = set(result.ids or ())
+    for instance in list(session.identity_map.values()):
+        if isinstance(instance, cls) and instance.id in ids:
+            session.expire(instance, keys)
+    return result if return_ids else BulkResult(result.rowcount, None)
+
+
+@lru_cache(maxsize=None)
+def _server_onupdate_keys(cls: Any) -> list[str]:
+    """Return the keys of the ``cls`` column attributes the database sets on updates."""
+    return [prop.key for prop in sa_inspect(cls).column_attrs if prop.columns[0].server_onupdate is not None]
+
+
+def bulk_delete(cls: Any, where: ColumnElement[bool], *, return_ids: bool = False) -> BulkResult:
+    """Delete the ``cls`` rows matching ``where``, in a single statement.
+
+    Matching instances in the session are marked deleted.
+
+    :param return_ids: return the ids of the deleted rows, which takes a
+        database supporting ``DELETE .. RETURNING``
+    """
+    return _execute_bulk(cls, delete(cls).where(where), return_ids=return_ids)
+
+
+class IndexSpec(NamedTuple):
+    """An index built by ``table_args_indexes``.
+
+    E.g. ``IndexSpec(("parent_id", "slug"), unique=True)`` or
+    ``IndexSpec(("slug",), where="deleted IS NULL", include=("name",))``.
+    """
+
+    #: indexed columns, in order
+    columns: tuple[str, ...]
+    unique: bool = False
+    #: SQL condition of the rows indexed by a partial index
+    where: str | None = None
+    #: columns stored in the index, to cover lookups, without being indexed,
+    #: on PostgreSQL only
+    include: tuple[str, ...] = ()
+    #: index name, ``<tablename>_<columns>_idx`` by default
+    name: str | None = None
+
+
 def table_args_indexes(
     tablename: str,
-    columns: Iterable[Union[str, Sequence[str]]],
+    columns: Iterable[Union[str, Sequence[str], IndexSpec]],
 ) -> tuple[schema.Index, ...]:
     """Build table indexes.
 
@@ -110,10 +327,18 @@ def table_args_indexes(
     This is useful as a way to tell `alembic revision --autogenerate` that
     these indexes should exist, even when created manually using `op.execute`.
 
+    Composite, unique, partial and covering indexes are described with an
+    ``IndexSpec``. Partial indexes are rendered for PostgreSQL and SQLite,
+    ``INCLUDE`` columns for PostgreSQL only; list covered columns last in
+    ``columns`` to cover lookups on other databases.
+
     Ref: https://bitbucket.org/zzzeek/alembic/issues/233/add-indexes-to-include_object-hook
     """
     indexes: list[schema.Index] = []
     for item in columns:
+        if isinstance(item, IndexSpec):
+            indexes.append(_spec_index(tablename, item))
+            continue
         # NOTE: the length check, not the item type, decides how an entry is
         # unpacked. Kept as-is to preserve behaviour.
         db_name: Any
@@ -128,3 +353,14 @@ def table_args_indexes(
         idx = schema.Index(idx_name, attr_name)
         indexes.append(idx)
     return tuple(indexes)
+
+
+def _spec_index(tablename: str, spec: IndexSpec) -> schema.Index:
+    """Return the index described by ``spec``."""
+    name = spec.name or f"{tablename}_{'_'.join(spec.columns)}_idx"
+    options: dict[str, Any] = {}
+    if spec.where is not None:
+        options["postgresql_where"] = options["sqlite_where"] = text(spec.where)
+    if spec.include:
+        options["postgresql_include"] = list(spec.include)
+    return schema.Index(name, *spec.columns, unique=spec.unique, **options)
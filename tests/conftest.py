@@ -0,0 +1,93 @@
+"""Shared fixtures."""
+
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import Engine, MetaData, create_engine, event, insert
+from sqlalchemy.orm import scoped_session
+from sqlalchemy.util import ThreadLocalRegistry
+
+from pyramid_basemodel import Session
+from tests.models import ModelBase
+
+#: Rows to insert, by model.
+Rows = Mapping[type[Any], Sequence[dict[str, Any]]]
+
+
+@pytest.fixture
+def db_session() -> Iterator[scoped_session[Any]]:
+    """Bind the global ``Session`` to an in-memory SQLite database with the sample models."""
+    engine = create_engine("sqlite://")
+    ModelBase.metadata.create_all(engine)
+    Session.remove()
+    Session.configure(bind=engine)
+    yield Session
+    Session.remove()
+    Session.configure(bind=None)
+    engine.dispose()
+
+
+@pytest.fixture
+def file_engine(tmp_path: Path) -> Iterator[Callable[..., Engine]]:
+    """Return a factory of SQLite file engines in ``tmp_path``, disposed afterwards.
+
+    The factory takes the file ``name``, the ``metadata`` whose tables to
+    create, the ``rows`` to insert and the names of databases to ``attach``
+    to each connection, as files of their own next to it.
+    """
+    engines: list[Engine] = []
+
+    def make_file_engine(
+        name: str = "db.sqlite",
+        *,
+        metadata: MetaData = ModelBase.metadata,
+        rows: Rows | None = None,
+        attach: Sequence[str] = (),
+    ) -> Engine:
+        engine = create_engine(f"sqlite:///{tmp_path / name}")
+        engines.append(engine)
+        if attach:
+
+            @event.listens_for(engine, "connect")
+            def attach_databases(dbapi_connection: Any, connection_record: Any) -> None:
+                for database in attach:
+                    path = tmp_path / f"{Path(name).stem}.{database}.sqlite"
+                    dbapi_connection.execute(f"ATTACH DATABASE '{path}' AS {database}")
+
+        metadata.create_all(engine)
+        with engine.begin() as conn:
+            for model, model_rows in (rows or {}).items():
+                conn.execute(insert(model), list(model_rows))
+        return engine
+
+    yield make_file_engine
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def engine_rows() -> Rows:
+    """Rows of the ``engine`` fixture, override or parametrize to add some."""
+    return {}
+
+
+@pytest.fixture
+def engine_attached() -> Sequence[str]:
+    """Databases attached by the ``engine`` fixture, override or parametrize to add some."""
+    return ()
+
+
+@pytest.fixture
+def engine(file_engine: Callable[..., Engine], engine_rows: Rows, engine_attached: Sequence[str]) -> Iterator[Engine]:
+    """SQLite file engine with the sample models and ``engine_rows``, bound to the global ``Session``."""
+    engine = file_engine(rows=engine_rows, attach=engine_attached)
+    Session.remove()
+    Session.configure(bind=engine)
+    yield engine
+    Session.remove()
+    # Undo ``use_request_scope``.
+    if not isinstance(Session.registry, ThreadLocalRegistry):
+        Session.registry = ThreadLocalRegistry(Session.session_factory)
+    Session.configure(bind=None)
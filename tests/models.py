@@ -0,0 +1,70 @@
+"""Sample models used by the tests."""
+
+from typing import Optional
+
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from pyramid_basemodel import BaseMixin, Session
+from pyramid_basemodel.cache import CachedMixin
+from pyramid_basemodel.container import InstanceTraversalMixin
+from pyramid_basemodel.hierarchy import MaterializedPathMixin
+from pyramid_basemodel.serialize import JSONMixin
+from pyramid_basemodel.slug import BaseSlugNameMixin
+
+
+class ModelBase(DeclarativeBase):
+    """Declarative base of the sample models.
+
+    Kept apart from ``pyramid_basemodel.Base``, as tests dispose of its registry.
+    """
+
+
+class Page(ModelBase, BaseMixin, BaseSlugNameMixin, JSONMixin):
+    """Sample model looked up by slug, rendered to JSON."""
+
+    __tablename__ = "pages"
+
+
+class Node(ModelBase, BaseMixin, BaseSlugNameMixin, InstanceTraversalMixin):
+    """Sample model forming a tree."""
+
+    __tablename__ = "nodes"
+    _slug_is_unique = False
+
+    parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey("nodes.id"))
+    parent: Mapped[Optional["Node"]] = relationship(remote_side="Node.id", back_populates="children")
+    children: Mapped[list["Node"]] = relationship(back_populates="parent")
+
+
+class Folder(ModelBase, BaseMixin, BaseSlugNameMixin, MaterializedPathMixin):
+    """Sample model forming a tree with materialized paths."""
+
+    __tablename__ = "folders"
+    _slug_is_unique = False
+
+    parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey("folders.id"))
+    parent: Mapped[Optional["Folder"]] = relationship(remote_side="Folder.id", back_populates="children")
+    children: Mapped[list["Folder"]] = relationship(back_populates="parent")
+
+
+class Tag(ModelBase, BaseMixin, BaseSlugNameMixin, CachedMixin):
+    """Sample model kept in the second level cache."""
+
+    __tablename__ = "tags"
+
+
+def make_page(slug: str, name: Optional[str] = None) -> Page:
+    """Return a saved ``Page``."""
+    page = Page(slug=slug, name=name or slug)
+    Session.add(page)
+    Session.flush()
+    return page
+
+
+def make_node(slug: str, parent: Optional[Node] = None) -> Node:
+    """Return a saved ``Node``."""
+    node = Node(slug=slug, name=slug, parent=parent)
+    Session.add(node)
+    Session.flush()
+    return node
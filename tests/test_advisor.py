@@ -0,0 +1,89 @@
+"""Index advisor tests, explaining SQLite query plans."""
+
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any
+
+import pytest
+import transaction
+from sqlalchemy import Column, Engine, Integer, MetaData, Table, select
+from sqlalchemy.orm import scoped_session
+
+from pyramid_basemodel import Session
+from pyramid_basemodel.advisor import IndexSuggestion, capture_queries, find_full_scans, suggest_indexes
+from pyramid_basemodel.container import BaseModelContainer
+from pyramid_basemodel.util import IndexSpec, get_all_matching, table_args_indexes
+from tests.models import Page, make_node, make_page
+
+START, END = datetime(2020, 1, 1), datetime(2030, 1, 1)
+
+
+@pytest.fixture
+def engine(db_session: scoped_session[Any]) -> Iterator[Engine]:
+    """Return the in-memory SQLite engine of the global ``Session``, aborting its transaction afterwards."""
+    engine: Engine = db_session.get_bind()  # type: ignore[assignment]
+    yield engine
+    transaction.abort()
+
+
+def test_traversal(engine: Engine) -> None:
+    """Child lookups of traversal trees scan the table, a composite index would do."""
+    root = make_node("root")
+    make_node("child", parent=root)
+    with capture_queries(engine) as captured:
+        for _ in range(3):
+            assert root["child"].slug == "child"
+    scans = find_full_scans(engine, captured)
+    assert [scan.table for scan in scans] == ["nodes", "nodes"]
+    assert [scan.executions for scan in scans] == [3, 1]
+    assert [scan.suggestion for scan in scans] == [
+        IndexSuggestion("nodes", ("parent_id", "slug")),
+        IndexSuggestion("nodes", ("parent_id",)),
+    ]
+    # The index loading ``children`` is left out, the composite one serves both.
+    assert suggest_indexes(engine, captured) == {"nodes": [IndexSuggestion("nodes", ("parent_id", "slug"))]}
+
+
+def test_container(engine: Engine) -> None:
+    """Lookups by unique columns are left alone, others get an index."""
+    make_page("foo", "Foo")
+    with capture_queries(engine) as captured:
+        assert BaseModelContainer(None, Page)["foo"].name == "Foo"
+        assert BaseModelContainer(None, Page, property_name="name")["Foo"].slug == "foo"
+        assert len(get_all_matching(Page, "name", ["Foo", "Bar"])) == 1
+    assert len(captured.queries) == 3
+    assert suggest_indexes(engine, captured) == {"pages": [IndexSuggestion("pages", ("name",))]}
+    assert IndexSuggestion("pages", ("name",)).spec == IndexSpec(("name",))
+
+
+def test_spec_round_trip() -> None:
+    """Specs of single, two character columns index that column, not pairs of its characters."""
+    (index,) = table_args_indexes("hits", [IndexSuggestion("hits", ("ip",)).spec])
+    Table("hits", MetaData(), Column("i", Integer), Column("p", Integer), Column("ip", Integer), index)
+    assert index.name == "hits_ip_idx"
+    assert [column.name for column in index.columns] == ["ip"]
+
+
+def test_covering(engine: Engine) -> None:
+    """Statements reading a few columns get a covering index, ordered ones an index on the sort column."""
+    make_page("foo")
+    with capture_queries(engine) as captured:
+        Session.scalars(
+            select(Page.name, Page.created).where(Page.version == 1).where(Page.modified.between(START, END))
+        ).all()
+        Session.scalars(select(Page).where(Page.name == "foo").order_by(Page.created)).all()
+        Session.scalars(select(Page)).all()
+    suggestions = suggest_indexes(engine, captured)["pages"]
+    assert IndexSuggestion("pages", ("v", "m"), ("name", "c")) in suggestions
+    assert IndexSuggestion("pages", ("name", "c")) in suggestions
+    assert len(suggestions) == 2
+    assert suggestions[0].spec == IndexSpec(("v", "m"), include=("name", "c"))
+
+
+def test_column_comparisons(engine: Engine) -> None:
+    """Comparing two columns can't use an index, only comparing a column to a value can."""
+    make_page("foo")
+    with capture_queries(engine) as captured:
+        Session.scalars(select(Page.name).where(Page.modified > Page.created).where(Page.version == 1)).all()
+        Session.scalars(select(Page.name).where(Page.modified > Page.created)).all()
+    assert suggest_indexes(engine, captured) == {"pages": [IndexSuggestion("pages", ("v",), ("name",))]}
@@ -0,0 +1,107 @@
+"""Asyncio API tests."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from pyramid_basemodel.asyncio import (
+    AsyncSession,
+    async_bind_engine,
+    ensure_unique,
+    get_all_matching,
+    get_or_create,
+    save,
+)
+from pyramid_basemodel.container import BaseModelContainer
+from tests.models import ModelBase, Node, Page
+
+pytest.importorskip("aiosqlite")
+
+
+def run_with_db(tmp_path: Path, test: Callable[[], Awaitable[Any]]) -> None:
+    """Run the ``test`` coroutine with ``AsyncSession`` bound to a SQLite file."""
+
+    async def run() -> None:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}")
+        await async_bind_engine(engine, base=ModelBase, should_create=True)
+        try:
+            await test()
+        finally:
+            await AsyncSession.remove()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_get_or_create_and_save(tmp_path: Path) -> None:
+    """Instances are created, saved and then found."""
+
+    async def test() -> None:
+        page = await get_or_create(Page, slug="foo")
+        assert inspect(page).transient
+        page.name = "Foo"
+        await save(page, flush=True)
+        assert page.id is not None
+        assert await get_or_create(Page, slug="foo") is page
+        assert await get_or_create(Page, session=AsyncSession, slug="foo") is page
+        node = await get_or_create(Node, slug="foo", parent_id=None)
+        assert inspect(node).transient
+
+    run_with_db(tmp_path, test)
+
+
+def test_get_all_matching(tmp_path: Path) -> None:
+    """Instances matching any of the values are returned."""
+
+    async def test() -> None:
+        pages = [Page(slug=slug, name=slug) for slug in ("a", "b", "c")]
+        await save(pages, flush=True)
+        matching = await get_all_matching(Page, "slug", ["a", "c", "d"])
+        assert sorted(matching, key=lambda page: page.slug) == [pages[0], pages[2]]
+
+    run_with_db(tmp_path, test)
+
+
+def test_ensure_unique(tmp_path: Path) -> None:
+    """Values are suffixed until unique amongst the selected instances."""
+
+    async def test() -> None:
+        first = Page(slug="foo", name="foo")
+        await save(first, flush=True)
+        assert await ensure_unique(first, select(Page), Page.slug, "foo") == "foo"
+        assert await ensure_unique(Page(), select(Page), Page.slug, "foo") == "foo-1"
+
+    run_with_db(tmp_path, test)
+
+
+def test_container_aget_child(tmp_path: Path) -> None:
+    """Containers look children up through the ``AsyncSession``."""
+
+    async def test() -> None:
+        page = Page(slug="foo", name="Foo")
+        await save(page, flush=True)
+        assert await BaseModelContainer(None, Page).aget_child("foo") is page
+        assert await BaseModelContainer(None, Page).aget_child("bar") is None
+        assert await BaseModelContainer(None, Page, property_name="name").aget_child("Foo") is page
+
+    run_with_db(tmp_path, test)
+
+
+def test_session_per_task(tmp_path: Path) -> None:
+    """Concurrent tasks each get their own session."""
+
+    async def test() -> None:
+        async def get_session() -> Any:
+            session = AsyncSession()
+            await AsyncSession.remove()
+            return session
+
+        first, second = await asyncio.gather(get_session(), get_session())
+        assert first is not second
+
+    run_with_db(tmp_path, test)
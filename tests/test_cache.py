@@ -0,0 +1,195 @@
+"""Second level cache tests."""
+
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+import transaction
+from pyramid.config import Configurator
+from sqlalchemy import create_engine, update
+from sqlalchemy import inspect as sa_inspect
+
+from pyramid_basemodel import Session, bind_engine
+from pyramid_basemodel.cache import DEFAULT_TTL, CacheBackend, FileBackend, LRUBackend, cache
+from pyramid_basemodel.container import BaseModelContainer
+from pyramid_basemodel.instrumentation import collect_query_stats, instrument_engine
+from tests.models import ModelBase, Tag
+
+
+@pytest.fixture(params=["lru", "file"])
+def backend(request: pytest.FixtureRequest, tmp_path: Path) -> Iterator[CacheBackend]:
+    """Each cache backend, used by the global ``cache``."""
+    backend: CacheBackend = LRUBackend() if request.param == "lru" else FileBackend(tmp_path / "cache")
+    cache.configure(backend)
+    yield backend
+    cache.configure(None)
+
+
+@pytest.fixture
+def tag(tmp_path: Path, backend: CacheBackend) -> Iterator[Tag]:
+    """Commit a tag, with the global ``Session`` bound to an instrumented SQLite file."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    instrument_engine(engine)
+    Session.remove()
+    bind_engine(engine, base=ModelBase, should_create=True)
+    Session.add(Tag(slug="foo", name="Foo"))
+    transaction.commit()
+    yield Session.scalars(Tag.query.statement).one()
+    transaction.abort()
+    Session.remove()
+    Session.configure(bind=None)
+    engine.dispose()
+
+
+def queries(lookup: Any) -> tuple[Any, int]:
+    """Return the result of calling ``lookup`` and the number of statements it ran."""
+    with collect_query_stats() as stats:
+        result = lookup()
+    return result, stats.count
+
+
+def fresh_session() -> None:
+    """Start over with an empty identity map."""
+    transaction.abort()
+    Session.remove()
+
+
+def test_lru_backend() -> None:
+    """Entries are evicted least recently used first, and expire."""
+    backend = LRUBackend(size=2)
+    backend.set("t", "a", 1)
+    backend.set("t", "b", 2)
+    assert backend.get("t", "a") == 1
+    backend.set("t", "c", 3)
+    assert backend.get("t", "b") is None
+    assert backend.get("t", "a") == 1
+    backend.clear("t")
+    assert backend.get("t", "a") is None
+    expiring = LRUBackend(ttl=0.01)
+    expiring.set("t", "a", 1)
+    time.sleep(0.02)
+    assert expiring.get("t", "a") is None
+
+
+@pytest.mark.parametrize(("settings", "ttl"), [({}, DEFAULT_TTL), ({"basemodel.cache.ttl": "60"}, 60)])
+def test_configured_ttl(settings: dict[str, str], ttl: float) -> None:
+    """Entries expire after five minutes, unless configured otherwise."""
+    config = Configurator(settings={"basemodel.should_bind_engine": "false", "basemodel.cache": "lru", **settings})
+    config.include("pyramid_basemodel")
+    config.commit()
+    assert cache.backend is not None
+    assert cache.backend.ttl == ttl
+    cache.configure(None)
+
+
+def test_file_backend(tmp_path: Path) -> None:
+    """Entries are stored by namespace, deleted and expire."""
+    backend = FileBackend(tmp_path)
+    backend.set("t", "a", {"id": 1})
+    backend.set("t", "b", {"id": 2})
+    backend.set("u", "a", {"id": 3})
+    assert backend.get("t", "a") == {"id": 1}
+    backend.delete("t", ["a"])
+    assert backend.get("t", "a") is None
+    backend.clear("t")
+    assert backend.get("t", "b") is None
+    assert backend.get("u", "a") == {"id": 3}
+    expiring = FileBackend(tmp_path, ttl=-1)
+    expiring.set("t", "a", 1)
+    assert expiring.get("t", "a") is None
+
+
+def test_cached_get(tag: Tag) -> None:
+    """Cached instances are merged into the session without a query."""
+    tag_id = tag.id
+    assert Tag.cached_get(tag_id) is tag
+    fresh_session()
+    first, count = queries(lambda: Tag.cached_get(tag_id))
+    assert count == 1
+    fresh_session()
+    cached, count = queries(lambda: Tag.cached_get(tag_id))
+    assert count == 0
+    assert (cached.slug, cached.name) == ("foo", "Foo")
+    assert sa_inspect(cached).persistent
+    assert not Session.dirty
+    assert Tag.cached_get(tag_id + 1) is None
+
+
+def test_commit_invalidates(tag: Tag) -> None:
+    """Committed changes invalidate the entry, uncommitted ones aren't cached."""
+    tag_id = tag.id
+    Tag.cached_get(tag_id).name = "Bar"
+    Session.flush()
+    fresh_session()
+    assert Tag.cached_get(tag_id).name == "Foo"
+    Tag.cached_get(tag_id).name = "Bar"
+    transaction.commit()
+    Session.remove()
+    assert Tag.cached_get(tag_id).name == "Bar"
+
+
+def test_cached_get_by(tag: Tag) -> None:
+    """Instances are cached by unique columns, which are checked on the way out."""
+    fresh_session()
+    assert Tag.cached_get_by(slug="foo").name == "Foo"
+    fresh_session()
+    cached, count = queries(lambda: Tag.cached_get_by(slug="foo"))
+    assert count == 0
+    cached.slug = "bar"
+    transaction.commit()
+    Session.remove()
+    assert Tag.cached_get_by(slug="foo") is None
+    assert Tag.cached_get_by(slug="bar").name == "Foo"
+    with pytest.raises(ValueError):
+        Tag.cached_get_by(name="Foo")
+
+
+def test_bulk_statements_invalidate_the_table(tag: Tag) -> None:
+    """Bulk updates clear the cached table."""
+    tag_id = tag.id
+    fresh_session()
+    Tag.cached_get(tag_id)
+    Session.execute(update(Tag).values(name="Bar"))
+    transaction.commit()
+    Session.remove()
+    assert Tag.cached_get(tag_id).name == "Bar"
+
+
+def test_container_uses_the_cache(tag: Tag) -> None:
+    """Containers look children up by unique properties through the cache."""
+    fresh_session()
+    BaseModelContainer(None, Tag).get_child("foo")
+    fresh_session()
+    child, count = queries(lambda: BaseModelContainer(None, Tag).get_child("foo"))
+    assert count == 0
+    assert child.name == "Foo"
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_cross_process_invalidation(tag: Tag, backend: CacheBackend) -> None:
+    """Commits in one process invalidate the file backend entries read by another."""
+    if not isinstance(backend, FileBackend):
+        pytest.skip("only the file backend is shared between processes")
+    tag_id = tag.id
+    fresh_session()
+    assert Tag.cached_get(tag_id).name == "Foo"
+    fresh_session()
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - runs in the child
+        status = 1
+        try:
+            Tag.cached_get(tag_id).name = "Bar"
+            transaction.commit()
+            status = 0
+        finally:
+            os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    cached, count = queries(lambda: Tag.cached_get(tag_id))
+    assert count == 1
+    assert cached.name == "Bar"
@@ -0,0 +1,101 @@
+"""Conditional request tests."""
+
+from datetime import datetime, timedelta
+from typing import Any
+
+import pytest
+from pyramid.config import Configurator
+from pyramid.request import Request
+from pyramid.router import Router
+from sqlalchemy import Engine, insert, update
+from sqlalchemy.orm import scoped_session
+
+from pyramid_basemodel import Session
+from pyramid_basemodel.conditional import validators_for
+from pyramid_basemodel.container import BaseModelContainer
+from pyramid_basemodel.instrumentation import collect_query_stats, instrument_engine
+from pyramid_basemodel.tree import BaseContentRoot
+from tests.conftest import Rows
+from tests.models import Node, make_node
+
+
+class Root(BaseContentRoot):
+    """Traversal root with a container of nodes."""
+
+    mapping = {"nodes": (Node, BaseModelContainer, {})}
+
+
+@pytest.fixture
+def engine_rows() -> Rows:
+    """Insert a single node."""
+    return {Node: [{"slug": "foo", "name": "Foo"}]}
+
+
+def make_app(calls: list[str]) -> Router:
+    """Return a traversal app rendering nodes and their listing, conditionally."""
+    config = Configurator(root_factory=Root, settings={"basemodel.should_bind_engine": "false"})
+    config.include("pyramid_tm")
+    config.include("pyramid_basemodel")
+
+    def node(context: Node, request: Request) -> dict[str, Any]:
+        calls.append(context.slug)
+        return {"name": context.name}
+
+    def listing(context: BaseModelContainer, request: Request) -> list[str]:
+        calls.append("listing")
+        return [node.slug for node in Session.scalars(context.model_cls.query.statement)]
+
+    config.add_view(node, context=Node, renderer="json", conditional=True)
+    config.add_view(listing, context=BaseModelContainer, renderer="json", conditional=True)
+    return config.make_wsgi_app()
+
+
+def test_instance(engine: Engine) -> None:
+    """Instances answer with validators, and ``304`` once the client has them."""
+    calls: list[str] = []
+    app = make_app(calls)
+    response = Request.blank("/nodes/foo").get_response(app)
+    assert response.status_int == 200
+    assert response.headers["ETag"].startswith('W/"')
+    assert response.last_modified is not None
+    etag = response.headers["ETag"]
+
+    cached = Request.blank("/nodes/foo", headers={"If-None-Match": etag}).get_response(app)
+    assert cached.status_int == 304
+    assert cached.headers["ETag"] == etag
+    since = Request.blank("/nodes/foo", if_modified_since=response.last_modified).get_response(app)
+    assert since.status_int == 304
+    assert calls == ["foo"]
+
+    with engine.begin() as conn:
+        conn.execute(update(Node).values(name="Bar", modified=datetime.utcnow() + timedelta(seconds=2)))
+    changed = Request.blank("/nodes/foo", headers={"If-None-Match": etag}).get_response(app)
+    assert changed.status_int == 200
+    assert changed.headers["ETag"] != etag
+    assert Request.blank("/nodes/foo", POST={}, headers={"If-None-Match": etag}).get_response(app).status_int == 200
+
+
+def test_container(engine: Engine) -> None:
+    """Containers' validators change with their rows."""
+    calls: list[str] = []
+    app = make_app(calls)
+    etag = Request.blank("/nodes").get_response(app).headers["ETag"]
+    assert Request.blank("/nodes", headers={"If-None-Match": etag}).get_response(app).status_int == 304
+    with engine.begin() as conn:
+        conn.execute(insert(Node), {"slug": "bar", "name": "Bar"})
+    response = Request.blank("/nodes", headers={"If-None-Match": etag}).get_response(app)
+    assert response.json == ["foo", "bar"]
+    assert calls == ["listing", "listing"]
+
+
+def test_unloaded_columns(db_session: scoped_session[Any]) -> None:
+    """Expired instances have their validators read with a column only query."""
+    instrument_engine(db_session.get_bind())  # type: ignore[arg-type]
+    node = make_node("foo")
+    validators = validators_for(node)
+    db_session.expire(node)
+    with collect_query_stats() as stats:
+        assert validators_for(node) == validators
+    (record,) = stats.records
+    assert "slug" not in record.statement
+    assert validators_for(object()) is None
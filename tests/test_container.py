@@ -0,0 +1,77 @@
+"""Container module tests."""
+
+import subprocess
+import sys
+from typing import Any
+
+import pytest
+from pyramid.interfaces import ILocation
+from sqlalchemy.orm import Query, scoped_session
+
+from pyramid_basemodel.container import BaseModelContainer, child_lookup_statement
+from tests.models import Node, Page, make_node, make_page
+
+
+def test_container_getitem(db_session: scoped_session[Any]) -> None:
+    """Instances are looked up by slug and made locatable."""
+    page = make_page("foo")
+    container = BaseModelContainer(None, Page)
+    assert container["foo"] is page
+    assert page._located_parent is container
+    assert ILocation.providedBy(page)
+    with pytest.raises(KeyError):
+        container["bar"]
+    with pytest.raises(KeyError):
+        container["not a slug"]
+
+
+def test_container_property_name(db_session: scoped_session[Any]) -> None:
+    """Instances can be looked up by another column."""
+    page = make_page("foo", name="Foo")
+    assert BaseModelContainer(None, Page, property_name="name")["Foo"] is page
+
+
+def test_instance_getitem(db_session: scoped_session[Any]) -> None:
+    """Children are looked up by slug amongst the instance's own children."""
+    root = make_node("root")
+    other = make_node("other")
+    child = make_node("child", parent=root)
+    make_node("child", parent=other)
+    grandchild = make_node("grandchild", parent=child)
+
+    assert root["child"] is child
+    assert root["child"]["grandchild"] is grandchild
+    assert grandchild.__parent__ is child
+    with pytest.raises(KeyError):
+        root["grandchild"]
+    with pytest.raises(KeyError):
+        child["child"]
+
+
+def test_instance_getitem_custom_query(db_session: scoped_session[Any], monkeypatch: pytest.MonkeyPatch) -> None:
+    """A customised ``_base_child_query`` is still honoured."""
+    root = make_node("root")
+    make_node("hidden", parent=root)
+
+    def base_child_query(self: Node) -> Query[Any]:
+        return Node.query.filter(Node.slug != "hidden")
+
+    monkeypatch.setattr(Node, "_base_child_query", property(base_child_query))
+    with pytest.raises(KeyError):
+        root["hidden"]
+
+
+def test_child_lookup_statement() -> None:
+    """Statements are cached, and only built for plain parent relations."""
+    lookup = child_lookup_statement(Node, "slug")
+    assert lookup is not None
+    assert child_lookup_statement(Node, "slug") is lookup
+    assert lookup[1] == ("id",)
+    assert child_lookup_statement(Page, "slug") is None
+    assert child_lookup_statement(Node, "missing") is None
+
+
+def test_sync_imports() -> None:
+    """Sync users don't load the asyncio machinery."""
+    code = "import sys, pyramid_basemodel.container; assert 'sqlalchemy.ext.asyncio' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
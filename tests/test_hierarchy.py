@@ -0,0 +1,139 @@
+"""Materialized path tests."""
+
+from typing import Any
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm import scoped_session
+
+from pyramid_basemodel.instrumentation import collect_query_stats, instrument_engine
+from tests.models import Folder
+
+
+def make_tree(session: scoped_session[Any]) -> dict[str, Folder]:
+    """Return a saved tree of folders, by slug: ``a/b/c/d`` and ``a/e``, with ``x`` apart."""
+    a = Folder(slug="a", name="a")
+    b = Folder(slug="b", name="b", parent=a)
+    c = Folder(slug="c", name="c", parent=b)
+    d = Folder(slug="d", name="d", parent=c)
+    e = Folder(slug="e", name="e", parent=a)
+    x = Folder(slug="x", name="x")
+    session.add_all([d, e, x])
+    session.flush()
+    return {folder.slug: folder for folder in (a, b, c, d, e, x)}
+
+
+def test_paths_on_insert(db_session: scoped_session[Any]) -> None:
+    """New instances get their path from their parent, even when inserted in the same flush."""
+    tree = make_tree(db_session)
+    a, b, c, d = tree["a"], tree["b"], tree["c"], tree["d"]
+    assert a.path == "/"
+    assert d.path == f"/{a.id}/{b.id}/{c.id}/"
+    assert (a.depth, d.depth) == (0, 3)
+
+
+def test_single_queries(db_session: scoped_session[Any]) -> None:
+    """Ancestors, descendants and subtree counts take a query whatever the depth."""
+    instrument_engine(db_session.get_bind())  # type: ignore[arg-type]
+    tree = make_tree(db_session)
+    a, d = tree["a"], tree["d"]
+    db_session.expire_all()
+    with collect_query_stats() as stats:
+        assert [folder.slug for folder in d.ancestors()] == ["a", "b", "c"]
+    assert stats.count == 2
+    db_session.refresh(tree["x"])
+    with collect_query_stats() as stats:
+        assert [folder.slug for folder in a.descendants()] == ["b", "e", "c", "d"]
+        assert [folder.slug for folder in a.descendants(depth=1)] == ["b", "e"]
+        assert a.subtree_count() == 4
+        assert tree["x"].subtree_count() == 0
+    assert stats.count == 4
+
+
+def test_parent_lineage(db_session: scoped_session[Any]) -> None:
+    """Walking up from an instance loads its lineage at once."""
+    instrument_engine(db_session.get_bind())  # type: ignore[arg-type]
+    make_tree(db_session)
+    db_session.expire_all()
+    d = Folder.query.filter_by(slug="d").one()
+    with collect_query_stats() as stats:
+        parents = []
+        target: Any = d
+        while isinstance(target, Folder):
+            target = target.__parent__
+            parents.append(getattr(target, "slug", None))
+    assert parents == ["c", "b", "a", None]
+    assert stats.count == 1
+
+
+def test_move(db_session: scoped_session[Any]) -> None:
+    """Moving an instance moves its descendants, loaded or not."""
+    tree = make_tree(db_session)
+    a, b, c, d, x = tree["a"], tree["b"], tree["c"], tree["d"], tree["x"]
+    b.parent = x
+    db_session.flush()
+    assert (b.path, b.depth) == (f"/{x.id}/", 1)
+    assert (d.path, d.depth) == (f"/{x.id}/{b.id}/{c.id}/", 3)
+    assert a.subtree_count() == 1
+
+    db_session.expire_all()
+    c = Folder.get(c.id)  # type: ignore[assignment]
+    c.parent_id = None
+    db_session.flush()
+    db_session.expire_all()
+    assert (Folder.get(d.id).path, Folder.get(d.id).depth) == (f"/{c.id}/", 1)  # type: ignore[union-attr]
+    assert x.subtree_count() == 1
+
+    with pytest.raises(ValueError):
+        c.parent = Folder.get(d.id)
+        db_session.flush()
+
+
+def test_delete(db_session: scoped_session[Any]) -> None:
+    """Deleting an instance moves its children to the top level."""
+    tree = make_tree(db_session)
+    a, b, d = tree["a"], tree["b"], tree["d"]
+    db_session.delete(a)
+    db_session.flush()
+    assert (b.path, b.depth) == ("/", 0)
+    assert b.subtree_count() == 2
+    assert d.depth == 2
+
+
+def test_rebuild_paths(db_session: scoped_session[Any]) -> None:
+    """Paths are recomputed from the parents."""
+    tree = make_tree(db_session)
+    db_session.execute(update(Folder).values(path="/", depth=0))
+    Folder.rebuild_paths()
+    d = Folder.get(tree["d"].id)
+    assert d is not None
+    assert d.depth == 3
+    assert [folder.slug for folder in d.ancestors()] == ["a", "b", "c"]
+
+
+def make_chain(session: scoped_session[Any], count: int, first_id: int) -> list[Folder]:
+    """Return ``count`` saved folders, each the child of the previous one, with ids of nine digits from ``first_id``."""
+    chain: list[Folder] = []
+    for n in range(count):
+        chain.append(Folder(id=first_id + n, slug=f"f{first_id + n}", name="f", parent=chain[-1] if chain else None))
+    session.add_all(chain)
+    session.flush()
+    return chain
+
+
+def test_path_length_on_insert(db_session: scoped_session[Any]) -> None:
+    """Inserting instances too deep for the ``path`` column raises."""
+    chain = make_chain(db_session, 26, 10**8)
+    assert len(chain[-1].path) == 251
+    with pytest.raises(ValueError, match="too deep"):
+        db_session.add(Folder(slug="deeper", name="deeper", parent=chain[-1]))
+        db_session.flush()
+
+
+def test_path_length_on_move(db_session: scoped_session[Any]) -> None:
+    """Moving instances whose descendants would get too deep for the ``path`` column raises."""
+    chain = make_chain(db_session, 25, 10**8)
+    top, child = make_chain(db_session, 2, 2 * 10**8)
+    top.parent = chain[-1]
+    with pytest.raises(ValueError, match="too deep"):
+        db_session.flush()
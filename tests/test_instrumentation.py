@@ -0,0 +1,120 @@
+"""Query instrumentation tests."""
+
+import logging
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from pyramid.config import Configurator
+from pyramid.request import Request
+from pyramid.router import Router
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from pyramid_basemodel.instrumentation import (
+    QueryStats,
+    collect_query_stats,
+    current_query_stats,
+    instrument_engine,
+    statement_shape,
+)
+
+
+@pytest.fixture
+def engine() -> Iterator[Engine]:
+    """Instrumented in-memory SQLite engine."""
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    yield engine
+    engine.dispose()
+
+
+def make_app(engine: Engine, **settings: Any) -> Router:
+    """Return an app with a view running a query per ``n`` request param."""
+    config = Configurator(
+        settings={"basemodel.should_bind_engine": "false", "basemodel.query_stats": "true", **settings}
+    )
+    config.include("pyramid_basemodel")
+
+    def view(request: Request) -> dict[str, Any]:
+        with engine.connect() as conn:
+            for n in range(int(request.params.get("n", 1))):
+                conn.execute(text("SELECT :n"), {"n": n})
+        stats = request.query_stats
+        return {"count": stats.count}
+
+    config.add_route("queries", "/")
+    config.add_view(view, route_name="queries", renderer="json")
+    return config.make_wsgi_app()
+
+
+def test_statement_shape() -> None:
+    """Whitespace and expanded ``IN`` parameter lists are normalized."""
+    assert statement_shape("SELECT a\n  FROM t WHERE id IN (?, ?, ?)") == "SELECT a FROM t WHERE id IN (?)"
+    assert statement_shape("WHERE id IN (%(id_1)s, %(id_2)s)") == "WHERE id IN (?)"
+
+
+def test_query_stats() -> None:
+    """Counts, totals, slowest and repeated statements are derived from the records."""
+    stats = QueryStats()
+    stats.record("SELECT 1", (), 0.1)
+    for n in range(3):
+        stats.record(f"SELECT * FROM t WHERE id IN ({', '.join('?' * (n + 2))})", (), 0.01)
+    assert stats.count == 4
+    assert stats.total_time == pytest.approx(0.13)
+    assert stats.slowest(1)[0].statement == "SELECT 1"
+    assert stats.repeated(3) == {"SELECT * FROM t WHERE id IN (?)": 3}
+    assert stats.as_dict()["count"] == 4
+
+
+def test_collect_query_stats(engine: Engine) -> None:
+    """Statements are only collected within ``collect_query_stats``."""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with collect_query_stats() as stats:
+            assert current_query_stats() is stats
+            conn.execute(text("SELECT 2"))
+        conn.execute(text("SELECT 3"))
+    assert current_query_stats() is None
+    assert [query_record.statement for query_record in stats.records] == ["SELECT 2"]
+
+
+def test_failed_statements_are_recorded(engine: Engine) -> None:
+    """Statements raising an error are still timed."""
+    with engine.connect() as conn, collect_query_stats() as stats:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing"))
+        conn.execute(text("SELECT 1"))
+    assert [query_record.statement for query_record in stats.records] == ["SELECT * FROM missing", "SELECT 1"]
+
+
+def test_tween_server_timing(engine: Engine) -> None:
+    """The tween collects the request's statements and adds ``Server-Timing``."""
+    app = make_app(engine)
+    response = Request.blank("/?n=3").get_response(app)
+    assert response.json == {"count": 3}
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert response.headers["Server-Timing"].endswith('desc="3 queries"')
+
+
+def test_tween_without_server_timing(engine: Engine) -> None:
+    """The header can be disabled."""
+    app = make_app(engine, **{"basemodel.query_stats.server_timing": "false"})
+    response = Request.blank("/").get_response(app)
+    assert "Server-Timing" not in response.headers
+
+
+def test_tween_logs_n_plus_one_and_slow_queries(engine: Engine, caplog: pytest.LogCaptureFixture) -> None:
+    """Repeated statement shapes and slow statements are logged."""
+    app = make_app(
+        engine,
+        **{
+            "basemodel.query_stats.n_plus_one_threshold": "5",
+            "basemodel.query_stats.slow_threshold": "0",
+        },
+    )
+    with caplog.at_level(logging.WARNING, logger="pyramid_basemodel.instrumentation"):
+        Request.blank("/?n=5").get_response(app)
+    messages = [record.getMessage() for record in caplog.records]
+    assert "Possible N+1: 5 queries in GET /: SELECT ?" in messages
+    assert len([message for message in messages if message.startswith("Slow query")]) == 5
@@ -1,6 +1,17 @@
 """Model test module."""
 
-from pyramid_basemodel import BaseMixin
+from datetime import datetime
+from typing import Any
+
+import pytest
+from sqlalchemy import Unicode, create_engine, create_mock_engine, insert, select, text, update
+from sqlalchemy.dialects import registry
+from sqlalchemy.exc import CompileError
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, scoped_session
+
+from pyramid_basemodel import BaseMixin, ServerDefaultBaseMixin, utcnow
+from pyramid_basemodel.instrumentation import collect_query_stats, instrument_engine
+from tests.models import Page
 
 
 def test_model_classname() -> None:
@@ -77,3 +88,144 @@ def test_model_plurar_class_name() -> None:
     assert ProcessMaterials.plural_class_name == "Process Materials"
     ProcessMaterials._plural_class_name = "Pro Materials"
     assert ProcessMaterials.plural_class_name == "Pro Materials"
+
+
+def test_server_default_mixin_bulk_writes() -> None:
+    """Bulk SQL level writes get timestamps and version from the database."""
+
+    class Base(DeclarativeBase):
+        pass
+
+    class Thing(Base, ServerDefaultBaseMixin):
+        __tablename__ = "things"
+        name: Mapped[str | None] = mapped_column(Unicode(16))
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.execute(insert(Thing), [{"name": "a"}, {"name": "b"}])
+        version, created, modified = session.execute(
+            select(Thing.version, Thing.created, Thing.modified).where(Thing.name == "a")
+        ).one()
+        assert version == 1
+        assert isinstance(created, datetime)
+        assert modified == created
+
+        session.execute(insert(Thing).values(name="old", modified=datetime(2000, 1, 1)))
+        session.execute(update(Thing).values(name="c"))
+        for (modified_after,) in session.execute(select(Thing.modified)):
+            assert modified_after >= modified
+
+
+def test_utcnow_dialects() -> None:
+    """``utcnow`` renders a UTC timestamp, and refuses dialects without one."""
+    assert str(utcnow().compile(dialect=registry.load("mysql")())) == "UTC_TIMESTAMP(6)"
+    assert str(utcnow().compile(dialect=registry.load("postgresql")())) == "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+    with pytest.raises(CompileError):
+        utcnow().compile(dialect=registry.load("oracle")())
+
+
+def test_server_default_mixin_keeps_explicit_modified() -> None:
+    """The update trigger leaves an explicitly assigned ``modified`` alone."""
+
+    class Base(DeclarativeBase):
+        pass
+
+    class Thing(Base, ServerDefaultBaseMixin):
+        __tablename__ = "things"
+        name: Mapped[str | None] = mapped_column(Unicode(16))
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        thing = Thing(name="a")
+        session.add(thing)
+        session.flush()
+        assert thing.version == 1
+        assert thing.created is not None
+
+        thing.modified = datetime(2000, 1, 1)
+        session.flush()
+        session.expire(thing)
+        assert thing.modified == datetime(2000, 1, 1)
+
+
+def test_server_default_mixin_without_trigger() -> None:
+    """No trigger is created when a model opts out."""
+
+    class Base(DeclarativeBase):
+        pass
+
+    class Thing(Base, ServerDefaultBaseMixin):
+        __tablename__ = "things"
+        _modified_trigger = False
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        triggers = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).all()
+    assert triggers == []
+
+
+def test_server_default_mixin_trigger_dialects() -> None:
+    """MySQL gets a trigger too, databases without one refuse to create the table."""
+
+    class Base(DeclarativeBase):
+        pass
+
+    class Thing(Base, ServerDefaultBaseMixin):
+        __tablename__ = "things"
+
+    statements: list[str] = []
+    dialect = registry.load("mysql")()
+    mysql = create_mock_engine(
+        "mysql://", lambda sql, *args, **kw: statements.append(str(sql.compile(dialect=dialect)))
+    )
+    Base.metadata.create_all(mysql, checkfirst=False)
+    assert statements[-1] == (
+        "CREATE TRIGGER things_m_onupdate BEFORE UPDATE ON things FOR EACH ROW "
+        "SET NEW.m = IF(NEW.m <=> OLD.m, UTC_TIMESTAMP(6), NEW.m)"
+    )
+    mssql = create_mock_engine("mssql://", lambda sql, *args, **kw: None)
+    with pytest.raises(CompileError, match="_modified_trigger"):
+        Base.metadata.create_all(mssql, checkfirst=False)
+
+
+def test_get(db_session: scoped_session[Any]) -> None:
+    """Instances in the identity map are returned without a query."""
+    instrument_engine(db_session.get_bind())  # type: ignore[arg-type]
+    page = Page(slug="foo", name="Foo")
+    db_session.add(page)
+    db_session.flush()
+    with collect_query_stats() as stats:
+        assert Page.get(page.id) is page
+    assert stats.count == 0
+    db_session.expunge_all()
+    assert Page.get(page.id).slug == "foo"  # type: ignore[union-attr]
+    assert Page.get(page.id + 1) is None
+
+
+def test_get_many(db_session: scoped_session[Any]) -> None:
+    """Identity map misses are loaded with a single query, in the given order."""
+    instrument_engine(db_session.get_bind())  # type: ignore[arg-type]
+    db_session.add_all([Page(slug=slug, name=slug) for slug in ("a", "b", "c", "d")])
+    db_session.flush()
+    a, b, c, d = db_session.scalars(select(Page).order_by(Page.id)).all()
+    ids = [d.id, a.id, 404, c.id, b.id]
+    db_session.expunge(b)
+    db_session.expunge(d)
+    db_session.expire(c)
+    with collect_query_stats() as stats:
+        pages = Page.get_many(ids)
+    assert stats.count == 1
+    assert [page.slug for page in pages] == ["d", "a", "c", "b"]
+    assert pages[1] is a
+    assert pages[2] is c
+    with collect_query_stats() as stats:
+        assert Page.get_many([a.id, a.id]) == [a, a]
+    assert stats.count == 0
+    with collect_query_stats() as stats:
+        assert Page.get_many([str(a.id)]) == [a]
+    assert stats.count == 0
+    with pytest.raises(ValueError):
+        Page.get_many(["a"])
@@ -0,0 +1,179 @@
+"""Connection pool warm-up, fork safety and metrics tests."""
+
+import os
+from pathlib import Path
+
+import pytest
+from pyramid.config import Configurator
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from pyramid_basemodel import bind_engine
+from pyramid_basemodel.pool import PoolMetrics, dispose_after_fork, get_pool_metrics, warm_up_pool
+
+
+def test_warm_up_pool(tmp_path: Path) -> None:
+    """Warm-up opens connections and leaves them in the pool."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", poolclass=QueuePool, pool_size=3)
+    assert warm_up_pool(engine, 2) == 2
+    assert engine.pool.checkedin() == 2  # type: ignore[attr-defined]
+    assert engine.pool.checkedout() == 0  # type: ignore[attr-defined]
+
+
+def test_warm_up_pool_capped_at_pool_size(tmp_path: Path) -> None:
+    """Overflow connections would be closed on checkin, so are not opened."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", poolclass=QueuePool, pool_size=2)
+    assert warm_up_pool(engine, 10) == 2
+    assert engine.pool.checkedin() == 2  # type: ignore[attr-defined]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_fork_safe_engine(tmp_path: Path) -> None:
+    """A forked child gets its own pool, and both processes keep working."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", poolclass=QueuePool, connect_args={"timeout": 30})
+    session = scoped_session(sessionmaker())
+    bind_engine(engine, session=session)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE hits (pid INTEGER)"))
+    parent_pool = engine.pool
+    assert parent_pool.checkedin() == 1  # type: ignore[attr-defined]
+
+    def run_queries() -> None:
+        for _ in range(50):
+            session.execute(text("INSERT INTO hits (pid) VALUES (:pid)"), {"pid": os.getpid()})
+            session.commit()
+            session.execute(text("SELECT count(*) FROM hits")).scalar()
+            session.commit()
+        session.remove()
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - runs in the child
+        status = 1
+        try:
+            if engine.pool is not parent_pool and engine.pool.checkedin() == 0:  # type: ignore[attr-defined]
+                run_queries()
+                status = 0
+        finally:
+            os._exit(status)
+
+    run_queries()
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert engine.pool is parent_pool
+    with engine.connect() as conn:
+        counts = {hit_pid: hits for hit_pid, hits in conn.execute(text("SELECT pid, count(*) FROM hits GROUP BY pid"))}
+    assert counts == {os.getpid(): 50, pid: 50}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_warm_up_after_fork(tmp_path: Path) -> None:
+    """A pool warmed up before forking is warmed up again in the child."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", poolclass=QueuePool, pool_size=3)
+    dispose_after_fork(engine)
+    warm_up_pool(engine, 2)
+    parent_pool = engine.pool
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - runs in the child
+        status = 1
+        try:
+            if engine.pool is not parent_pool and engine.pool.checkedin() == 2:  # type: ignore[attr-defined]
+                status = 0
+        finally:
+            os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert engine.pool is parent_pool
+
+
+def test_dispose_after_fork_registers_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Binding the same engine twice registers a single fork hook."""
+    hooks = []
+    monkeypatch.setattr(os, "register_at_fork", lambda **kwargs: hooks.append(kwargs))
+    engine = create_engine("sqlite://")
+    dispose_after_fork(engine)
+    dispose_after_fork(engine)
+    assert len(hooks) == 1
+
+
+def test_pool_metrics(tmp_path: Path) -> None:
+    """Checkouts, checkins, connects and overflow use are counted."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", poolclass=QueuePool, pool_size=1, max_overflow=1)
+    metrics = PoolMetrics()
+    metrics.instrument(engine)
+
+    with engine.connect() as first, engine.connect() as second:
+        first.execute(text("SELECT 1"))
+        second.execute(text("SELECT 1"))
+        snapshot = metrics.snapshot()["primary"]
+        assert snapshot["checked_out"] == 2
+        assert snapshot["overflow"] == 1
+
+    snapshot = metrics.snapshot()["primary"]
+    assert snapshot["connects"] == 2
+    assert snapshot["checkouts"] == 2
+    assert snapshot["checkins"] == 2
+    assert snapshot["overflow_checkouts"] == 1
+    assert snapshot["peak_checked_out"] == 2
+    assert snapshot["checked_out"] == 0
+    assert snapshot["wait_count"] == 2
+    assert snapshot["wait_max"] >= snapshot["wait_mean"] > 0
+    assert snapshot["pool_size"] == 1
+
+    metrics.reset()
+    assert metrics.snapshot()["primary"]["checkouts"] == 0
+
+
+def test_pool_metrics_overflow_checkouts(tmp_path: Path) -> None:
+    """Only checkouts beyond ``pool_size`` count as overflow, not the ones made while the pool still overflows."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", poolclass=QueuePool, pool_size=2, max_overflow=1)
+    metrics = PoolMetrics()
+    metrics.instrument(engine)
+
+    first, second, third = engine.connect(), engine.connect(), engine.connect()
+    second.close()
+    third.close()
+    assert engine.pool.overflow() == 1  # type: ignore[attr-defined]
+    with engine.connect():
+        assert metrics.snapshot()["primary"]["checked_out"] == 2
+    first.close()
+    assert metrics.snapshot()["primary"]["overflow_checkouts"] == 1
+
+
+def test_pool_metrics_survive_dispose(tmp_path: Path) -> None:
+    """Disposing the engine recreates the pool but keeps the instrumentation."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    metrics = PoolMetrics()
+    metrics.instrument(engine)
+    engine.dispose()
+    with engine.connect():
+        pass
+    snapshot = metrics.snapshot()["primary"]
+    assert snapshot["checkouts"] == snapshot["wait_count"] == 1
+
+
+def test_includeme_pool_settings(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """``includeme`` registers the metrics utility and warms the pool up."""
+    settings = {
+        "sqlalchemy.url": f"sqlite:///{tmp_path / 'db.sqlite'}",
+        "sqlalchemy.pool_class": "sqlalchemy.pool.QueuePool",
+        "basemodel.pool_metrics": "true",
+        "basemodel.pool_warmup": "2",
+    }
+    monkeypatch.setattr("pyramid_basemodel.bind_engine", lambda *args, **kwargs: None)
+    config = Configurator(settings=settings)
+    config.include("pyramid_basemodel")
+    config.commit()
+
+    metrics = get_pool_metrics(config.registry)
+    assert metrics is not None
+    assert metrics.snapshot()["primary"]["connects"] == 2
+
+
+def test_get_pool_metrics_disabled() -> None:
+    """Without the setting, no metrics are registered."""
+    config = Configurator(settings={"basemodel.should_bind_engine": "false"})
+    config.include("pyramid_basemodel")
+    assert get_pool_metrics(config.registry) is None
@@ -0,0 +1,148 @@
+"""Request profiling tests."""
+
+import json
+import os
+import pstats
+from pathlib import Path
+from typing import Any
+
+import pytest
+from pyramid.config import Configurator
+from pyramid.exceptions import ConfigurationError
+from pyramid.request import Request
+from pyramid.router import Router
+from sqlalchemy import Engine
+
+from pyramid_basemodel.container import BaseModelContainer
+from pyramid_basemodel.instrumentation import instrument_engine
+from pyramid_basemodel.profiling import HEADER, PARAM, _profiling_lock, rotate, sign_path
+from pyramid_basemodel.tree import BaseContentRoot
+from tests.conftest import Rows
+from tests.models import Node
+
+SECRET = "s3cret"
+
+
+class Root(BaseContentRoot):
+    """Traversal root with a container of nodes."""
+
+    mapping = {"nodes": (Node, BaseModelContainer, {})}
+
+
+@pytest.fixture
+def engine_rows() -> Rows:
+    """Insert a single node."""
+    return {Node: [{"slug": "foo", "name": "Foo"}]}
+
+
+def make_app(directory: Path, **settings: str) -> Router:
+    """Return a traversal app rendering nodes, profiled to ``directory``."""
+    config = Configurator(
+        root_factory=Root,
+        settings={
+            "sqlalchemy.url": "sqlite://",
+            "basemodel.should_bind_engine": "false",
+            "basemodel.profiling": "true",
+            "basemodel.profiling.secret": SECRET,
+            "basemodel.profiling.directory": str(directory),
+            **settings,
+        },
+    )
+    config.include("pyramid_tm")
+    config.include("pyramid_basemodel")
+
+    def node(context: Node, request: Request) -> dict[str, Any]:
+        return {"name": context.name}
+
+    config.add_view(node, context=Node, renderer="json")
+    return config.make_wsgi_app()
+
+
+def profiles(directory: Path) -> list[dict[str, Any]]:
+    """Return the statement logs saved to ``directory``, checking their profiles load."""
+    logs = sorted(directory.glob("*.json"))
+    for log in logs:
+        assert pstats.Stats(str(log.with_suffix(".prof"))).get_stats_profile().func_profiles
+    return [json.loads(log.read_text()) for log in logs]
+
+
+def test_signed_requests_are_profiled(engine: Engine, tmp_path: Path) -> None:
+    """Requests carrying a signature of their path save a profile, statements and traversal path."""
+    directory = tmp_path / "profiles"
+    instrument_engine(engine)
+    app = make_app(directory)
+    assert Request.blank("/nodes/foo").get_response(app).json == {"name": "Foo"}
+    assert profiles(directory) == []
+
+    response = Request.blank("/nodes/foo", headers={HEADER: sign_path(SECRET, "/nodes/foo")}).get_response(app)
+    assert response.json == {"name": "Foo"}
+    (log,) = profiles(directory)
+    assert log["traversal"] == ["Root", "BaseModelContainer:nodes", "Node:foo"]
+    assert any("FROM nodes" in statement["statement"] for statement in log["statements"])
+    assert next(directory.glob("*.prof")).name.endswith("-BaseModelContainer_nodes-Node_foo.prof")
+
+    Request.blank(f"/nodes/foo?{PARAM}={sign_path(SECRET, '/nodes/foo')}").get_response(app)
+    assert len(profiles(directory)) == 2
+
+
+@pytest.mark.parametrize("setting", ["false", "true"])
+def test_parameters_are_opt_in(engine: Engine, tmp_path: Path, setting: str) -> None:
+    """Query strings and bound parameters are only saved when asked for."""
+    directory = tmp_path / "profiles"
+    instrument_engine(engine)
+    app = make_app(directory, **{"basemodel.profiling.include_parameters": setting})
+    include_parameters = setting == "true"
+    Request.blank(f"/nodes/foo?{PARAM}={sign_path(SECRET, '/nodes/foo')}").get_response(app)
+    (log,) = profiles(directory)
+    assert (PARAM in log["url"]) is include_parameters
+    parameters = [statement["parameters"] for statement in log["statements"] if "FROM nodes" in statement["statement"]]
+    assert parameters
+    assert all((parameter is not None) is include_parameters for parameter in parameters)
+
+
+def test_one_request_at_a_time(engine: Engine, tmp_path: Path) -> None:
+    """Requests asking for a profile while another one is profiled are served without."""
+    directory = tmp_path / "profiles"
+    app = make_app(directory)
+    with _profiling_lock:
+        response = Request.blank("/nodes/foo", headers={HEADER: sign_path(SECRET, "/nodes/foo")}).get_response(app)
+    assert response.json == {"name": "Foo"}
+    assert profiles(directory) == []
+
+
+def test_bad_signatures_are_ignored(engine: Engine, tmp_path: Path) -> None:
+    """Signatures of other paths, with other secrets, expired or without expiry don't profile."""
+    directory = tmp_path / "profiles"
+    app = make_app(directory)
+    Request.blank("/nodes/foo", headers={HEADER: sign_path(SECRET, "/nodes")}).get_response(app)
+    Request.blank("/nodes/foo", headers={HEADER: sign_path("guess", "/nodes/foo")}).get_response(app)
+    Request.blank("/nodes/foo", headers={HEADER: sign_path(SECRET, "/nodes/foo", ttl=-1)}).get_response(app)
+    Request.blank("/nodes/foo", headers={HEADER: sign_path(SECRET, "/nodes/foo").partition(".")[2]}).get_response(app)
+    assert profiles(directory) == []
+
+
+def test_shares_query_stats(engine: Engine, tmp_path: Path) -> None:
+    """Statements are collected along with the query stats tween."""
+    directory = tmp_path / "profiles"
+    instrument_engine(engine)
+    app = make_app(directory, **{"basemodel.query_stats": "true"})
+    response = Request.blank("/nodes/foo", headers={HEADER: sign_path(SECRET, "/nodes/foo")}).get_response(app)
+    (log,) = profiles(directory)
+    assert len(log["statements"]) == int(response.headers["Server-Timing"].split('"')[1].split()[0])
+    assert log["statements"]
+
+
+def test_requires_a_secret(tmp_path: Path) -> None:
+    """Profiling can't be enabled without a secret."""
+    with pytest.raises(ConfigurationError):
+        make_app(tmp_path, **{"basemodel.profiling.secret": ""})
+
+
+def test_rotate(tmp_path: Path) -> None:
+    """The oldest files are removed first."""
+    for n in range(4):
+        path = tmp_path / f"{n}.prof"
+        path.write_bytes(bytes(100))
+        os.utime(path, (n, n))
+    rotate(tmp_path, 250)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["2.prof", "3.prof"]
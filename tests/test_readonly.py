@@ -0,0 +1,87 @@
+"""Read only session tests."""
+
+from typing import Any
+
+import pytest
+from pyramid.config import Configurator
+from pyramid.request import Request
+from pyramid.router import Router
+from sqlalchemy import Engine, insert, select, text
+from sqlalchemy.exc import InvalidRequestError, OperationalError
+
+from pyramid_basemodel import Session
+from tests.conftest import Rows
+from tests.models import Page
+
+
+@pytest.fixture
+def engine_rows() -> Rows:
+    """Insert a single page."""
+    return {Page: [{"slug": "foo", "name": "Foo"}]}
+
+
+def make_app(**settings: str) -> Router:
+    """Return an app renaming the page, or reporting the session state."""
+    config = Configurator(
+        settings={"basemodel.should_bind_engine": "false", "basemodel.read_only_safe_methods": "true", **settings}
+    )
+    config.include("pyramid_tm")
+    config.include("pyramid_basemodel")
+
+    def page(request: Request) -> dict[str, Any]:
+        page = Session.scalars(select(Page)).one()
+        if "name" in request.params:
+            page.name = request.params["name"]
+            Session.flush()
+        return {
+            "autoflush": Session().autoflush,
+            "doomed": request.tm.isDoomed(),
+            "query_only": Session.execute(text("PRAGMA query_only")).scalar(),
+        }
+
+    def raw_insert(request: Request) -> dict[str, Any]:
+        Session.execute(insert(Page).values(slug="bar", name="Bar"))
+        return {}
+
+    config.add_route("page", "/")
+    config.add_route("insert", "/insert")
+    config.add_view(page, route_name="page", renderer="json")
+    config.add_view(raw_insert, route_name="insert", renderer="json")
+    return config.make_wsgi_app()
+
+
+def test_safe_methods_are_read_only(engine: Engine) -> None:
+    """``GET`` requests run without autoflush, in a doomed transaction."""
+    response = Request.blank("/").get_response(make_app())
+    assert response.json == {"autoflush": False, "doomed": True, "query_only": 0}
+
+
+def test_database_marking(engine: Engine) -> None:
+    """The database transaction can be made ``query_only`` too."""
+    response = Request.blank("/").get_response(make_app(**{"basemodel.read_only_safe_methods.database": "true"}))
+    assert response.json == {"autoflush": False, "doomed": True, "query_only": 1}
+    assert Session().autoflush
+    # The pooled connection can write again.
+    with engine.begin() as conn:
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 0
+
+
+def test_unsafe_methods_write(engine: Engine) -> None:
+    """``POST`` requests are left alone."""
+    response = Request.blank("/", POST={"name": "Bar"}).get_response(make_app())
+    assert response.json == {"autoflush": True, "doomed": False, "query_only": 0}
+    assert Session.scalars(select(Page.name)).one() == "Bar"
+
+
+def test_flushes_are_refused(engine: Engine) -> None:
+    """Flushing changes from a ``GET`` request raises."""
+    with pytest.raises(InvalidRequestError):
+        Request.blank("/?name=Bar").get_response(make_app())
+    assert Session.scalars(select(Page.name)).one() == "Foo"
+
+
+def test_statements_are_refused_by_the_database(engine: Engine) -> None:
+    """Writes bypassing the unit of work are refused by the database."""
+    with pytest.raises(OperationalError):
+        Request.blank("/insert").get_response(make_app(**{"basemodel.read_only_safe_methods.database": "true"}))
+    assert Session.scalars(select(Page.slug)).all() == ["foo"]
@@ -0,0 +1,62 @@
+"""Read only record tests."""
+
+from typing import Any
+
+import pytest
+from sqlalchemy import Unicode, create_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, scoped_session
+
+from pyramid_basemodel import BaseMixin
+from pyramid_basemodel.records import load_records, record_class
+from pyramid_basemodel.serialize import JSONMixin, select_columns, to_dict
+from pyramid_basemodel.util import get_object_id
+from tests.models import Page, make_page
+
+
+def test_records(db_session: scoped_session[Any]) -> None:
+    """Records hold the column values and model naming, without session state."""
+    page = make_page("foo", "Foo")
+    db_session.expunge_all()
+    (record,) = Page.records()
+    assert (record.id, record.slug, record.name, record.modified) == (page.id, "foo", "Foo", page.modified)
+    assert (record.class_name, record.class_slug, record.singular_class_slug) == ("Page", "pages", "page")
+    assert get_object_id(record) == get_object_id(page)
+    assert record.__json__() == to_dict(page)
+    assert record.model is Page
+    assert not db_session.identity_map
+    with pytest.raises(AttributeError):
+        record.slug = "bar"
+
+
+def test_records_all_columns() -> None:
+    """Records hold every column, even the ones left out of the JSON, which renders as the model's."""
+
+    class Base(DeclarativeBase):
+        pass
+
+    class Entry(Base, BaseMixin, JSONMixin):
+        __tablename__ = "entries"
+        _json_columns = ("body",)
+        body: Mapped[str] = mapped_column(Unicode(32))
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        entry = Entry(body="foo")
+        session.add(entry)
+        session.flush()
+        (record,) = load_records(session, Entry)
+        assert (record.id, record.version, record.body) == (entry.id, 1, "foo")
+        assert get_object_id(record) == get_object_id(entry)
+        assert record.__json__() == entry.__json__() == {"body": "foo"}
+
+
+def test_records_statement(db_session: scoped_session[Any]) -> None:
+    """Records can hold some of the columns, of filtered rows."""
+    for slug in ("a", "b", "c"):
+        make_page(slug)
+    statement = select_columns(Page, ("id", "slug")).where(Page.slug != "b").order_by(Page.slug.desc())
+    records = Page.records(statement)
+    assert [record.slug for record in records] == ["c", "a"]
+    assert type(records[0]) is record_class(Page, ("id", "slug"))
+    assert not hasattr(records[0], "name")
@@ -0,0 +1,160 @@
+"""Read replica routing tests."""
+
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import pytest
+from mock import Mock
+from sqlalchemy import Engine, Unicode, insert, select, text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, scoped_session, sessionmaker
+
+import pyramid_basemodel
+from pyramid_basemodel import BaseMixin, bind_engine
+from pyramid_basemodel.routing import ReplicaRouter, RoutingSession
+
+
+class Base(DeclarativeBase):
+    """Declarative base local to these tests."""
+
+
+class Note(Base, BaseMixin):
+    """Sample model."""
+
+    __tablename__ = "notes"
+    body: Mapped[str] = mapped_column(Unicode(32))
+
+
+@pytest.fixture
+def engines(file_engine: Callable[..., Engine]) -> tuple[Engine, Engine]:
+    """Primary and replica engines, on two SQLite files holding a note named after them."""
+    primary = file_engine("primary.db", metadata=Base.metadata, rows={Note: [{"body": "primary"}]})
+    replica = file_engine("replica.db", metadata=Base.metadata, rows={Note: [{"body": "replica"}]})
+    return primary, replica
+
+
+@pytest.fixture
+def session(engines: tuple[Engine, Engine]) -> Iterator[scoped_session[RoutingSession]]:
+    """Scoped routing session bound to the primary and the replica."""
+    primary, replica = engines
+    session = scoped_session(sessionmaker(class_=RoutingSession))
+    bind_engine(primary, session=session, replicas=[replica])
+    yield session
+    session.remove()
+
+
+def bodies(session: scoped_session[RoutingSession]) -> list[str]:
+    """Return all note bodies visible to the ``session``."""
+    return list(session.scalars(select(Note.body).order_by(Note.id)))
+
+
+def test_reads_go_to_replica(session: scoped_session[RoutingSession]) -> None:
+    """Read only statements are served by the replica."""
+    assert bodies(session) == ["replica"]
+    assert session.get(Note, 1).body == "replica"  # type: ignore[union-attr]
+
+
+def test_writes_go_to_primary_and_stick(
+    session: scoped_session[RoutingSession], engines: tuple[Engine, Engine]
+) -> None:
+    """After a flush the transaction reads from the primary, until it ends."""
+    primary, _ = engines
+    assert bodies(session) == ["replica"]
+    session.add(Note(body="new"))
+    session.flush()
+    assert bodies(session) == ["primary", "new"]
+    session.commit()
+
+    assert bodies(session) == ["replica"]
+    with primary.connect() as conn:
+        assert list(conn.scalars(select(Note.body).order_by(Note.id))) == ["primary", "new"]
+
+
+def test_rebind_without_replicas(session: scoped_session[RoutingSession], engines: tuple[Engine, Engine]) -> None:
+    """Binding again without replicas stops routing reads to the previous ones."""
+    primary, _ = engines
+    bind_engine(primary, session=session)
+    session.remove()
+    assert session().router is None
+    assert bodies(session) == ["primary"]
+
+
+def test_sql_level_writes_stick(session: scoped_session[RoutingSession]) -> None:
+    """Core DML statements also route the rest of the transaction to the primary."""
+    session.execute(insert(Note), {"body": "bulk"})
+    assert bodies(session) == ["primary", "bulk"]
+
+
+def test_locking_and_textual_reads_use_primary(session: scoped_session[RoutingSession]) -> None:
+    """Only plain ``SELECT`` constructs are considered read only."""
+    assert session.scalars(select(Note.body).with_for_update()).all() == ["primary"]
+    assert session.scalars(text("SELECT body FROM notes")).all() == ["primary"]
+
+
+def test_textual_writes_stick(session: scoped_session[RoutingSession]) -> None:
+    """Textual statements and connections may write, so the transaction reads its writes back from the primary."""
+    session.execute(text("INSERT INTO notes (body) VALUES ('text')"))
+    assert bodies(session) == ["primary", "text"]
+    session.commit()
+
+    assert bodies(session) == ["replica"]
+    session.connection().exec_driver_sql("INSERT INTO notes (body) VALUES ('raw')")
+    assert bodies(session) == ["primary", "text", "raw"]
+
+
+def test_router_round_robin() -> None:
+    """Replicas are used in turn."""
+    first, second = Mock(), Mock()
+    router = ReplicaRouter(Mock(), [first, second])
+    assert [router.choose() for _ in range(3)] == [first, second, first]
+
+
+def test_router_least_connections(file_engine: Callable[..., Engine]) -> None:
+    """The replica with the fewest checked out connections is chosen."""
+    first = file_engine("first.db", metadata=Base.metadata)
+    second = file_engine("second.db", metadata=Base.metadata)
+    router = ReplicaRouter(Mock(), [first, second], strategy="least_connections")
+    with first.connect():
+        assert router.checked_out(first) == 1
+        assert router.choose() is second
+    assert router.checked_out(first) == 0
+    with second.connect():
+        assert router.choose() is first
+
+
+def test_router_unknown_strategy() -> None:
+    """Unknown strategies are refused."""
+    with pytest.raises(ValueError):
+        ReplicaRouter(Mock(), [Mock()], strategy="random")
+
+
+def test_includeme_replicas(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Replica engines are configured from ``sqlalchemy.replicas.<name>.`` settings."""
+    mocked_engine_from_config = Mock(side_effect=lambda settings, prefix, **kw: prefix)
+    monkeypatch.setattr(pyramid_basemodel, "engine_from_config", mocked_engine_from_config)
+
+    mock_config = Mock()
+    configure_mock: dict[str, Any] = {
+        "registry.settings": {
+            "sqlalchemy.url": "sqlite:///primary.db",
+            "sqlalchemy.replicas.b.url": "sqlite:///b.db",
+            "sqlalchemy.replicas.a.url": "sqlite:///a.db",
+            "basemodel.replica_strategy": "least_connections",
+        }
+    }
+    mock_config.configure_mock(**configure_mock)
+    mock_config.get_settings.return_value = mock_config.registry.settings
+    pyramid_basemodel.includeme(mock_config)
+
+    primary_settings = mocked_engine_from_config.call_args_list[0].args[0]
+    assert "sqlalchemy.replicas.a.url" not in primary_settings
+    mock_config.action.assert_called_with(
+        None,
+        pyramid_basemodel.bind_engine,
+        ("sqlalchemy.",),
+        {
+            "should_create": False,
+            "should_drop": False,
+            "replicas": ["sqlalchemy.replicas.a.", "sqlalchemy.replicas.b."],
+            "replica_strategy": "least_connections",
+        },
+    )
@@ -0,0 +1,124 @@
+"""Request scoped session tests."""
+
+from typing import Any
+
+import pytest
+from pyramid.config import Configurator
+from pyramid.events import BeforeRender
+from pyramid.exceptions import ConfigurationError
+from pyramid.request import Request
+from pyramid.router import Router
+from sqlalchemy import Engine, select, update
+from sqlalchemy.exc import InvalidRequestError
+
+from pyramid_basemodel import Session
+from pyramid_basemodel.scope import RELEASED_KEY, REQUEST_SCOPED_KEY, has_written, release_connection
+from tests.conftest import Rows
+from tests.models import Page
+
+
+@pytest.fixture
+def engine_rows() -> Rows:
+    """Insert a single page."""
+    return {Page: [{"slug": "foo", "name": "Foo"}]}
+
+
+def checked_out(engine: Engine) -> int:
+    """Return the number of connections checked out from the ``engine``'s pool."""
+    return engine.pool.checkedout()  # type: ignore[attr-defined,no-any-return]
+
+
+def make_app(engine: Engine, renders: list[dict[str, Any]]) -> Router:
+    """Return an app recording the checked out connections at render time in ``renders``."""
+    config = Configurator(
+        settings={
+            "basemodel.should_bind_engine": "false",
+            "basemodel.request_scope": "true",
+            "basemodel.early_release": "true",
+        }
+    )
+    config.include("pyramid_tm")
+    config.include("pyramid_basemodel")
+
+    def read(request: Request) -> dict[str, Any]:
+        return {"page": Session.scalars(select(Page)).one()}
+
+    def write(request: Request) -> dict[str, Any]:
+        page = Session.scalars(select(Page)).one()
+        page.name = request.params["name"]
+        return {"page": page}
+
+    def before_render(event: BeforeRender) -> None:
+        page = event.rendering_val.pop("page")
+        renders.append({"checked_out": checked_out(engine), "session": Session()})
+        event.rendering_val["name"] = page.name
+
+    config.add_subscriber(before_render, BeforeRender)
+    config.add_route("read", "/read")
+    config.add_route("write", "/write")
+    config.add_view(read, route_name="read", renderer="json")
+    config.add_view(write, route_name="write", renderer="json")
+    return config.make_wsgi_app()
+
+
+def test_read_only_request_releases_early(engine: Engine) -> None:
+    """Read only requests hand back their connection before rendering."""
+    renders: list[dict[str, Any]] = []
+    app = make_app(engine, renders)
+    response = Request.blank("/read").get_response(app)
+    assert response.json == {"name": "Foo"}
+    assert renders[0]["checked_out"] == 0
+    assert checked_out(engine) == 0
+    assert RELEASED_KEY not in renders[0]["session"].info
+
+
+def test_writing_request_keeps_its_transaction(engine: Engine) -> None:
+    """Requests that wrote keep their connection until ``pyramid_tm`` commits."""
+    renders: list[dict[str, Any]] = []
+    app = make_app(engine, renders)
+    response = Request.blank("/write?name=Bar").get_response(app)
+    assert response.json == {"name": "Bar"}
+    assert renders[0]["checked_out"] == 1
+    assert checked_out(engine) == 0
+    assert Session.scalars(select(Page.name)).one() == "Bar"
+
+
+def test_session_per_request(engine: Engine) -> None:
+    """Each request gets its own session, removed once it's over."""
+    renders: list[dict[str, Any]] = []
+    app = make_app(engine, renders)
+    Request.blank("/read").get_response(app)
+    Request.blank("/read").get_response(app)
+    first, second = (render["session"] for render in renders)
+    assert first is not second
+    assert Session() not in (first, second)
+    assert app.registry[REQUEST_SCOPED_KEY] == [Session]
+
+
+def test_writes_after_release_are_refused(engine: Engine) -> None:
+    """Flushes and DML statements after a release raise instead of bypassing the transaction."""
+    page = Session.scalars(select(Page)).one()
+    assert release_connection(Session())
+    assert page.name == "Foo"
+    page.name = "Bar"
+    assert has_written(Session())
+    with pytest.raises(InvalidRequestError):
+        Session.flush()
+    Session.rollback()
+    with pytest.raises(InvalidRequestError):
+        Session.execute(update(Page).values(name="Bar"))
+
+
+def test_release_keeps_writes(engine: Engine) -> None:
+    """Sessions with pending changes aren't released."""
+    Session.scalars(select(Page)).one()
+    Session.add(Page(slug="bar", name="Bar"))
+    assert not release_connection(Session())
+    assert checked_out(engine) == 1
+
+
+def test_early_release_requires_request_scope() -> None:
+    """Early release only works with request scoped sessions."""
+    config = Configurator(settings={"basemodel.should_bind_engine": "false", "basemodel.early_release": "true"})
+    with pytest.raises(ConfigurationError):
+        config.include("pyramid_basemodel")
@@ -0,0 +1,84 @@
+"""JSON serialization tests."""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any
+
+import pytest
+from pyramid.config import Configurator
+from pyramid.request import Request
+from sqlalchemy import Engine, Numeric, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, scoped_session
+
+from pyramid_basemodel import BaseMixin, Session
+from pyramid_basemodel.serialize import JSONMixin, json_response, select_columns, stream_json
+from tests.conftest import Rows
+from tests.models import Node, Page, make_page
+
+
+@pytest.fixture
+def engine_rows() -> Rows:
+    """Insert five pages."""
+    return {Page: [{"slug": f"p{n}", "name": f"P{n}"} for n in range(5)]}
+
+
+def test_json(db_session: scoped_session[Any]) -> None:
+    """Instances render their column values, dates in ISO 8601."""
+    page = make_page("foo", "Foo")
+    assert page.__json__() == {
+        "id": page.id,
+        "version": 1,
+        "created": page.created.isoformat(),  # type: ignore[union-attr]
+        "modified": page.modified.isoformat(),  # type: ignore[union-attr]
+        "slug": "foo",
+        "name": "Foo",
+    }
+
+
+def test_json_opt_in() -> None:
+    """Only models mixing in ``JSONMixin`` render to JSON."""
+    assert not hasattr(Node(), "__json__")
+
+
+def test_json_columns() -> None:
+    """The columns can be limited, and decimals render as strings."""
+
+    class Base(DeclarativeBase):
+        pass
+
+    class Price(Base, BaseMixin, JSONMixin):
+        __tablename__ = "prices"
+        _json_columns = ("amount",)
+
+        amount: Mapped[Decimal] = mapped_column(Numeric(10, 2))
+
+    assert Price(amount=Decimal("1.50")).__json__() == {"amount": "1.50"}
+
+
+def test_stream_json(engine: Engine) -> None:
+    """Rows are streamed a chunk at a time, as the instances would render."""
+    statement = select_columns(Page).order_by(Page.id)
+    chunks = list(stream_json(Session(), statement, chunk_size=2))
+    assert len(chunks) == 4
+    expected = [page.__json__() for page in Session.scalars(select(Page).order_by(Page.id))]
+    assert json.loads("".join(chunks)) == expected
+    assert "".join(stream_json(Session(), statement.where(Page.slug == "nope"))) == "[]"
+
+
+def test_json_response(engine: Engine) -> None:
+    """Responses read the rows once served, after the transaction has ended."""
+    config = Configurator(settings={"basemodel.should_bind_engine": "false"})
+    config.include("pyramid_tm")
+    config.include("pyramid_basemodel")
+
+    def pages(request: Request) -> Any:
+        return json_response(Session(), select_columns(Page, ("slug", "modified")).order_by(Page.id))
+
+    config.add_route("pages", "/")
+    config.add_view(pages, route_name="pages")
+    response = Request.blank("/").get_response(config.make_wsgi_app())
+    assert response.content_type == "application/json"
+    rows = response.json
+    assert [row["slug"] for row in rows] == [f"p{n}" for n in range(5)]
+    assert datetime.fromisoformat(rows[0]["modified"])
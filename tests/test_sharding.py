@@ -0,0 +1,258 @@
+"""Horizontal sharding tests, with a SQLite file per shard."""
+
+import os
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+import transaction
+from pyramid.config import Configurator
+from pyramid.exceptions import ConfigurationError
+from sqlalchemy import Engine, Unicode, create_engine, func, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from pyramid_basemodel import Session, bind_engine
+from pyramid_basemodel.cache import LRUBackend, cache
+from pyramid_basemodel.container import BaseModelContainer
+from pyramid_basemodel.instrumentation import collect_query_stats, instrument_engine
+from pyramid_basemodel.sharding import ShardedRoutingSession, ShardRouter, get_sharded, use_shards
+from pyramid_basemodel.tenancy import provision_tenants, use_tenant
+from tests.models import ModelBase, Page, Tag
+
+NAMES = ("primary", "two", "three")
+
+
+class Base(DeclarativeBase):
+    """Declarative base local to these tests."""
+
+
+class Setting(Base):
+    """Sample model without an integer ``id``."""
+
+    __tablename__ = "settings"
+    key: Mapped[str] = mapped_column(Unicode(32), primary_key=True)
+
+
+TENANT = "tenant_a"
+
+
+@pytest.fixture
+def engines(file_engine: Callable[..., Engine]) -> Iterator[dict[str, Engine]]:
+    """SQLite file engines by shard name, with a tenant's database attached, unbound from ``Session`` afterwards."""
+    engines = {name: file_engine(f"{name}.sqlite", attach=(TENANT,)) for name in NAMES}
+    for engine in engines.values():
+        instrument_engine(engine)
+    yield engines
+    use_shards(Session, None)
+    Session.configure(bind=None)
+
+
+def shard(engines: dict[str, Engine], **kwargs: Any) -> None:
+    """Spread the global ``Session`` over the ``engines``."""
+    primary, *others = NAMES
+    shards = {name: engines[name] for name in others}
+    bind_engine(engines[primary], base=ModelBase, should_create=True, fork_safe=False, shards=shards, **kwargs)
+
+
+def rows(engines: dict[str, Engine], model: Any) -> dict[str, list[int]]:
+    """Return the ids of ``model`` rows held by each shard."""
+    ids = {}
+    for name, engine in engines.items():
+        with engine.connect() as connection:
+            ids[name] = list(connection.scalars(select(model.id).order_by(model.id)))
+    return ids
+
+
+def add_pages(count: int) -> None:
+    """Save and commit ``count`` pages, then start afresh."""
+    Session.add_all([Page(slug=f"page-{n}", name=f"Page {n}") for n in range(count)])
+    transaction.commit()
+    Session.remove()
+
+
+def test_hash(engines: dict[str, Engine]) -> None:
+    """Rows are spread by a hash of their object id, with ids unique across shards."""
+    shard(engines)
+    assert isinstance(Session(), ShardedRoutingSession)
+    add_pages(30)
+    by_shard = rows(engines, Page)
+    assert all(by_shard.values())
+    assert sorted(sum(by_shard.values(), [])) == list(range(1, 31))
+    assert len(Session.scalars(select(Page)).all()) == 30
+
+    ident = by_shard["three"][0]
+    with collect_query_stats() as stats:
+        page = Session.get(Page, ident)
+    assert page is not None
+    assert page.id == ident
+    assert stats.count == 1
+
+
+def test_range(engines: dict[str, Engine]) -> None:
+    """Consecutive ranges of ids are assigned to each shard in turn."""
+    shard(engines, shard_strategy="range", shard_range_size=10)
+    add_pages(25)
+    assert rows(engines, Page) == {
+        "primary": list(range(1, 11)),
+        "two": list(range(11, 21)),
+        "three": list(range(21, 26)),
+    }
+
+
+def test_rules(engines: dict[str, Engine]) -> None:
+    """Tables can be pinned to a shard, and are only queried there."""
+    shard(engines, shard_rules={"tags": "two"})
+    Session.add_all([Tag(slug=f"tag-{n}", name=f"Tag {n}") for n in range(5)])
+    transaction.commit()
+    assert [len(ids) for ids in rows(engines, Tag).values()] == [0, 5, 0]
+    with collect_query_stats() as stats:
+        assert Session.scalar(select(func.count()).select_from(Tag)) == 5
+    assert stats.count == 1
+
+
+def test_container_lookup(engines: dict[str, Engine]) -> None:
+    """Containers probe all the shards at once, then load from the one holding the instance."""
+    shard(engines)
+    add_pages(10)
+    container = BaseModelContainer(None, Page)
+    with collect_query_stats() as stats:
+        page = container["page-7"]
+    assert page.name == "Page 7"
+    assert stats.count == len(NAMES) + 1
+    with pytest.raises(KeyError):
+        container["page-70"]
+
+
+def test_lookup_unsharded(engines: dict[str, Engine]) -> None:
+    """Rows of tables without an integer ``id`` are looked up on the first shard, which holds them."""
+    shard(engines)
+    for engine in engines.values():
+        Base.metadata.create_all(engine)
+    keys = [f"key-{n}" for n in range(5)]
+    router: ShardRouter = Session().shard_router  # type: ignore[attr-defined]
+    assert {router.shard_for("settings", key) for key in keys} != {"primary"}
+    Session.add_all([Setting(key=key) for key in keys])
+    transaction.commit()
+    with engines["primary"].connect() as connection:
+        assert list(connection.scalars(select(Setting.key).order_by(Setting.key))) == keys
+    assert [get_sharded(Session(), Setting, "key", key).key for key in keys] == keys
+
+
+def test_lookup_unplaceable_id(engines: dict[str, Engine]) -> None:
+    """Primary keys the range strategy can't place are looked up on all the shards."""
+    shard(engines, shard_strategy="range", shard_range_size=2)
+    add_pages(3)
+    assert get_sharded(Session(), Page, "id", "3").slug == "page-2"
+    assert get_sharded(Session(), Page, "id", "page-2") is None
+
+
+def test_container_lookup_flushes(engines: dict[str, Engine]) -> None:
+    """Pending instances are flushed before the shards are probed."""
+    shard(engines)
+    Session.add(Page(slug="pending", name="Pending"))
+    assert BaseModelContainer(None, Page)["pending"].name == "Pending"
+    transaction.abort()
+
+
+def test_container_lookup_cached(engines: dict[str, Engine]) -> None:
+    """Containers of cached models use the cache rather than probing the shards."""
+    shard(engines)
+    Session.add(Tag(slug="foo", name="Foo"))
+    transaction.commit()
+    cache.configure(LRUBackend())
+    try:
+        container = BaseModelContainer(None, Tag)
+        assert container["foo"].name == "Foo"
+        Session.remove()
+        with collect_query_stats() as stats:
+            assert container["foo"].name == "Foo"
+        assert stats.count == 0
+    finally:
+        cache.configure(None)
+
+
+def test_tenants(engines: dict[str, Engine]) -> None:
+    """Sharded sessions run in the tenant's schema on every shard."""
+    for engine in engines.values():
+        provision_tenants(engine, [TENANT], ModelBase.metadata)
+    shard(engines)
+    with use_tenant(TENANT):
+        add_pages(10)
+        assert len(Session.scalars(select(Page)).all()) == 10
+        assert BaseModelContainer(None, Page)["page-7"].name == "Page 7"
+        transaction.commit()
+    assert sum(rows(engines, Page).values(), []) == []
+    assert len(Session.scalars(select(Page)).all()) == 0
+    transaction.commit()
+
+
+def test_router() -> None:
+    """Routers check their configuration."""
+    engine = create_engine("sqlite://")
+    with pytest.raises(ValueError):
+        ShardRouter({})
+    with pytest.raises(ValueError):
+        ShardRouter({"primary": engine}, "modulo")
+    with pytest.raises(ValueError):
+        ShardRouter({"primary": engine}, rules={"tags": "two"})
+    router = ShardRouter({"primary": engine, "two": engine}, "range", range_size=2)
+    assert [router.shard_for("pages", ident) for ident in range(1, 6)] == [
+        "primary",
+        "primary",
+        "two",
+        "two",
+        "primary",
+    ]
+
+
+def test_use_shards_disposes(engines: dict[str, Engine]) -> None:
+    """Switching routers stops the thread pool of the previous one."""
+    first = ShardRouter(engines)
+    second = ShardRouter(engines)
+    use_shards(Session, first)
+    first.executor
+    use_shards(Session, second)
+    assert first._executor is None
+    second.executor
+    use_shards(Session, None)
+    assert second._executor is None
+
+
+def test_router_after_fork(engines: dict[str, Engine]) -> None:
+    """Forked children start without the thread pool and primary key blocks of the parent."""
+    router = ShardRouter(engines)
+    assert router.executor.submit(lambda: 1).result() == 1
+    parent_id = router.allocate_id("pages")
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - runs in the child
+        status = 1
+        try:
+            if router._executor is None and router._blocks == {} and router.executor.submit(lambda: 1).result() == 1:
+                status = 0
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert router.allocate_id("pages") == parent_id + 1
+    router.dispose()
+
+
+def test_includeme(engines: dict[str, Engine], tmp_path: Path) -> None:
+    """Shards are configured from ``sqlalchemy.shards.<name>.`` settings."""
+    settings = {
+        "sqlalchemy.url": f"sqlite:///{tmp_path / 'primary'}.sqlite",
+        "sqlalchemy.shards.two.url": f"sqlite:///{tmp_path / 'two'}.sqlite",
+        "basemodel.shard_strategy": "range",
+        "basemodel.shard_rules": "tags:two",
+    }
+    config = Configurator(settings=settings)
+    config.include("pyramid_basemodel")
+    config.commit()
+    session = Session()
+    assert isinstance(session, ShardedRoutingSession)
+    assert session.shard_router.names == ("primary", "two")
+    assert session.shard_router.rules == {"tags": "two"}
+
+    with pytest.raises(ConfigurationError):
+        Configurator(settings={**settings, "basemodel.shard_strategy": "modulo"}).include("pyramid_basemodel")
@@ -0,0 +1,107 @@
+"""Schema per tenant tests, with SQLite attached databases standing in for schemas."""
+
+import gc
+import weakref
+
+import pytest
+import transaction
+from pyramid.config import Configurator
+from pyramid.request import Request
+from sqlalchemy import Engine, create_engine, select
+
+from pyramid_basemodel import Session
+from pyramid_basemodel.tenancy import current_tenant, provision_tenants, tenant_bind, tenant_namespace, use_tenant
+from tests.models import ModelBase, Page
+
+TENANTS = ("tenant_a", "tenant_b")
+
+
+@pytest.fixture
+def engine_attached() -> tuple[str, ...]:
+    """Attach a database per tenant, standing in for its schema."""
+    return TENANTS
+
+
+@pytest.fixture
+def engine(engine: Engine) -> Engine:
+    """Create the tenants' tables in their databases."""
+    provision_tenants(engine, TENANTS, ModelBase.metadata)
+    return engine
+
+
+def resolve(request: Request) -> str | None:
+    """Return the tenant named by the request's host."""
+    tenant = f"tenant_{request.host.split('.')[0]}"
+    return tenant if tenant in TENANTS else None
+
+
+def slugs() -> list[str]:
+    """Return the slugs of the pages."""
+    return list(Session.scalars(select(Page.slug).order_by(Page.slug)))
+
+
+def test_use_tenant(engine: Engine) -> None:
+    """Tenants read and write their own schema, through the same engine."""
+    for tenant in TENANTS:
+        with use_tenant(tenant):
+            Session.add(Page(slug=tenant, name=tenant))
+            transaction.commit()
+    assert slugs() == []
+    transaction.commit()
+    with use_tenant("tenant_a"):
+        assert slugs() == ["tenant_a"]
+        assert tenant_namespace("pages") == "tenant_a.pages"
+    transaction.commit()
+    with use_tenant("tenant_b"):
+        assert slugs() == ["tenant_b"]
+    assert current_tenant() is None
+    assert tenant_bind(engine, "tenant_a").pool is engine.pool
+    assert tenant_bind(engine, "tenant_a") is tenant_bind(engine, "tenant_a")
+
+
+def test_requests(engine: Engine) -> None:
+    """Requests run in the schema of the tenant their resolver returns."""
+    with use_tenant("tenant_a"):
+        Session.add(Page(slug="foo", name="Foo"))
+        transaction.commit()
+    config = Configurator(
+        settings={
+            "basemodel.should_bind_engine": "false",
+            "basemodel.tenant_resolver": "tests.test_tenancy.resolve",
+        }
+    )
+    config.include("pyramid_tm")
+    config.include("pyramid_basemodel")
+
+    def pages(request: Request) -> list[str]:
+        return slugs()
+
+    def add(request: Request) -> list[str]:
+        Session.add(Page(slug="bar", name="Bar"))
+        return slugs()
+
+    config.add_route("pages", "/")
+    config.add_route("add", "/add")
+    config.add_view(pages, route_name="pages", renderer="json")
+    config.add_view(add, route_name="add", renderer="json")
+    app = config.make_wsgi_app()
+
+    assert Request.blank("/", host="a.example.com").get_response(app).json == ["foo"]
+    assert Request.blank("/add", host="b.example.com").get_response(app).json == ["bar"]
+    assert Request.blank("/", host="a.example.com").get_response(app).json == ["foo"]
+    session = Session()
+    assert Request.blank("/", host="www.example.com").get_response(app).json == []
+    assert Session() is session
+    Request.blank("/", host="a.example.com").get_response(app)
+    assert Session() is not session
+
+
+def test_tenant_bind_is_weak() -> None:
+    """Engines bound to tenants don't keep their engine alive."""
+    engine = create_engine("sqlite://")
+    bind = tenant_bind(engine, "tenant_a")
+    assert tenant_bind(engine, "tenant_a") is bind
+    engine_ref = weakref.ref(engine)
+    del engine, bind
+    gc.collect()
+    assert engine_ref() is None
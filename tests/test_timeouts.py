@@ -0,0 +1,101 @@
+"""Statement timeout and query budget tests, interrupting SQLite statements."""
+
+import logging
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from mock import Mock
+from pyramid.config import Configurator
+from pyramid.request import Request
+from sqlalchemy import Engine, create_engine, text
+
+from pyramid_basemodel.timeouts import (
+    QueryBudgetExceeded,
+    StatementTimeout,
+    _set_timeout,
+    current_query_budget,
+    limit_engine,
+    query_budget,
+)
+
+#: Counts far enough to run for seconds, unless interrupted.
+SLOW = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) SELECT count(*) FROM c"
+)
+
+
+@pytest.fixture
+def engine() -> Iterator[Engine]:
+    """In-memory SQLite engine timing statements out after 50ms."""
+    engine = create_engine("sqlite://")
+    limit_engine(engine, 0.05)
+    yield engine
+    engine.dispose()
+
+
+def test_statement_timeout(engine: Engine) -> None:
+    """Statements running past the timeout are interrupted, the connection staying usable."""
+    with engine.connect() as conn:
+        with pytest.raises(StatementTimeout) as error:
+            conn.execute(SLOW)
+        assert error.value.statement == SLOW.text
+        assert error.value.duration < 1
+        assert not isinstance(error.value, QueryBudgetExceeded)
+        assert conn.scalar(text("SELECT 1")) == 1
+
+
+def test_set_timeout_autocommit() -> None:
+    """Timeouts are set outside of a transaction, restoring the connection's autocommit."""
+    dbapi_connection = Mock(autocommit=False)
+    seen = []
+    dbapi_connection.cursor.return_value.execute.side_effect = lambda statement: seen.append(
+        (statement, dbapi_connection.autocommit)
+    )
+    _set_timeout(dbapi_connection, Mock(), 1.5, "postgresql")
+    assert seen == [("SET statement_timeout = 1500", True)]
+    assert dbapi_connection.autocommit is False
+    dbapi_connection.cursor.return_value.close.assert_called_once_with()
+
+
+def test_query_budget() -> None:
+    """Statements share the budget, and are refused once it is spent."""
+    engine = create_engine("sqlite://")
+    limit_engine(engine)
+    assert current_query_budget() is None
+    with engine.connect() as conn, query_budget(0.05) as budget:
+        assert current_query_budget() is budget
+        assert conn.scalar(text("SELECT 1")) == 1
+        assert 0 < budget.spent < budget.limit
+        with pytest.raises(QueryBudgetExceeded, match="interrupted"):
+            conn.execute(SLOW)
+        assert budget.remaining <= 0
+        with pytest.raises(QueryBudgetExceeded, match="spent before"):
+            conn.execute(text("SELECT 1"))
+    assert current_query_budget() is None
+    engine.dispose()
+
+
+def test_requests(engine: Engine, caplog: pytest.LogCaptureFixture) -> None:
+    """Requests running past their budget are aborted, naming the statement."""
+    config = Configurator(settings={"basemodel.should_bind_engine": "false", "basemodel.query_budget": "1000"})
+    config.include("pyramid_tm")
+    config.include("pyramid_basemodel")
+
+    def view(request: Request) -> dict[str, Any]:
+        with engine.connect() as conn:
+            conn.execute(SLOW if "slow" in request.params else text("SELECT 1"))
+        budget = current_query_budget()
+        assert budget is not None
+        return {"limit": budget.limit}
+
+    config.add_route("queries", "/")
+    config.add_view(view, route_name="queries", renderer="json")
+    app = config.make_wsgi_app()
+
+    assert Request.blank("/").get_response(app).json == {"limit": 1.0}
+    with caplog.at_level(logging.ERROR, logger="pyramid_basemodel.timeouts"):
+        with pytest.raises(StatementTimeout):
+            Request.blank("/?slow=1").get_response(app)
+    assert "Aborted GET /" in caplog.text
+    assert "WITH RECURSIVE" in caplog.text
@@ -0,0 +1,54 @@
+"""Table export and import tests."""
+
+import io
+from datetime import datetime
+from typing import Any
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, scoped_session
+
+from pyramid_basemodel.transfer import export_rows, import_rows
+from tests.models import ModelBase, Page
+
+
+@pytest.mark.parametrize("format", ["jsonl", "csv"])
+def test_round_trip(db_session: scoped_session[Any], format: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Exported rows are imported with their primary keys, timestamps and ``NULL`` values.
+
+    All columns are exported, not only the ones rendered to JSON.
+    """
+    monkeypatch.setattr(Page, "_json_columns", ("slug",), raising=False)
+    db_session.add_all(
+        [
+            Page(id=7, slug="a", name="A", created=datetime(2020, 1, 2, 3, 4, 5, 6)),
+            Page(id=9, slug="b", name="", version=None),
+            Page(id=12, slug="c", name="C"),
+        ]
+    )
+    db_session.flush()
+    exported = db_session.execute(select(Page.__table__).order_by(Page.id)).all()
+    file = io.StringIO()
+    stats = export_rows(db_session(), Page, file, format=format, chunk_size=2)
+    assert stats.rows == 3
+    assert stats.rows_per_second > 0
+
+    engine = create_engine("sqlite://")
+    ModelBase.metadata.create_all(engine)
+    with Session(engine) as session:
+        file.seek(0)
+        assert import_rows(session, Page, file, format=format, chunk_size=2).rows == 3
+        assert session.execute(select(Page.__table__).order_by(Page.id)).all() == exported
+    engine.dispose()
+
+
+def test_unknown_format(db_session: scoped_session[Any]) -> None:
+    """Only JSON Lines and CSV are supported."""
+    with pytest.raises(ValueError):
+        export_rows(db_session(), Page, io.StringIO(), format="xml")
+
+
+def test_unknown_column(db_session: scoped_session[Any]) -> None:
+    """Rows can only hold the model's columns."""
+    with pytest.raises(ValueError):
+        import_rows(db_session(), Page, io.StringIO('{"slug": "a", "nope": 1}\n'))
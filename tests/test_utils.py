@@ -1,17 +1,32 @@
 """Test utils module."""
 
 import hashlib
+from datetime import datetime
+from typing import Any
 
+import pytest
 from mock import MagicMock, Mock
-from sqlalchemy import schema
+from sqlalchemy import Column, Integer, MetaData, Unicode, create_engine, inspect, schema, update
+from sqlalchemy.dialects import registry
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, scoped_session
 
+from pyramid_basemodel import ServerDefaultBaseMixin, Session
+from pyramid_basemodel.instrumentation import collect_query_stats, instrument_engine
 from pyramid_basemodel.util import (
+    IndexSpec,
+    bulk_delete,
+    bulk_update,
+    ensure_unique,
     generate_random_digest,
     get_all_matching,
     get_object_id,
     get_or_create,
+    lookup_statement,
+    resolve_object_ids,
+    session_for,
     table_args_indexes,
 )
+from tests.models import ModelBase, Node, Page, make_node, make_page
 
 
 def test_get_object_id() -> None:
@@ -36,31 +51,48 @@ def test_generate_random_digest_longer() -> None:
     assert len(h.hexdigest()) == len(digest)
 
 
-def test_get_or_create_existing() -> None:
+def test_get_or_create_existing(db_session: scoped_session[Any]) -> None:
     """Test get_or_create where instance already exists."""
+    page = make_page("foo")
+    assert get_or_create(Page, slug="foo") is page
+    assert get_or_create(Page, slug="foo", name="foo") is page
+
+
+def test_get_or_create_new(db_session: scoped_session[Any]) -> None:
+    """Test get_or_create where instance does not exists."""
+    make_page("foo")
+    page = get_or_create(Page, slug="bar", name="Bar")
+    assert page.id is None
+    assert (page.slug, page.name) == ("bar", "Bar")
+
+
+def test_get_or_create_query_fallback(db_session: scoped_session[Any]) -> None:
+    """``None`` values and relations are looked up with a query."""
+    root = make_node("root")
+    child = make_node("child", parent=root)
+    assert get_or_create(Node, slug="root", parent_id=None) is root
+    assert get_or_create(Node, parent=root) is child
+
+
+def test_get_or_create_mocked_query() -> None:
+    """Classes that aren't mapped are looked up through their ``query``."""
     mock_cls = Mock()
-    mock_cls.return_value = "new"
     kwargs = dict(foo="bar")
-
-    # mock returning existing instance
     mock_cls.query.filter_by.return_value.first.return_value = "exist"
     assert get_or_create(mock_cls, **kwargs) == "exist"
     mock_cls.query.filter_by.assert_called_with(**kwargs)
 
 
-def test_get_or_create_new() -> None:
-    """Test get_or_create where instance does not exists."""
-    mock_cls = Mock()
-    mock_cls.return_value = "new"
-    kwargs = dict(foo="bar")
-    # query returns nothing, so new instance will be created.
-    mock_cls.query.filter_by.return_value.first.return_value = None
-    assert get_or_create(mock_cls, **kwargs) == "new"
-    mock_cls.assert_called_with(**kwargs)
+def test_get_all_matching(db_session: scoped_session[Any]) -> None:
+    """Test return all matching instances."""
+    pages = [make_page(slug) for slug in ("a", "b", "c")]
+    assert sorted(get_all_matching(Page, "slug", ["a", "c", "d"]), key=lambda page: page.slug) == [pages[0], pages[2]]
+    assert get_all_matching(Page, "slug", iter(["b"])) == [pages[1]]
+    assert get_all_matching(Page, "slug", []) == []
 
 
-def test_get_all_matching() -> None:
-    """Test return all matching instances."""
+def test_get_all_matching_query_only() -> None:
+    """Classes that aren't mapped, but have a ``query``, go through it."""
     mock_cls = Mock()
     mock_cls.query.filter.return_value.all.return_value = ["result"]
 
@@ -69,6 +101,113 @@ def test_get_all_matching() -> None:
     mock_cls.query.filter.assert_called_with(mock_cls.a.in_.return_value)
 
 
+def test_session_for(db_session: scoped_session[Any]) -> None:
+    """The session of ``query_property`` classes comes from the registry, other classes from their query."""
+    assert session_for(Page) is db_session()
+    mock_cls = Mock()
+    assert session_for(mock_cls) is mock_cls.query.session
+
+
+def test_resolve_object_ids(db_session: scoped_session[Any]) -> None:
+    """Object ids resolve to instances with one query per table, in order."""
+    instrument_engine(db_session.get_bind())  # type: ignore[arg-type]
+    pages = [make_page(slug) for slug in ("a", "b")]
+    node = make_node("n")
+    object_ids = [get_object_id(instance) for instance in (pages[1], node, pages[0])]
+    db_session.expunge_all()
+    with collect_query_stats() as stats:
+        instances, missing = resolve_object_ids([*object_ids, "pages#404", "pages#x", "users#1"], ModelBase)
+    assert stats.count == 2
+    assert [get_object_id(instance) for instance in instances] == object_ids
+    assert missing == ["pages#404", "pages#x", "users#1"]
+    with collect_query_stats() as stats:
+        assert resolve_object_ids(object_ids, ModelBase) == (instances, [])
+    assert stats.count == 0
+
+
+def test_resolve_object_ids_unresolvable() -> None:
+    """Ids of tables mapped by other bases, or to classes without ``BaseMixin``, are reported missing."""
+
+    class PlainBase(DeclarativeBase):
+        pass
+
+    class Plain(PlainBase):
+        __tablename__ = "plain"
+        id: Mapped[int] = mapped_column(primary_key=True)
+
+    assert resolve_object_ids(["plain#1"], PlainBase) == ([], ["plain#1"])
+    assert resolve_object_ids(["pages#1"]) == ([], ["pages#1"])
+
+
+def test_bulk_update(db_session: scoped_session[Any]) -> None:
+    """Matching rows are updated at once, bumping ``modified`` and ``version``."""
+    pages = [make_page(slug) for slug in ("a", "b", "c")]
+    modified = pages[0].modified
+    result = bulk_update(Page, Page.slug != "b", {"name": "x"}, bump_version=True, return_ids=True)
+    assert sorted(result.ids or []) == [pages[0].id, pages[2].id]
+    assert result.rowcount == 2
+    assert [(page.name, page.version) for page in pages] == [("x", 2), ("b", 1), ("x", 2)]
+    assert pages[0].modified > modified  # type: ignore[operator]
+    assert bulk_update(Page, Page.slug == "nope", {"name": "y"}) == (0, None)
+
+
+@pytest.mark.parametrize("return_ids", ["ids", "rowcount"])
+def test_bulk_update_server_onupdate(return_ids: str) -> None:
+    """``modified`` set by the database trigger is loaded afresh on matching instances."""
+
+    class Base(DeclarativeBase):
+        pass
+
+    class Thing(Base, ServerDefaultBaseMixin):
+        __tablename__ = "things"
+        name: Mapped[str | None] = mapped_column(Unicode(16))
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session.configure(bind=engine)
+    try:
+        things = [Thing(name=name) for name in ("a", "b")]
+        Session.add_all(things)
+        Session.flush()
+        Session.execute(update(Thing).values(modified=datetime(2000, 1, 1)))
+        assert [thing.modified for thing in things] == [datetime(2000, 1, 1)] * 2
+        result = bulk_update(Thing, Thing.name == "a", {"name": "c"}, return_ids=return_ids == "ids")
+        assert result.rowcount == 1
+        assert things[0].modified > datetime(2000, 1, 1)  # type: ignore[operator]
+        assert things[1].modified == datetime(2000, 1, 1)
+    finally:
+        Session.remove()
+        Session.configure(bind=None)
+
+
+def test_bulk_delete(db_session: scoped_session[Any]) -> None:
+    """Matching rows are deleted at once, and their instances with them."""
+    pages = [make_page(slug) for slug in ("a", "b", "c")]
+    assert bulk_delete(Page, Page.slug == "a", return_ids=True) == (1, [pages[0].id])
+    assert pages[0] not in db_session
+    assert bulk_delete(Page, Page.slug != "c").rowcount == 1
+    assert get_all_matching(Page, "slug", ["a", "b", "c"]) == [pages[2]]
+
+
+def test_ensure_unique(db_session: scoped_session[Any]) -> None:
+    """Numbered and then random suffixes are appended until the value is unique."""
+    first = make_page("foo")
+    assert ensure_unique(first, Page.query, Page.slug, "foo") == "foo"
+
+    page = Page(name="foo")
+    assert ensure_unique(page, Page.query, Page.slug, "foo") == "foo-1"
+    for n in range(1, 20):
+        make_page(f"foo-{n}")
+    assert ensure_unique(page, Page.query, Page.slug, "foo", gen_digest=lambda num_bytes: "abc") == "foo-abc"
+
+
+def test_lookup_statement_is_cached() -> None:
+    """The same statement object is returned for the same lookup."""
+    statement = lookup_statement(Page, ("slug",), first=True)
+    assert lookup_statement(Page, ("slug",), first=True) is statement
+    assert lookup_statement(Page, ("slug",)) is not statement
+
+
 def test_table_args_indexes() -> None:
     """Test table_args_indexes to build proper indexes."""
     a = table_args_indexes(
@@ -89,3 +228,46 @@ def test_table_args_indexes() -> None:
         ),
     )
     assert str(a) == str(b)
+
+
+def test_table_args_index_specs() -> None:
+    """Index specs build composite, unique, partial and covering indexes, per dialect."""
+    indexes = table_args_indexes(
+        "nodes",
+        [
+            "slug",
+            IndexSpec(("parent_id", "slug"), unique=True, where="slug IS NOT NULL", include=("name",)),
+            IndexSpec(("type", "slug"), include=("name",), name="nodes_lookup"),
+        ],
+    )
+    table = schema.Table(
+        "nodes",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        *(Column(name, Unicode(64)) for name in ("parent_id", "type", "slug", "name")),
+        *indexes,
+    )
+    assert [index.name for index in indexes] == ["nodes_slug_idx", "nodes_parent_id_slug_idx", "nodes_lookup"]
+    assert all(index.table is table for index in indexes)
+
+    def ddl(index: schema.Index, dialect: str) -> str:
+        return str(schema.CreateIndex(index).compile(dialect=registry.load(dialect)()))
+
+    assert ddl(indexes[1], "postgresql") == (
+        "CREATE UNIQUE INDEX nodes_parent_id_slug_idx ON nodes (parent_id, slug) INCLUDE (name) WHERE slug IS NOT NULL"
+    )
+    # ``INCLUDE`` is left out on other databases.
+    assert ddl(indexes[1], "sqlite") == (
+        "CREATE UNIQUE INDEX nodes_parent_id_slug_idx ON nodes (parent_id, slug) WHERE slug IS NOT NULL"
+    )
+    assert ddl(indexes[2], "postgresql") == "CREATE INDEX nodes_lookup ON nodes (type, slug) INCLUDE (name)"
+    assert ddl(indexes[2], "sqlite") == "CREATE INDEX nodes_lookup ON nodes (type, slug)"
+
+    engine = create_engine("sqlite://")
+    table.create(engine)
+    assert {index["name"]: index["column_names"] for index in inspect(engine).get_indexes("nodes")} == {
+        "nodes_slug_idx": ["slug"],
+        "nodes_parent_id_slug_idx": ["parent_id", "slug"],
+        "nodes_lookup": ["type", "slug"],
+    }
+    engine.dispose()